@@ -1,4 +1,12 @@
 from django.contrib import admin
-from .models import SystemConfig
+from .models import SystemConfig, AccessEvent
 
 admin.site.register(SystemConfig)
+
+
+@admin.register(AccessEvent)
+class AccessEventAdmin(admin.ModelAdmin):
+    list_display = ('time', 'employee_no', 'name', 'person_type', 'direction', 'dormitory', 'device', 'serial_no')
+    list_filter = ('dormitory', 'person_type', 'direction')
+    search_fields = ('employee_no', 'name')
+    date_hierarchy = 'time'
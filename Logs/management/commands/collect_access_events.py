@@ -0,0 +1,35 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from Logs.utils import collect_access_events
+
+
+class Command(BaseCommand):
+    help = "Qurilmalardagi kirish-chiqish eventlarini AccessEvent jadvaliga yig‘ish"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Bir marta yig‘ib chiqish")
+        parser.add_argument('--interval', type=float,
+                            default=getattr(settings, 'ACCESS_EVENT_POLL_INTERVAL', 30),
+                            help="Yig‘ishlar orasidagi kutish vaqti (soniya)")
+
+    def collect(self):
+        saved, errors = collect_access_events()
+        for error in errors:
+            self.stderr.write(error)
+        self.stdout.write(f"{saved} ta yangi event saqlandi.")
+
+    def handle(self, *args, **options):
+        if options['once']:
+            self.collect()
+            return
+
+        self.stdout.write("Event yig‘uvchi ishga tushdi. To‘xtatish uchun Ctrl+C.")
+        try:
+            while True:
+                close_old_connections()
+                self.collect()
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Event yig‘uvchi to‘xtatildi.")
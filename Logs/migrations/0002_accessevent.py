@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Logs', '0001_initial'),
+        ('dormitory', '0012_remove_device_main_ip'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccessEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('employee_no', models.PositiveIntegerField(default=0)),
+                ('person_type', models.CharField(choices=[('employee', 'Xodim'), ('student', 'Talaba'), ('unknown', "Noma'lum")], default='unknown', max_length=10)),
+                ('direction', models.CharField(choices=[('in', 'Kirish'), ('out', 'Chiqish')], max_length=3)),
+                ('serial_no', models.PositiveBigIntegerField()),
+                ('time', models.DateTimeField()),
+                ('name', models.CharField(blank=True, default='', max_length=150)),
+                ('major', models.PositiveSmallIntegerField(default=0)),
+                ('minor', models.PositiveSmallIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('device', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='access_events', to='dormitory.device')),
+                ('dormitory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='access_events', to='dormitory.dormitory')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dormitory', 'time'], name='access_event_dorm_time_idx'), models.Index(fields=['employee_no', 'time'], name='access_event_emp_time_idx')],
+                'constraints': [models.UniqueConstraint(fields=('device', 'serial_no'), name='unique_device_event_serial')],
+            },
+        ),
+    ]
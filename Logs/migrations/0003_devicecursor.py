@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Logs', '0002_accessevent'),
+        ('dormitory', '0013_remove_dormitory_last_update_time'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_serial_no', models.PositiveBigIntegerField(default=0)),
+                ('last_event_time', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('device', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='event_cursor', to='dormitory.device')),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Logs', '0003_devicecursor'),
+        ('dormitory', '0015_room_occupied_free_slots'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='accessevent',
+            name='unique_device_event_serial',
+        ),
+        migrations.AddField(
+            model_name='accessevent',
+            name='epoch',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='devicecursor',
+            name='epoch',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddConstraint(
+            model_name='accessevent',
+            constraint=models.UniqueConstraint(fields=('device', 'epoch', 'serial_no'), name='unique_device_event_serial'),
+        ),
+    ]
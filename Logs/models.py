@@ -19,3 +19,68 @@ class SystemConfig(models.Model):
         obj, created = SystemConfig.objects.get_or_create(key=key)
         obj.value = value
         obj.save()
+
+
+class AccessEvent(models.Model):
+    """Qurilmadan olingan kirish-chiqish eventi (qurilma buferi tozalansa ham tarix saqlanadi)."""
+    PERSON_TYPES = (
+        ('employee', 'Xodim'),
+        ('student', 'Talaba'),
+        ('unknown', 'Noma\'lum'),
+    )
+    DIRECTIONS = (
+        ('in', 'Kirish'),
+        ('out', 'Chiqish'),
+    )
+    # Loglar qidiruvidagi event turlari: kalit -> (major, minor, nomi)
+    EVENT_TYPES = {
+        'face': (5, 75, 'Yuz orqali o‘tish'),
+        'face_failed': (5, 76, 'Yuz tanilmadi'),
+        'card': (5, 1, 'Karta orqali o‘tish'),
+    }
+
+    device = models.ForeignKey('dormitory.Device', on_delete=models.SET_NULL, null=True, related_name='access_events')
+    dormitory = models.ForeignKey('dormitory.Dormitory', on_delete=models.CASCADE, related_name='access_events')
+    employee_no = models.PositiveIntegerField(default=0)
+    person_type = models.CharField(max_length=10, choices=PERSON_TYPES, default='unknown')
+    direction = models.CharField(max_length=3, choices=DIRECTIONS)
+    serial_no = models.PositiveBigIntegerField()
+    # Qurilma seriya raqamlari qaytadan boshlansa (jurnal tozalangan, qurilma almashtirilgan) epoch oshadi
+    epoch = models.PositiveSmallIntegerField(default=0)
+    time = models.DateTimeField()
+    name = models.CharField(max_length=150, blank=True, default='')
+    major = models.PositiveSmallIntegerField(default=0)
+    minor = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['device', 'epoch', 'serial_no'], name='unique_device_event_serial')
+        ]
+        indexes = [
+            models.Index(fields=['dormitory', 'time'], name='access_event_dorm_time_idx'),
+            models.Index(fields=['employee_no', 'time'], name='access_event_emp_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.employee_no} {self.get_direction_display()} {self.time:%Y-%m-%d %H:%M}"
+
+    @staticmethod
+    def person_type_for(employee_no):
+        if not employee_no:
+            return 'unknown'
+        return 'employee' if employee_no < 10000 else 'student'
+
+
+class DeviceCursor(models.Model):
+    """Qurilmadan olingan oxirgi event (seriya raqami bo‘yicha): keyingi safar shundan keyingilari olinadi."""
+    device = models.OneToOneField('dormitory.Device', on_delete=models.CASCADE, related_name='event_cursor')
+    last_serial_no = models.PositiveBigIntegerField(default=0)
+    # Joriy seriya raqamlari davri (AccessEvent.epoch)
+    epoch = models.PositiveSmallIntegerField(default=0)
+    last_event_time = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.device_id}: {self.last_serial_no}"
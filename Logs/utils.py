@@ -1,66 +1,263 @@
 # logs/utils.py
-import pytz
-import requests
-from datetime import datetime
-from requests.auth import HTTPDigestAuth
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Q, Value
+from django.utils import timezone
 from accounts.models import CustomUser
 from student.models import Student
-from dormitory.models import Dormitory
+from student.stats import bump_stats_version
+from dormitory.models import Device
+from dormitory.occupancy import apply_deltas
+from utils.fanout import run_on_devices
+from utils.hikvision import fetch_events_after, latest_serial_no
+from utils.pagination import decode_cursor, encode_cursor
+from utils.people import resolve_people
+from .models import AccessEvent, DeviceCursor
 
-def process_logs(dormitory: Dormitory, last_time=None):
-    tz = pytz.timezone("Asia/Tashkent")
-    now = datetime.now(tz)
-    start_time = (last_time or (now.replace(second=0, microsecond=0)))
-    end_time = now.replace(second=0, microsecond=0)
+def parse_event_time(raw_time):
+    """Qurilma vaqti ("2024-05-01T10:11:12+05:00") -> aware datetime, noto‘g‘ri bo‘lsa None."""
+    try:
+        dt = datetime.fromisoformat(raw_time)
+    except (TypeError, ValueError):
+        return None
+    if timezone.is_naive(dt):
+        dt = timezone.make_aware(dt)
+    return dt
 
-    start_iso = start_time.strftime("%Y-%m-%dT%H:%M:%S+05:00")
-    end_iso = end_time.strftime("%Y-%m-%dT%H:%M:%S+05:00")
 
-    devices = dormitory.devices.all()
+def build_access_events(device, entries, epoch=0):
+    """ISAPI InfoList yozuvlaridan saqlanmagan AccessEvent obyektlari (epoch — DeviceCursor.epoch)."""
+    events = []
+    for entry in entries:
+        serial_no = entry.get("serialNo")
+        event_time = parse_event_time(entry.get("time"))
+        if serial_no is None or event_time is None:
+            continue
+        try:
+            employee_no = int(entry.get("employeeNoString") or 0)
+        except (TypeError, ValueError):
+            employee_no = 0
+
+        events.append(AccessEvent(
+            device=device,
+            dormitory_id=device.dormitory_id,
+            employee_no=employee_no,
+            person_type=AccessEvent.person_type_for(employee_no),
+            direction='in' if device.entrance else 'out',
+            serial_no=serial_no,
+            epoch=epoch,
+            time=event_time,
+            name=(entry.get("name") or "")[:150],
+            major=entry.get("major") or 0,
+            minor=entry.get("minor") or 0,
+        ))
+    return events
+
+
+# Yuz orqali muvaffaqiyatli o‘tish (major=5, minor=75) — odam ichkarida/tashqarida holatini o‘zgartiradi
+PRESENCE_MAJOR, PRESENCE_MINOR = 5, 75
+
+
+def _presence_deltas(model, rows, in_dorm):
+    """O‘zgaradigan qatorlar [(id, yotoqxona, o‘chirilganmi)] bo‘yicha hisoblagichlar o‘zgarishi."""
+    field = 'staff_inside' if model is CustomUser else 'students_inside'
+    deltas = {}
+    for _, dormitory_id, is_deleted in rows:
+        # O‘chirilgan talaba "ichkarida" soniga kirmaydi
+        if dormitory_id and is_deleted is not True:
+            deltas.setdefault(dormitory_id, {field: 0})[field] += 1 if in_dorm else -1
+    return deltas
+
+
+def update_presence(changes):
+    """{employee_no: in_dorm} ni har bir (model, qiymat) uchun bitta UPDATE bilan yozish.
+
+    Faqat holati haqiqatan o‘zgaradigan qatorlar yoziladi va shu tranzaksiyada
+    DormitoryOccupancy hisoblagichlari tuzatiladi.
+    """
+    groups = {}
+    for employee_no, in_dorm in changes.items():
+        model = CustomUser if employee_no < 10000 else Student
+        groups.setdefault((model, in_dorm), []).append(employee_no)
+
+    updated = 0
+    for (model, in_dorm), ids in groups.items():
+        with transaction.atomic():
+            if model is Student:
+                rows = Student.objects.filter(pk__in=ids).values_list('pk', 'dormitory_id', 'is_deleted')
+            else:
+                rows = CustomUser.objects.filter(pk__in=ids).values_list('pk', 'employee__dormitory_id', Value(False))
+            rows = list(rows.select_for_update(of=('self',)).exclude(is_in_dormitory=in_dorm))
+            count = model.objects.filter(pk__in=[row[0] for row in rows]).update(is_in_dormitory=in_dorm)
+            apply_deltas(_presence_deltas(model, rows, in_dorm))
+
+        if model is Student:
+            # update() signal chaqirmaydi, talabalar statistikasini shu yerda eskirtiramiz
+            bump_stats_version(*{row[1] for row in rows})
+        kind = "EMPLOYEE" if model is CustomUser else "STUDENT"
+        print(f"[{kind}] {count} ta is_in_dormitory -> {in_dorm}")
+        updated += count
+    return updated
+
+
+def _presence_changes(events):
+    """Yangi eventlardan har bir odamning eng oxirgi holati.
+
+    Kechikib kelgan eski event (masalan, qurilma oflayn bo‘lgan) bazadagi yangiroq
+    eventni bosib ketmasligi uchun faqat odamning eng oxirgi eventi hisobga olinadi.
+    """
+    latest = {}
+    for event in sorted(events, key=lambda event: event.time):
+        if event.employee_no and (event.major, event.minor) == (PRESENCE_MAJOR, PRESENCE_MINOR):
+            latest[event.employee_no] = event
+    if not latest:
+        return {}
+
+    stored_latest = dict(
+        AccessEvent.objects.filter(employee_no__in=latest, major=PRESENCE_MAJOR, minor=PRESENCE_MINOR)
+        .values_list('employee_no').annotate(last_time=Max('time'))
+    )
+    return {
+        employee_no: event.direction == 'in'
+        for employee_no, event in latest.items()
+        if event.time >= stored_latest.get(employee_no, event.time)
+    }
+
 
-    for device in devices:
+def collect_access_events(dormitories=None):
+    """Barcha qurilmalardan yangi eventlarni olish (har bir event bir marta).
+
+    Har bir qurilma uchun DeviceCursor da oxirgi seriya raqami saqlanadi, qurilmalar
+    parallel so‘raladi, eventlar va ichkarida/tashqarida holatlari partiyalab yoziladi.
+    Bitta qurilma xato bersa, faqat uning kursori joyida qoladi. Qurilmaning seriya
+    raqamlari qaytadan boshlansa kursor nolga tushadi va yangi epoch ochiladi.
+    Natija: (saqlangan eventlar soni, xatolar ro‘yxati).
+    """
+    devices = Device.objects.select_related('dormitory')
+    if dormitories is not None:
+        devices = devices.filter(dormitory__in=dormitories)
+    devices = list(devices)
+    if not devices:
+        return 0, []
+
+    existing = {cursor.device_id: cursor for cursor in DeviceCursor.objects.filter(device__in=devices)}
+    cursors = {device.pk: existing.get(device.pk) or DeviceCursor(device=device) for device in devices}
+
+    now = timezone.now()
+    overlap = timedelta(seconds=getattr(settings, 'ACCESS_EVENT_OVERLAP', 60))
+    backfill = timedelta(hours=getattr(settings, 'ACCESS_EVENT_BACKFILL_HOURS', 24))
+    end_iso = timezone.localtime(now).isoformat(timespec='seconds')
+
+    def fetch(device):
+        """(seriya raqamlari qaytadan boshlanganmi, yozuvlar)."""
+        cursor = cursors[device.pk]
+        start = cursor.last_event_time - overlap if cursor.last_event_time else now - backfill
+        start_iso = timezone.localtime(start).isoformat(timespec='seconds')
+        entries = fetch_events_after(device, cursor.last_serial_no, start_iso, end_iso)
+        if entries or not cursor.last_serial_no:
+            return False, entries
+        # Yangi event yo‘q: qurilma jurnali tozalangan yoki qurilma almashtirilgan bo‘lsa eng yangi
+        # seriya raqami kursordan kichik — unda kursor nolga tushadi va eventlar vaqt bo‘yicha olinadi
+        if latest_serial_no(device, end_iso) >= cursor.last_serial_no:
+            return False, entries
+        print(f"[{device.ipaddress}] Seriya raqamlari qaytadan boshlangan, kursor {cursor.last_serial_no} -> 0")
+        return True, fetch_events_after(device, 0, start_iso, end_iso)
+
+    deadline = getattr(settings, 'ACCESS_EVENT_DEADLINE', 120)
+    new_events = []
+    errors = []
+    for result in run_on_devices(devices, fetch, deadline=deadline):
+        cursor = cursors[result.device.pk]
+        cursor.updated_at = now
+        if not result.ok:
+            errors.append(result.error)
+            cursor.last_error = result.error
+            continue
+
+        reset, entries = result.value
+        if reset:
+            cursor.epoch += 1
+            cursor.last_serial_no = 0
+        events = build_access_events(result.device, entries, cursor.epoch)
+        if events:
+            last = max(events, key=lambda event: event.serial_no)
+            cursor.last_serial_no = last.serial_no
+            cursor.last_event_time = max(event.time for event in events)
+        cursor.last_error = ''
+        new_events.extend(events)
+
+    with transaction.atomic():
+        AccessEvent.objects.bulk_create(new_events, batch_size=500, ignore_conflicts=True)
+        DeviceCursor.objects.bulk_update(
+            [cursor for cursor in cursors.values() if cursor.pk is not None],
+            ['last_serial_no', 'epoch', 'last_event_time', 'last_error', 'updated_at'],
+        )
+        DeviceCursor.objects.bulk_create([cursor for cursor in cursors.values() if cursor.pk is None])
+
+    update_presence(_presence_changes(new_events))
+    return len(new_events), errors
+
+
+def stored_logs(dormitories, start_time_str, end_time_str, cursor=None, limit=None,
+                employee_no=None, direction=None, major=0, minor=0):
+    """AccessEvent jadvalidan bir yoki bir nechta yotoqxona loglari, yangilari birinchi.
+
+    limit berilsa (vaqt, id) kursori bilan sahifalanadi. Filtrlar get_merged_logs dagi
+    bilan bir xil. Natija: (loglar, keyingi kursor).
+    """
+    try:
+        start_time = timezone.make_aware(datetime.strptime(start_time_str, "%Y-%m-%d %H:%M"))
+        end_time = timezone.make_aware(datetime.strptime(end_time_str, "%Y-%m-%d %H:%M"))
+    except ValueError:
+        raise ValueError("Sanani formatda kiriting: YYYY-MM-DD HH:MM")
+
+    queryset = (
+        AccessEvent.objects
+        .filter(dormitory__in=dormitories, time__gte=start_time, time__lte=end_time)
+        .order_by('-time', '-id')
+    )
+    if employee_no:
+        queryset = queryset.filter(employee_no=employee_no)
+    if direction:
+        queryset = queryset.filter(direction=direction)
+    if major:
+        queryset = queryset.filter(major=major)
+    if minor:
+        queryset = queryset.filter(minor=minor)
+
+    # Kursor — (vaqt ISO formatda, id); noto‘g‘ri bo‘lsa birinchi sahifa
+    after = decode_cursor(cursor, (str, int))
+    if after:
         try:
-            url = f"http://{device.ipaddress}/ISAPI/AccessControl/AcsEvent?format=json"
-            payload = {
-                "AcsEventCond": {
-                    "searchID": "100001",
-                    "searchResultPosition": 0,
-                    "maxResults": 20,
-                    "major": 5,
-                    "minor": 75,
-                    "startTime": start_iso,
-                    "endTime": end_iso,
-                    "picEnable": True,
-                    "timeReverseOrder": True
-                }
-            }
-
-            response = requests.post(url, json=payload, auth=HTTPDigestAuth(device.username, device.password), timeout=10)
-
-            if response.status_code != 200:
-                continue
-
-            data = response.json()
-            info_list = data.get("AcsEvent", {}).get("InfoList", [])
-
-            for entry in info_list:
-                employee_no = int(entry.get("employeeNoString", "0") or 0)
-
-                if employee_no < 10000:
-                    try:
-                        user = CustomUser.objects.get(pk=employee_no)
-                        user.is_in_dormitory = device.entrance
-                        user.save(update_fields=["is_in_dormitory"])
-                    except CustomUser.DoesNotExist:
-                        continue
-                else:
-                    try:
-                        student = Student.objects.get(pk=employee_no)
-                        student.is_in_dormitory = device.entrance
-                        student.save(update_fields=["is_in_dormitory"])
-                    except Student.DoesNotExist:
-                        continue
-        except Exception as e:
-            print("❌ Qurilmadan log olishda xatolik:", str(e))
-
-    return end_time  # Keyingi chaqiriqda shundan boshlab olish uchun
+            after_time = datetime.fromisoformat(after[0])
+        except (TypeError, ValueError):
+            after_time = None
+        if after_time is not None:
+            if timezone.is_naive(after_time):
+                after_time = timezone.make_aware(after_time)
+            queryset = queryset.filter(Q(time__lt=after_time) | Q(time=after_time, id__lt=after[1]))
+
+    rows = queryset.values_list('id', 'employee_no', 'name', 'time', 'direction', 'dormitory__name')
+    rows = list(rows if limit is None else rows[:limit + 1])
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1][3].isoformat(), rows[-1][0]])
+
+    # Hodim yoki talaba borligini ikki so‘rov bilan tekshirish
+    students, users = resolve_people({row[1] for row in rows})
+    existing = students.keys() | users.keys()
+
+    logs = [
+        {
+            "employeeNo": employee_no,
+            "name": name,
+            "time": timezone.localtime(event_time).strftime("%Y-%m-%d %H:%M"),
+            "status": "Kirish" if direction == 'in' else "Chiqish",
+            "exists": employee_no in existing,
+            "dormitory": dormitory_name,
+        }
+        for _, employee_no, name, event_time, direction, dormitory_name in rows
+    ]
+    return logs, next_cursor
@@ -1,13 +1,21 @@
 from datetime import datetime, timedelta
+from django.conf import settings
+from django.http import JsonResponse
+from django.template.loader import render_to_string
 from django.views.generic import ListView
-from utils.hikvision import getLogs
+from utils.hikvision import get_merged_logs
+from .models import AccessEvent
+from .utils import stored_logs
 from dormitory.models import Dormitory
-from django.http import HttpResponse
-import pandas as pd
-import io
-import zipfile
-from student.models import Student
-from accounts.models import CustomUser
+from utils.export import numbered, fmt_date, export_filename, zip_response
+from utils.people import resolve_people, director_dormitory_names
+
+
+EMPLOYEE_HEADERS = ["№", "ID", "F.I.Sh.", "Lavozimi", "Telefon", "Ish vaqti", "Joylashuvi",
+                    "Ichkaridami", "Log vaqti", "Harakat"]
+STUDENT_HEADERS = ["№", "ID", "F.I.Sh.", "Fakulteti", "Xonasi", "Telefon", "Ota-ona F.I.Sh.",
+                   "Shartnoma raqami", "Kelgan vaqti", "Chiqqan vaqti", "Yotoqxona", "Ichkaridami",
+                   "Log vaqti", "Harakat"]
 
 
 class LogListView(ListView):
@@ -16,7 +24,7 @@ class LogListView(ListView):
 
     def get_queryset(self):
         self.user = self.request.user
-        self.dormitory_id = self.request.GET.get('dormitory')
+        self.dormitory_ids = [value for value in self.request.GET.getlist('dormitory') if value.isdigit()]
         self.start_time_raw = self.request.GET.get('start_time')
         self.end_time_raw = self.request.GET.get('end_time')
 
@@ -30,23 +38,6 @@ class LogListView(ListView):
         else:
             self.end_time = datetime.now().strftime("%Y-%m-%d %H:%M")
 
-        # 🎯 Yotoqxona obyektini olish
-        self.dormitory = None
-        if self.dormitory_id:
-            try:
-                if hasattr(self.user, 'director'):
-                    self.dormitory = Dormitory.objects.get(id=self.dormitory_id, director=self.user.director)
-                elif hasattr(self.user, 'employee'):
-                    self.dormitory = Dormitory.objects.get(id=self.user.employee.dormitory.id)
-            except Dormitory.DoesNotExist:
-                self.dormitory = None
-
-        # ✅ Loglarni olish
-        if self.dormitory:
-            self.logs, self.errors = getLogs(self.dormitory, self.start_time, self.end_time)
-        else:
-            self.logs, self.errors = [], ["Yotoqxona tanlanmagan yoki mavjud emas."]
-
         # 🔄 Foydalanuvchiga tegishli yotoxonalarni topish
         if hasattr(self.user, 'director'):
             dormitories = Dormitory.objects.filter(director=self.user.director)
@@ -55,13 +46,42 @@ class LogListView(ListView):
         else:
             dormitories = Dormitory.objects.none()
 
+        # 🎯 Tanlangan yotoqxonalar: direktor bir nechtasini birga ko‘rishi mumkin, xodim — faqat o‘zinikini
+        self.dormitories = list(dormitories.filter(id__in=self.dormitory_ids)) if self.dormitory_ids else []
+
+        # ✅ Loglarni olish: odatda bazadan (collect_access_events yig‘adi), ?source=live — qurilmadan.
+        # Sahifada bir nechta yotoqxona qurilmalari vaqt bo‘yicha birlashtiriladi, davomi kursor bilan olinadi
+        self.source = self.request.GET.get('source', '')
+        filters = self._filters()
+        self.cursor = self.request.GET.get('cursor')
+        limit = None if self.request.GET.get("export") else getattr(settings, 'LOGS_PAGE_SIZE', 100)
+        self.next_cursor = None
+        if self.dormitories and self.source == 'live':
+            self.logs, self.errors, self.next_cursor = get_merged_logs(
+                self.dormitories, self.start_time, self.end_time, cursor=self.cursor, limit=limit, **filters
+            )
+        elif self.dormitories:
+            self.logs, self.next_cursor = stored_logs(
+                self.dormitories, self.start_time, self.end_time, cursor=self.cursor, limit=limit, **filters
+            )
+            self.errors = []
+        else:
+            self.logs, self.errors = [], ["Yotoqxona tanlanmagan yoki mavjud emas."]
+
         self.extra_context = {
             "errors": self.errors,
             "start_time_default": self.start_time,
             "end_time_default": self.end_time,
             "logsNumber": len(self.logs),
             "dormitories": dormitories,
-            "selected_dormitory": int(self.dormitory_id) if self.dormitory_id else None,
+            "selected_dormitories": [dormitory.id for dormitory in self.dormitories],
+            "multiple_dormitories": len(self.dormitories) > 1,
+            "source": self.source,
+            "person": self.request.GET.get('person', ''),
+            "direction": filters['direction'] or '',
+            "event_type": self.request.GET.get('event_type', ''),
+            "event_types": [(key, label) for key, (_, _, label) in AccessEvent.EVENT_TYPES.items()],
+            "next_cursor": self.next_cursor,
         }
 
         return self.logs
@@ -70,90 +90,92 @@ class LogListView(ListView):
         queryset = self.get_queryset()
 
         if request.GET.get("export") == "excel" and queryset:
-            employee_data = []
-            student_data = []
-
-            for log in queryset:
-                try:
-                    user_id = int(log.get("employeeNo", 0))
-                except (ValueError, TypeError):
-                    continue
-
-                log_time = log.get("time", "")
-                status = log.get("status", "")
-
-                if user_id >= 10000:
-                    # Student
-                    try:
-                        student = Student.objects.get(id=user_id)
-                    except Student.DoesNotExist:
-                        continue
-
-                    student_data.append({
-                        "ID": student.id,
-                        "F.I.Sh.": f"{student.first_name} {student.last_name}",
-                        "Fakulteti": student.faculty,
-                        "Xonasi": student.room,
-                        "Telefon": student.phone_number,
-                        "Ota-ona F.I.Sh.": student.parent_full_name,
-                        "Shartnoma raqami": student.contract_number,
-                        "Kelgan vaqti": student.arrival_time,
-                        "Chiqqan vaqti": student.checkout_time,
-                        "Yotoqxona": student.dormitory.name,
-                        "Ichkaridami": "Ha" if student.is_in_dormitory else "Yo‘q",
-                        "Log vaqti": log_time,
-                        "Harakat": status,
-                    })
-                else:
-                    # Employee yoki direktor
-                    try:
-                        user = CustomUser.objects.get(id=user_id)
-                    except CustomUser.DoesNotExist:
-                        continue
-
-                    if user.role == "director":
-                        dorms = Dormitory.objects.filter(director__user=user)
-                        location = ", ".join([d.name for d in dorms])
-                    elif user.role == "employee" and hasattr(user, "employee") and user.employee.dormitory:
-                        location = user.employee.dormitory.name
-                    else:
-                        location = "-"
-
-                    employee_data.append({
-                        "ID": user.id,
-                        "F.I.Sh.": user.get_full_name(),
-                        "Lavozimi": "Direktor" if user.role == "director" else "Xodim",
-                        "Telefon": user.phone_number,
-                        "Ish vaqti": f"{user.work_start} - {user.work_end}" if user.work_start and user.work_end else "-",
-                        "Joylashuvi": location,
-                        "Ichkaridami": "Ha" if user.is_in_dormitory else "Yo‘q",
-                        "Log vaqti": log_time,
-                        "Harakat": status,
-                    })
-
-            zip_buffer = io.BytesIO()
-            with zipfile.ZipFile(zip_buffer, "w") as zip_file:
-                if employee_data:
-                    df1 = pd.DataFrame(employee_data)
-                    df1.index += 1
-                    df1.insert(0, "№", df1.index)
-                    excel_buffer = io.BytesIO()
-                    df1.to_excel(excel_buffer, index=False)
-                    zip_file.writestr("Hodimlar_loglari.xlsx", excel_buffer.getvalue())
-
-                if student_data:
-                    df2 = pd.DataFrame(student_data)
-                    df2.index += 1
-                    df2.insert(0, "№", df2.index)
-                    excel_buffer = io.BytesIO()
-                    df2.to_excel(excel_buffer, index=False)
-                    zip_file.writestr("Talabalar_loglari.xlsx", excel_buffer.getvalue())
-
-            zip_buffer.seek(0)
-            response = HttpResponse(zip_buffer, content_type='application/zip')
-            filename = f"loglar_{datetime.now().strftime('%Y-%m-%d_%H-%M')}.zip"
-            response['Content-Disposition'] = f'attachment; filename={filename}'
-            return response
+            # Qatorlar Excel ga yozilayotganda hosil qilinadi (DataFrame larsiz)
+            user_ids = [self._log_user_id(log) for log in queryset]
+            # Barcha talaba va xodimlar ikki so‘rov bilan olinadi, qatorlar xotirada birlashtiriladi
+            students, users = resolve_people(user_ids)
+            workbooks = []
+            if any(0 <= user_id < 10000 for user_id in user_ids):
+                rows = numbered(self._employee_rows(queryset, users))
+                workbooks.append(("Hodimlar_loglari.xlsx", [("Hodimlar", EMPLOYEE_HEADERS, rows)]))
+            if any(user_id >= 10000 for user_id in user_ids):
+                rows = numbered(self._student_rows(queryset, students))
+                workbooks.append(("Talabalar_loglari.xlsx", [("Talabalar", STUDENT_HEADERS, rows)]))
+            return zip_response(export_filename("loglar", "zip"), workbooks)
+
+        if request.GET.get("partial"):
+            # "Yana yuklash" tugmasi: keyingi sahifa qatorlari
+            html = render_to_string('Logs/log_rows.html', {
+                'logs': queryset,
+                'multiple_dormitories': request.GET.get('multiple') == '1',
+            }, request=request)
+            return JsonResponse({'html': html, 'next_cursor': self.next_cursor, 'errors': self.errors})
 
         return super().get(request, *args, **kwargs)
 
+    def _filters(self):
+        """Qidiruv filtrlari: odam (ID), yo‘nalish (in/out) va event turi."""
+        person = self.request.GET.get('person', '').strip()
+        direction = self.request.GET.get('direction')
+        major, minor, _ = AccessEvent.EVENT_TYPES.get(self.request.GET.get('event_type'), (0, 0, None))
+        return {
+            "employee_no": int(person) if person.isdigit() else None,
+            "direction": direction if direction in ('in', 'out') else None,
+            "major": major,
+            "minor": minor,
+        }
+
+    @staticmethod
+    def _log_user_id(log):
+        try:
+            return int(log.get("employeeNo", 0))
+        except (ValueError, TypeError):
+            return -1
+
+    def _student_rows(self, logs, students):
+        for log in logs:
+            student = students.get(self._log_user_id(log))
+            if student is None:
+                continue
+
+            yield [
+                student.id,
+                f"{student.first_name} {student.last_name}",
+                student.faculty,
+                str(student.room) if student.room else "",
+                student.phone_number,
+                student.parent_full_name,
+                student.contract_number,
+                fmt_date(student.arrival_time),
+                fmt_date(student.checkout_time),
+                student.dormitory.name,
+                "Ha" if student.is_in_dormitory else "Yo‘q",
+                log.get("time", ""),
+                log.get("status", ""),
+            ]
+
+    def _employee_rows(self, logs, users):
+        for log in logs:
+            # Employee yoki direktor
+            user = users.get(self._log_user_id(log))
+            if user is None:
+                continue
+
+            if user.role == "director":
+                location = director_dormitory_names(user)
+            elif user.role == "employee" and hasattr(user, "employee") and user.employee.dormitory:
+                location = user.employee.dormitory.name
+            else:
+                location = "-"
+
+            yield [
+                user.id,
+                user.get_full_name(),
+                "Direktor" if user.role == "director" else "Xodim",
+                user.phone_number,
+                f"{user.work_start} - {user.work_end}" if user.work_start and user.work_end else "-",
+                location,
+                "Ha" if user.is_in_dormitory else "Yo‘q",
+                log.get("time", ""),
+                log.get("status", ""),
+            ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:48
+
+import accounts.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_alter_customuser_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('next_value', models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='customuser',
+            name='id',
+            field=accounts.models.AutoIncrementField(editable=False, end_before=10000, primary_key=True, serialize=False),
+        ),
+        migrations.CreateModel(
+            name='FreeId',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.CharField(max_length=100)),
+                ('value', models.PositiveIntegerField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('sequence', 'value'), name='unique_free_id_per_sequence')],
+            },
+        ),
+    ]
@@ -1,48 +1,142 @@
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import models, transaction, IntegrityError
 import os
 from django.utils.text import slugify
-from django.db.models.signals import pre_delete
+from django.db.models.signals import pre_delete, post_delete
 from django.dispatch import receiver
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from utils.thumbnails import delete_thumbnails
 import re
 
 # Create your models here.
 
+class IdSequence(models.Model):
+    """AutoIncrementField uchun navbatdagi ID hisoblagichi (har model uchun bitta qator)."""
+    name = models.CharField(max_length=100, unique=True)
+    next_value = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
+
+
+class FreeId(models.Model):
+    """O‘chirilgan yozuvlardan bo‘shagan, qayta beriladigan ID lar."""
+    sequence = models.CharField(max_length=100)
+    value = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['sequence', 'value'], name='unique_free_id_per_sequence')
+        ]
+
+    def __str__(self):
+        return f"{self.sequence}: {self.value}"
+
+
+def release_id(sequence, value):
+    """ID ni qayta berish uchun bo‘shatish."""
+    FreeId.objects.get_or_create(sequence=sequence, value=value)
+
+
 class AutoIncrementField(models.PositiveIntegerField):
-    def __init__(self, start_from=10, *args, **kwargs):
+    """start_from dan boshlanadigan, bo‘sh joylarni qayta ishlatadigan ID maydoni.
+
+    Qurilmalardagi employeeNo shu ID ga teng, shuning uchun oraliqlar muhim:
+    xodimlar 10000 dan kichik, talabalar 10000 dan boshlanadi. ID IdSequence
+    qatorini bloklab olinadi (parallel yaratishda ham takrorlanmaydi), o‘chirilgan
+    ID lar FreeId jadvaliga qaytadi va birinchi navbatda beriladi. Obyektda
+    keep_id_reserved = True bo‘lsa ID o‘chirishda bo‘shatilmaydi — uni qurilmalardan
+    o‘chirish vazifasi muvaffaqiyatli tugagach release_id bo‘shatadi.
+    """
+
+    def __init__(self, start_from=10, end_before=None, *args, **kwargs):
         self.start_from = start_from
+        self.end_before = end_before
         kwargs['editable'] = False
         kwargs['primary_key'] = True
         super().__init__(*args, **kwargs)
 
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.start_from != 10:
+            kwargs['start_from'] = self.start_from
+        if self.end_before is not None:
+            kwargs['end_before'] = self.end_before
+        return name, path, args, kwargs
+
+    def contribute_to_class(self, cls, name, *args, **kwargs):
+        super().contribute_to_class(cls, name, *args, **kwargs)
+        if not cls._meta.abstract:
+            post_delete.connect(self._release_id, sender=cls, weak=False)
+
+    @property
+    def sequence_name(self):
+        return self.model._meta.label_lower
+
     def pre_save(self, model_instance, add):
         if not getattr(model_instance, self.attname):
-            # Barcha mavjud ID larni olish
-            existing_ids = list(model_instance.__class__.objects.values_list(
-                self.attname, flat=True).order_by(self.attname))
-
-            # Agar hech qanday ID bo'lmasa, start_from dan boshlash
-            if not existing_ids:
-                setattr(model_instance, self.attname, self.start_from)
-                return super().pre_save(model_instance, add)
-
-            # Bo'sh joylarni tekshirish
-            full_range = set(range(self.start_from, existing_ids[-1] + 2))
-            existing_set = set(existing_ids)
-            gaps = full_range - existing_set
-
-            # Agar bo'sh joylar bo'lsa, ulardan eng kichigini olish
-            if gaps:
-                setattr(model_instance, self.attname, min(gaps))
-            else:
-                # Bo'sh joy yo'q bo'lsa, eng yuqori ID + 1
-                setattr(model_instance, self.attname, existing_ids[-1] + 1)
-
+            setattr(model_instance, self.attname, self.allocate_id())
         return super().pre_save(model_instance, add)
 
+    def allocate_id(self):
+        model = self.model
+        with transaction.atomic():
+            sequence = self._lock_sequence()
+
+            # Avval bo‘shagan ID lardan eng kichigi
+            free_id = FreeId.objects.filter(sequence=sequence.name).order_by('value').first()
+            while free_id is not None:
+                free_id.delete()
+                if not model._default_manager.filter(pk=free_id.value).exists():
+                    return free_id.value
+                free_id = FreeId.objects.filter(sequence=sequence.name).order_by('value').first()
+
+            value = sequence.next_value
+            # Qo‘lda berilgan ID bilan to‘qnashmaslik uchun
+            while model._default_manager.filter(pk=value).exists():
+                value += 1
+            if self.end_before is not None and value >= self.end_before:
+                raise ValidationError(f"{model._meta.verbose_name} uchun bo‘sh ID qolmadi ({self.end_before} gacha).")
+
+            sequence.next_value = value + 1
+            sequence.save(update_fields=['next_value'])
+            return value
+
+    def _lock_sequence(self):
+        sequence = IdSequence.objects.select_for_update().filter(name=self.sequence_name).first()
+        if sequence is not None:
+            return sequence
+        try:
+            with transaction.atomic():
+                return self._create_sequence()
+        except IntegrityError:
+            # Boshqa jarayon hisoblagichni biroz oldin yaratgan
+            return IdSequence.objects.select_for_update().get(name=self.sequence_name)
+
+    def _create_sequence(self):
+        """Hisoblagichni birinchi marta mavjud ID lardan to‘ldirish (bir martalik)."""
+        ids = self.model._default_manager.filter(pk__gte=self.start_from)
+        if self.end_before is not None:
+            ids = ids.filter(pk__lt=self.end_before)
+        existing = list(ids.values_list(self.attname, flat=True).order_by(self.attname))
+
+        next_value = existing[-1] + 1 if existing else self.start_from
+        existing_set = set(existing)
+        FreeId.objects.bulk_create([
+            FreeId(sequence=self.sequence_name, value=value)
+            for value in range(self.start_from, next_value) if value not in existing_set
+        ], ignore_conflicts=True)
+        return IdSequence.objects.create(name=self.sequence_name, next_value=next_value)
+
+    def _release_id(self, sender, instance, **kwargs):
+        if getattr(instance, 'keep_id_reserved', False):
+            return
+        value = getattr(instance, self.attname)
+        if value is not None and value >= self.start_from:
+            release_id(self.sequence_name, value)
+
 def staff_photo_upload_path(instance, filename):
     """Hodim suratlari uchun upload pathini generatsiya qilish"""
     ext = filename.split('.')[-1]
@@ -55,6 +149,9 @@ def staff_photo_upload_path(instance, filename):
     return os.path.join('staff', new_filename)
 
 class CustomUser(AbstractUser):
+    # Qurilmadagi employeeNo: xodimlar uchun 10000 dan kichik
+    id = AutoIncrementField(start_from=10, end_before=10000)
+
     ROLE_CHOICES = [
         ('director', 'Direktor'),
         ('employee', 'Xodim'),
@@ -132,8 +229,10 @@ class CustomUser(AbstractUser):
         super().clean()
 
         if self.photo:
-            if self.photo.size > 204799:  # 200 KB = 200 * 1024 = 204800 bytes
-                raise ValidationError({'photo': "Rasm hajmi 200KB dan oshmasligi kerak."})
+            # Qurilmaga yuborishdan oldin surat kichraytiriladi (utils/images.py), bu faqat yuklash chegarasi
+            max_size = getattr(settings, 'FACE_UPLOAD_MAX_BYTES', 10 * 1024 * 1024)
+            if self.photo.size > max_size:
+                raise ValidationError({'photo': f"Rasm hajmi {max_size // (1024 * 1024)}MB dan oshmasligi kerak."})
 
         if self.password and len(self.password) < 8:
             raise ValidationError(
@@ -146,6 +245,7 @@ def delete_user_photo(sender, instance, **kwargs):
     """Hodim o'chirilganda uning suratini ham o'chiramiz"""
     if instance.photo:
         if os.path.isfile(instance.photo.path):
+            delete_thumbnails(instance.photo.path)
             os.remove(instance.photo.path)
 
 class Director(models.Model):
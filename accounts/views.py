@@ -1,5 +1,4 @@
 import os
-import tempfile
 from django.conf import settings
 from django.views.generic import ListView, CreateView
 from django.views.generic import UpdateView, DeleteView
@@ -11,8 +10,11 @@ from django.contrib.auth import update_session_auth_hash
 from django.contrib.auth.forms import PasswordChangeForm
 from django.shortcuts import render, redirect
 from  dormitory.models import Dormitory
+from dormitory.occupancy import occupancy_for
 import pandas as pd
-from utils.hikvision import add_user_to_devices, delete_user_from_devices, update_user_on_devices, update_dormitory_status
+from utils.images import ImageError, face_upload
+from utils.thumbnails import delete_thumbnails
+from jobs.tasks import enqueue
 from django.contrib import messages
 from employee.models import Employee
 
@@ -55,31 +57,23 @@ class EmployeePage(ListView):
         employee = getattr(user, 'employee', None)
 
         if role == 'director' and director:
-            dormitories = Dormitory.objects.filter(director=director)
-            context["all_employee_count"] = Employee.objects.filter(
-                dormitory__in=dormitories
-            ).count()
-
-            dormitory_stats = []
-            for dorm in dormitories:
-                total = dorm.employees.count()
-                in_dorm = dorm.employees.filter(user__is_in_dormitory=True).count()
-                dormitory_stats.append({
-                    "name": dorm.name,
-                    "total": total,
-                    "in_dorm": in_dorm
-                })
-            context["dormitory_stats"] = dormitory_stats
-
+            dormitories = list(Dormitory.objects.filter(director=director))
         elif role == 'employee' and employee and employee.dormitory:
-            dorm = employee.dormitory
-            total = dorm.employees.count()
-            in_dorm = dorm.employees.filter(user__is_in_dormitory=True).count()
-            context["dormitory_stats"] = [{
+            dormitories = [employee.dormitory]
+        else:
+            dormitories = []
+
+        if dormitories:
+            # Sonlar DormitoryOccupancy hisoblagichlaridan (yotoqxona boshiga so‘rovsiz)
+            occupancy = occupancy_for(dormitories)
+            dormitory_stats = [{
                 "name": dorm.name,
-                "total": total,
-                "in_dorm": in_dorm
-            }]
+                "total": occupancy[dorm.pk].staff_total,
+                "in_dorm": occupancy[dorm.pk].staff_inside,
+            } for dorm in dormitories]
+            context["dormitory_stats"] = dormitory_stats
+            if role == 'director':
+                context["all_employee_count"] = sum(stat["total"] for stat in dormitory_stats)
 
         return context
 
@@ -106,11 +100,8 @@ class EmployeeUpdateView(UpdateView):
             messages.error(self.request, "Foydalanuvchining hodim ma'lumotlari topilmadi.")
             return redirect('employees')
 
-        success, reason = update_user_on_devices(dormitory, employee_id, full_name)
-        if not success:
-            messages.error(self.request, f"Foydalanuvchini qurilmalarda yangilashda xatolik: {reason}")
-            return redirect('employees')
-
+        # Qurilmalarda yangilash fon worker orqali bajariladi
+        enqueue('update', dormitory, employee_id, {'name': full_name})
         return response
 
 class EmployeeDeleteView(DeleteView):
@@ -127,18 +118,21 @@ class EmployeeDeleteView(DeleteView):
             messages.error(request, "Foydalanuvchining hodim ma'lumotlari topilmadi.")
             return self.get(request, *args, **kwargs)
 
-        success, reason = delete_user_from_devices(dormitory, employee_id)
-        if not success:
-            messages.error(request, f"Foydalanuvchi qurilmalardan o‘chmadi: {reason}")
-            return self.get(request, *args, **kwargs)
+        # Qurilmalardan o‘chirish fon worker orqali bajariladi (navbatdagi qo‘shish/yangilash bekor qilinadi).
+        # ID qurilmalardan o‘chgunicha band turadi: aks holda yangi xodim shu ID ni olib, o‘chirish vazifasi
+        # qayta urinishda uni turniketlardan o‘chirib yuboradi
+        enqueue('delete', dormitory, employee_id, {'release_id': CustomUser._meta.pk.sequence_name})
 
         # Suratni o‘chirish
         if self.object.photo:
             photo_path = os.path.join(settings.MEDIA_ROOT, str(self.object.photo))
             if os.path.exists(photo_path):
+                delete_thumbnails(photo_path)
                 os.remove(photo_path)
 
-        return super().delete(request, *args, **kwargs)
+        self.object.keep_id_reserved = True
+        self.object.delete()
+        return redirect(self.get_success_url())
 
 def change_password(request):
     if request.method == 'POST':
@@ -184,42 +178,26 @@ class EmployeeCreateView(CreateView):
             messages.error(self.request, "Surat yuklanmagan. Iltimos, rasmni tanlang.")
             return render(self.request, self.template_name, {'form': form})
 
-        # Faylni vaqtincha saqlaymiz
-        tmp_file_path = None
+        # Surat qurilma talabiga keltiriladi (aylantirish, kesish, 200KB gacha JPEG)
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg', mode='wb') as tmp:
-                for chunk in photo_file.chunks():
-                    tmp.write(chunk)
-                tmp_file_path = tmp.name
-            tmp.close()
+            user.photo = face_upload(photo_file)
+        except ImageError as e:
+            messages.error(self.request, str(e))
+            return render(self.request, self.template_name, {'form': form})
 
+        try:
             user.save()
             Employee.objects.create(user=user, dormitory=dormitory)
-
-            success, reason = add_user_to_devices(dormitory, str(user.id), full_name, tmp_file_path)
-            if os.path.exists(tmp_file_path):
-                try:
-                    os.remove(tmp_file_path)
-                except Exception as e:
-                    print(f"Faylni o‘chirishda xatolik: {e}")
-
-            if success:
-                messages.success(self.request, "Hodim saqlandi va qurilmalarga qo‘shildi.")
-                return redirect(self.success_url)
-            else:
-                user.delete()
-                messages.error(self.request, f"Hodim qurilmalarga qo‘shilmadi: {reason}")
-                return render(self.request, self.template_name, {'form': form})
-
         except Exception as e:
-            if tmp_file_path and os.path.exists(tmp_file_path):
-                try:
-                    os.remove(tmp_file_path)
-                except Exception as e:
-                    print(f"Faylni o‘chirishda xatolik: {e}")
             messages.error(self.request, f"Kutilmagan xatolik: {str(e)}")
             return render(self.request, self.template_name, {'form': form})
 
+        # Qurilmalarga yuklash fon worker orqali bajariladi
+        enqueue('add', dormitory, user.id, {'full_name': full_name, 'image_path': user.photo.path})
+
+        messages.success(self.request, "Hodim saqlandi va qurilmalarga yuborilmoqda.")
+        return redirect(self.success_url)
+
     def form_invalid(self, form):
         messages.error(self.request, f"Ma'lumotlarda xatolik mavjud. {form.errors}")
         return super().form_invalid(form)
@@ -13,4 +13,14 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Django sozlangandan keyin import qilinadi
+from stream.asgi import SSE_PATH, sse_app  # noqa: E402
+
+
+async def application(scope, receive, send):
+    # Jonli eventlar oqimi Django dan tashqarida: ko‘p ochiq ulanish oqim (thread) band qilmaydi
+    if scope['type'] == 'http' and scope['path'] == SSE_PATH:
+        return await sse_app(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -1,5 +1,10 @@
+import time
+from contextlib import ExitStack
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
 from django.shortcuts import redirect
 from django.urls import reverse
+from utils import instrumentation
 
 EXEMPT_URLS = [
     '/accounts/login/',
@@ -18,3 +23,43 @@ class LoginRequiredMiddleware:
             if not any(path.startswith(url) for url in EXEMPT_URLS):
                 return redirect(reverse('login'))
         return self.get_response(request)
+
+
+class InstrumentationMiddleware:
+    """So‘rov vaqti, SQL so‘rovlar soni/vaqti, takroriy so‘rovlar va ISAPI vaqtini o‘lchash.
+
+    INSTRUMENTATION_ENABLED = True bo‘lganda yoqiladi, natijalar /instrumentation/ da (faqat admin).
+    Javob tanasi oqim bo‘lsa (eksport), tana yuborilayotgandagi so‘rovlar sanalmaydi.
+    """
+
+    def __init__(self, get_response):
+        if not instrumentation.enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = instrumentation.RequestMetrics()
+        token = instrumentation.activate(metrics)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics.record_query))
+                response = self.get_response(request)
+        finally:
+            instrumentation.deactivate(token)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        match = request.resolver_match
+        key = f"{request.method} {match.view_name if match else request.path_info}"
+        duplicates = metrics.duplicates()
+        instrumentation.views.observe(key, elapsed_ms, metrics.queries, metrics.db_ms, duplicates)
+        if duplicates:
+            sql, count = duplicates[0]
+            print(f"[INSTR] {key}: {metrics.queries} ta so‘rov, {count} marta takrorlangan: {sql[:200]}")
+
+        timings = [f'app;dur={elapsed_ms:.1f}', f'db;dur={metrics.db_ms:.1f};desc="{metrics.queries} queries"']
+        if metrics.isapi_ms:
+            timings.append(f'isapi;dur={sum(metrics.isapi_ms.values()):.1f}')
+        response['Server-Timing'] = ", ".join(timings)
+        return response
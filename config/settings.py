@@ -39,9 +39,12 @@ INSTALLED_APPS = [
     'payment',
     'expense',
     'stream',
+    'jobs',
 ]
 
 MIDDLEWARE = [
+    # Butun so‘rovni o‘lchashi uchun birinchi (INSTRUMENTATION_ENABLED bilan yoqiladi)
+    'config.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -122,6 +125,8 @@ STATIC_URL = 'static/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
+# Surat kichik nusxalari (mazmun xeshi bo‘yicha nomlanadi, /thumbs/ orqali beriladi)
+THUMBNAIL_ROOT = os.path.join(BASE_DIR, 'thumbnails')
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
@@ -134,10 +139,70 @@ AUTH_USER_MODEL = 'accounts.CustomUser'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = 'login'
 
-# Redis background broker
+# Redis background broker (hozircha ishlatilmaydi, qurilma vazifalari jobs ilovasidagi
+# ma'lumotlar bazasiga asoslangan worker orqali bajariladi: python manage.py run_device_sync)
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
-# settings.py
-
 
+# Kesh (talabalar ro‘yxatidagi statistikalar). LocMemCache har bir jarayonda alohida:
+# bir nechta worker bilan ishlaganda umumiy kesh (Redis yoki DatabaseCache) ulash kerak,
+# aks holda boshqa worker dagi o‘zgarish faqat STUDENT_STATS_CACHE_TIMEOUT dan keyin ko‘rinadi.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Qurilma loglari bo‘laklari (LOGS_CACHE_*): har qurilma, filtr va daqiqa uchun alohida kalit,
+    # default keshdagi 300 ta joyni to‘ldirib boshqa kalitlarni siqib chiqarmasligi uchun alohida
+    'device_events': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'device-events',
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+}
+STUDENT_STATS_CACHE_TIMEOUT = 60      # soniya
+# So‘rovlarni o‘lchash (config.middleware.InstrumentationMiddleware), natijalar /instrumentation/ da
+INSTRUMENTATION_ENABLED = False       # yoqilmasa middleware umuman ishlamaydi
+INSTRUMENTATION_WINDOW = 3600         # gistogramma oxirgi shuncha soniyani saqlaydi (jarayon xotirasida)
+INSTRUMENTATION_DUPLICATE_THRESHOLD = 3  # bitta so‘rovda shuncha marta takrorlangan SQL — N+1 belgisi
+
+# Yotoqxona hisoblagichlari (dormitory.DormitoryOccupancy): python manage.py reconcile_occupancy
+OCCUPANCY_RECONCILE_INTERVAL = 3600   # asosiy jadvallar bilan solishtirish oralig‘i, soniya
+
+# Hikvision qurilmalari bilan ishlash
+HIKVISION_MAX_WORKERS = 8             # bir vaqtda so‘raladigan qurilmalar soni
+HIKVISION_TIMEOUT = (3, 10)           # (ulanish, javob) kutish vaqti, soniya
+HIKVISION_DEVICE_DEADLINE = 30        # bitta qurilma uchun umumiy muddat, soniya
+HIKVISION_ENROLL_BATCH_SIZE = 20      # bitta UserInfo so‘rovidagi foydalanuvchilar soni
+FACE_UPLOAD_MAX_BYTES = 10 * 1024 * 1024  # formada qabul qilinadigan surat hajmi
+FACE_IMAGE_SIZE = (480, 640)          # qurilmaga yuboriladigan surat o‘lchami (eni, bo‘yi), kattasi kichraytiriladi
+FACE_IMAGE_MAX_BYTES = 200 * 1024     # qurilma qabul qiladigan surat hajmi, JPEG shu hajmgacha siqiladi
+
+# Qurilma sinxronlash vazifalari (jobs)
+DEVICE_SYNC_MAX_ATTEMPTS = 5          # vazifa necha marta qayta urinib ko‘riladi
+DEVICE_SYNC_BACKOFF = 10              # birinchi qayta urinishgacha kutish, har safar 2 baravar oshadi
+DEVICE_SYNC_POLL_INTERVAL = 1         # navbat bo‘sh bo‘lganda worker kutish vaqti, soniya
+DEVICE_SYNC_BULK_DEADLINE = 3600      # ommaviy yuklashda bitta qurilma uchun muddat, soniya
+
+# Kirish-chiqish eventlari (Logs.AccessEvent): python manage.py collect_access_events
+ACCESS_EVENT_POLL_INTERVAL = 30       # qurilmalardan yig‘ish oralig‘i, soniya
+ACCESS_EVENT_OVERLAP = 60             # oxirgi saqlangan eventdan oldingi ustma-ust oraliq, soniya
+ACCESS_EVENT_BACKFILL_HOURS = 24      # yangi qurilma uchun necha soatlik tarix olinadi
+ACCESS_EVENT_MAX_PAGES = 50           # bitta yig‘ishda qurilmadan olinadigan sahifalar (30 tadan), qolgani keyingi safar
+ACCESS_EVENT_DEADLINE = 120           # bitta qurilmadan yig‘ish uchun muddat, soniya
+LOGS_PAGE_SIZE = 100                  # loglar sahifasida bir martada ko‘rsatiladigan loglar ("Yana yuklash")
+LOGS_CACHE_BUCKET = 60                # qurilmadan olingan eventlar shu uzunlikdagi bo‘laklarda keshlanadi, soniya
+LOGS_CACHE_LIVE_EDGE = 60             # oxirgi shuncha soniya keshlanmaydi (qurilma hali yozayotgan bo‘lishi mumkin)
+LOGS_CACHE_TIMEOUT = 86400            # tugagan bo‘laklar keshda saqlanish muddati, soniya
+LOGS_CACHE_ALIAS = 'device_events'    # bo‘laklar saqlanadigan kesh (CACHES dagi nomi)
+
+# Hikvision webhook (stream) eventlarini qabul qilish
+STREAM_PRESENCE_FLUSH_INTERVAL = 0.3  # is_in_dormitory o‘zgarishlari shu oraliqda partiyalab yoziladi, soniya
+STREAM_DEVICE_CACHE_TTL = 60          # IP -> qurilma keshi qayta yuklanish muddati, soniya
+STREAM_DEDUP_MAX = 10000              # eslab qolinadigan oxirgi eventlar soni
+STREAM_DEDUP_TTL = 3600               # takroriy event deb hisoblash muddati, soniya
+# Jonli oqim /stream/events/ (config/asgi.py orqali, ASGI server kerak: uvicorn yoki daphne)
+STREAM_REPLAY_SIZE = 200              # Last-Event-ID bo‘yicha qayta yuboriladigan oxirgi eventlar
+STREAM_SUBSCRIBER_QUEUE = 100         # har bir mijoz navbati, to‘lsa eng eskisi tashlanadi
+STREAM_HEARTBEAT = 15                 # jimlikda keep-alive yuborish oralig‘i, soniya
+STREAM_BUS_ENABLED = True             # PostgreSQL LISTEN/NOTIFY orqali worker lar o‘rtasida tarqatish
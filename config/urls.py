@@ -2,6 +2,8 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf.urls.static import static
 from config import settings
+from utils.thumbnails import serve_thumbnail
+from utils.instrumentation import instrumentation_stats
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -14,6 +16,9 @@ urlpatterns = [
     path('dormitory/', include('dormitory.urls')),
     path("expenses/", include("expense.urls")),
     path('stream/', include('stream.urls')),
+    path('jobs/', include('jobs.urls')),
+    path('thumbs/<str:name>', serve_thumbnail, name='thumbnail'),
+    path('instrumentation/', instrumentation_stats, name='instrumentation'),
 
 ]
 
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from utils.fixtures import generate
+
+
+class Command(BaseCommand):
+    help = ("Benchmark uchun sinov ma'lumotlari: yotoqxonalar, xonalar, talabalar, to‘lovlar, chiqimlar, "
+            "qurilmalar, kirish-chiqish eventlari")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dormitories', type=int, default=3, help="Yotoqxonalar soni")
+        parser.add_argument('--rooms', type=int,
+                            help="Har bir yotoqxonadagi xonalar soni (standart: talabalar sig‘adigan qilib)")
+        parser.add_argument('--room-size', type=int, default=4, help="Xona sig‘imi (±1)")
+        parser.add_argument('--students', type=int, default=20000, help="Jami talabalar soni")
+        parser.add_argument('--payments', type=int, default=4, help="Talaba boshiga o‘rtacha to‘lovlar soni")
+        parser.add_argument('--expenses', type=int, default=100, help="Har bir yotoqxonadagi chiqimlar soni")
+        parser.add_argument('--devices', type=int, default=2, help="Har bir yotoqxonadagi qurilmalar soni")
+        parser.add_argument('--employees', type=int, default=3, help="Har bir yotoqxonadagi xodimlar soni")
+        parser.add_argument('--events', type=int, default=2000,
+                            help="Har bir yotoqxonadagi kirish-chiqish eventlari soni (oxirgi 30 kun)")
+        parser.add_argument('--fill', type=float, default=0.9, help="Xonalardagi joylarning band ulushi")
+        parser.add_argument('--deleted', type=float, default=0.05, help="O‘chirilgan (chiqib ketgan) talabalar ulushi")
+        parser.add_argument('--prefix', default='BENCH', help="Yotoqxona nomlari boshlanishi")
+        parser.add_argument('--seed', type=int, help="Tasodifiy sonlar urug‘i (bir xil ma'lumot uchun)")
+
+    def handle(self, *args, **options):
+        user, dormitories = generate(
+            dormitories=options['dormitories'], rooms=options['rooms'], room_size=options['room_size'],
+            students=options['students'], payments=options['payments'], expenses=options['expenses'],
+            devices=options['devices'], employees=options['employees'], fill=options['fill'],
+            deleted=options['deleted'], events=options['events'], prefix=options['prefix'], seed=options['seed'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(
+            f"Direktor: {user.username} (parol 12345678), yotoqxonalar: "
+            + ", ".join(f"{dormitory.name} (id={dormitory.pk})" for dormitory in dormitories)
+        )
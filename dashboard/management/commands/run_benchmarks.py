@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import CustomUser
+from dormitory.models import Dormitory
+from utils import benchmark
+
+
+class Command(BaseCommand):
+    help = ("Asosiy sahifalar va Excel eksportlarini o‘lchash (vaqt va SQL so‘rovlar soni). "
+            "Ma'lumotlar: python manage.py generate_fixtures")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Shu foydalanuvchi nomidan (standart: oxirgi generate_fixtures direktori)")
+        parser.add_argument('--dormitory', type=int, help="Yotoqxona sahifasi uchun yotoqxona id si")
+        parser.add_argument('--prefix', default='BENCH', help="generate_fixtures yotoqxonalari nomi boshlanishi")
+        parser.add_argument('--only', action='append',
+                            choices=[scenario.name for scenario in benchmark.SCENARIOS], help="Faqat shu ssenariy(lar)")
+        parser.add_argument('--repeat', type=int, default=5, help="Har bir ssenariy necha marta o‘lchanadi")
+        parser.add_argument('--warmup', type=int, default=1, help="O‘lchovdan oldingi qizdirish so‘rovlari")
+        parser.add_argument('--save', help="Natijani JSON faylga yozish (keyingi solishtirish uchun)")
+        parser.add_argument('--compare', help="Oldingi natija (JSON) bilan solishtirish, yomonlashsa xato bilan chiqadi")
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help="Median vaqtning ruxsat etilgan o‘sishi (0.25 = 25%%)")
+
+    def _dormitory(self, options):
+        dormitories = Dormitory.objects.select_related('director__user')
+        if options['dormitory']:
+            dormitory = dormitories.filter(pk=options['dormitory']).first()
+        else:
+            dormitory = dormitories.filter(name__startswith=options['prefix']).order_by('-pk').first()
+        if dormitory is None:
+            raise CommandError("Yotoqxona topilmadi: avval python manage.py generate_fixtures ni ishga tushiring.")
+        return dormitory
+
+    def handle(self, *args, **options):
+        dormitory = self._dormitory(options)
+        if options['user']:
+            user = CustomUser.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f"{options['user']} foydalanuvchisi topilmadi.")
+        else:
+            user = dormitory.director.user
+        self.stdout.write(f"Foydalanuvchi: {user.username}, yotoqxona: {dormitory.name}")
+
+        results = benchmark.run(user, dormitory, options['only'], options['repeat'], options['warmup'])
+
+        self.stdout.write(
+            f"{'Ssenariy':<20}{'status':>7}{'SQL':>7}{'takror':>8}{'SQL ms':>9}"
+            f"{'min ms':>10}{'median ms':>11}{'max ms':>10}{'KB':>8}"
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<20}{result['status']:>7}{result['queries']:>7}{result['duplicates']:>8}{result['db_ms']:>9}"
+                f"{result['min_ms']:>10}{result['median_ms']:>11}{result['max_ms']:>10}{result['bytes'] // 1024:>8}"
+            )
+
+        if options['save']:
+            benchmark.save(options['save'], results)
+            self.stdout.write(f"Natija {options['save']} ga yozildi.")
+
+        if options['compare']:
+            regressions = benchmark.compare(results, benchmark.load(options['compare']), options['tolerance'])
+            if regressions:
+                for regression in regressions:
+                    self.stderr.write(regression)
+                raise CommandError(f"{len(regressions)} ta yomonlashish topildi.")
+            self.stdout.write("Yomonlashish topilmadi.")
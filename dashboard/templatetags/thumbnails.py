@@ -0,0 +1,18 @@
+from django import template
+from utils.thumbnails import thumbnail_url
+
+register = template.Library()
+
+
+@register.filter
+def thumbnail(field_file, size='avatar'):
+    """{{ user.photo|thumbnail:"avatar" }} — surat o‘rniga kichik nusxa URL i."""
+    return thumbnail_url(field_file, size)
+
+
+@register.filter
+def thumbnail_srcset(field_file, size='avatar'):
+    """<img srcset> uchun 1x va 2x (retina) nusxalar."""
+    if not field_file:
+        return ""
+    return f"{thumbnail_url(field_file, size)} 1x, {thumbnail_url(field_file, size, 2)} 2x"
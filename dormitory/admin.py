@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Dormitory, Device, Room
+from .models import Dormitory, DormitoryOccupancy, Device, Room
 
 
 @admin.register(Dormitory)
@@ -28,3 +28,15 @@ class RoomAdmin(admin.ModelAdmin):
     list_filter = ('dormitory',)
     search_fields = ('number', 'dormitory__name')
     ordering = ('dormitory__name', 'number')
+
+
+@admin.register(DormitoryOccupancy)
+class DormitoryOccupancyAdmin(admin.ModelAdmin):
+    """Faqat ko‘rish uchun: qiymatlarni reconcile_occupancy buyrug‘i tuzatadi."""
+    list_display = ('dormitory', 'students_inside', 'students_total', 'staff_inside', 'staff_total',
+                    'occupied', 'capacity', 'updated_at')
+    readonly_fields = ('dormitory', 'updated_at') + DormitoryOccupancy.COUNTERS
+
+    def has_add_permission(self, request):
+        return False
+
@@ -0,0 +1,36 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from dormitory.occupancy import reconcile
+
+
+class Command(BaseCommand):
+    help = "DormitoryOccupancy hisoblagichlarini talaba, xodim va xona jadvallari bilan solishtirib tuzatish"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Bir marta tekshirish")
+        parser.add_argument('--interval', type=float,
+                            default=getattr(settings, 'OCCUPANCY_RECONCILE_INTERVAL', 3600),
+                            help="Tekshiruvlar orasidagi kutish vaqti (soniya)")
+        parser.add_argument('--dormitory', type=int, action='append', help="Faqat shu yotoqxona(lar)")
+
+    def reconcile(self, dormitory_ids):
+        drift = reconcile(dormitory_ids)
+        for dormitory_id, field, old, new in drift:
+            self.stderr.write(f"[{dormitory_id}] {field}: {old} -> {new}")
+        self.stdout.write(f"{len(drift)} ta farq tuzatildi.")
+
+    def handle(self, *args, **options):
+        if options['once']:
+            self.reconcile(options['dormitory'])
+            return
+
+        self.stdout.write("Hisoblagichlarni tekshirish ishga tushdi. To‘xtatish uchun Ctrl+C.")
+        try:
+            while True:
+                close_old_connections()
+                self.reconcile(options['dormitory'])
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Tekshirish to‘xtatildi.")
@@ -0,0 +1,90 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from dormitory.models import Device, Dormitory
+from utils.simulator import SimulatorOptions, start_devices
+
+
+def _employee_range(value):
+    start, _, end = value.partition('-')
+    try:
+        return range(int(start), int(end or start) + 1)
+    except ValueError:
+        raise CommandError(f"--employees noto‘g‘ri: {value} (masalan 10000-10500)")
+
+
+class Command(BaseCommand):
+    help = ("Mahalliy Hikvision (ISAPI) qurilma simulyatori: UserInfo, FDLib va AcsEvent, digest auth, "
+            "sozlanadigan kechikish/xatolar, eventlar va /stream/ ga webhook")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=2, help="Qurilmalar soni (har biri alohida portda)")
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8001, help="Birinchi qurilma porti")
+        parser.add_argument('--username', default='admin')
+        parser.add_argument('--password', default='admin12345')
+        parser.add_argument('--latency', type=float, default=50, help="O‘rtacha javob kechikishi, ms")
+        parser.add_argument('--jitter', type=float, default=20, help="Kechikish tebranishi (sigma), ms")
+        parser.add_argument('--error-rate', type=float, default=0.0, help="503 qaytariladigan so‘rovlar ulushi (0..1)")
+        parser.add_argument('--hang-rate', type=float, default=0.0, help="Javobi --hang soniya kechikadigan ulush")
+        parser.add_argument('--hang', type=float, default=15, help="Osilib qolish davomiyligi, soniya")
+        parser.add_argument('--events-per-minute', type=float, default=0, help="Har bir qurilmada yangi eventlar")
+        parser.add_argument('--history', type=int, default=0, help="Oldindan yaratiladigan o‘tgan eventlar soni")
+        parser.add_argument('--history-hours', type=float, default=24, help="O‘tgan eventlar oralig‘i, soat")
+        parser.add_argument('--employees', default='10000-10100',
+                            help="Qurilmada foydalanuvchi bo‘lmasa eventlar shu ID oralig‘idan")
+        parser.add_argument('--webhook', help="Eventlarni shu URL ga yuborish, masalan http://127.0.0.1:8000/stream/")
+        parser.add_argument('--no-batch', action='store_true', help="Ko‘p yozuvli UserInfo ni qo‘llamaydigan proshivka")
+        parser.add_argument('--no-event-filter', action='store_true',
+                            help="AcsEventCond.employeeNoString ni qo‘llamaydigan proshivka")
+        parser.add_argument('--dormitory', type=int,
+                            help="Shu yotoqxonaga simulyator qurilmalarini Device sifatida qo‘shish (bor bo‘lsa yangilash)")
+        parser.add_argument('--report', type=float, default=10, help="Statistika chiqarish oralig‘i, soniya (0 — yo‘q)")
+
+    def _register(self, dormitory_id, devices, options):
+        dormitory = Dormitory.objects.filter(pk=dormitory_id).first()
+        if dormitory is None:
+            raise CommandError(f"Yotoqxona topilmadi: {dormitory_id}")
+        for index, device in enumerate(devices):
+            Device.objects.update_or_create(
+                ipaddress=device.address,
+                defaults={'dormitory': dormitory, 'username': options.username, 'password': options.password,
+                          'entrance': index % 2 == 0},
+            )
+        self.stdout.write(f"{len(devices)} ta qurilma {dormitory.name} ga bog‘landi.")
+
+    def _report(self, devices, pusher):
+        requests_count = sum(
+            count for device in devices for key, count in device.stats.items() if key.startswith(('POST', 'PUT'))
+        )
+        line = (f"so‘rovlar: {requests_count}, 401: {sum(d.stats['401'] for d in devices)}, "
+                f"xatolar: {sum(d.stats['errors'] for d in devices)}, "
+                f"eventlar: {sum(d.stats['events'] for d in devices)}, "
+                f"foydalanuvchilar: {sum(len(d.users) for d in devices)}, yuzlar: {sum(len(d.faces) for d in devices)}")
+        if pusher:
+            line += ", webhook: " + ", ".join(f"{key} {count}" for key, count in pusher.stats.items())
+        self.stdout.write(line)
+
+    def handle(self, *args, **options):
+        simulator_options = SimulatorOptions(
+            username=options['username'], password=options['password'],
+            latency=options['latency'], jitter=options['jitter'],
+            error_rate=options['error_rate'], hang_rate=options['hang_rate'], hang=options['hang'],
+            events_per_minute=options['events_per_minute'], employees=_employee_range(options['employees']),
+            webhook=options['webhook'], batch_records=not options['no_batch'],
+            event_filter=not options['no_event_filter'],
+        )
+        devices, pusher = start_devices(options['host'], options['port'], options['count'], simulator_options,
+                                        history=options['history'], history_hours=options['history_hours'])
+        if options['dormitory']:
+            self._register(options['dormitory'], devices, simulator_options)
+
+        self.stdout.write("Simulyator ishga tushdi: " + ", ".join(device.address for device in devices)
+                          + ". To‘xtatish uchun Ctrl+C.")
+        try:
+            while True:
+                time.sleep(options['report'] or 3600)
+                if options['report']:
+                    self._report(devices, pusher)
+        except KeyboardInterrupt:
+            self._report(devices, pusher)
+            self.stdout.write("Simulyator to‘xtatildi.")
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:56
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dormitory', '0012_remove_device_main_ip'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='dormitory',
+            name='last_update_time',
+        ),
+    ]
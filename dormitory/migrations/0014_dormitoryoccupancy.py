@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dormitory', '0013_remove_dormitory_last_update_time'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DormitoryOccupancy',
+            fields=[
+                ('dormitory', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='occupancy', serialize=False, to='dormitory.dormitory')),
+                ('students_total', models.IntegerField(default=0)),
+                ('students_inside', models.IntegerField(default=0)),
+                ('students_deleted', models.IntegerField(default=0)),
+                ('staff_total', models.IntegerField(default=0)),
+                ('staff_inside', models.IntegerField(default=0)),
+                ('rooms_count', models.IntegerField(default=0)),
+                ('capacity', models.IntegerField(default=0)),
+                ('occupied', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:14
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def count_rooms(apps, schema_editor):
+    Room = apps.get_model('dormitory', 'Room')
+    rooms = Room.objects.annotate(actual=Count('students', filter=Q(students__is_deleted=False)))
+    for room in rooms.iterator():
+        room.occupied = room.actual
+        room.free_slots = max(0, room.size - room.actual)
+        room.save(update_fields=['occupied', 'free_slots'])
+
+    # Yotoqxona band joylari endi o‘chirilgan talabalarni sanamaydi: qatorlar birinchi o‘qilganda qayta sanaladi
+    apps.get_model('dormitory', 'DormitoryOccupancy').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dormitory', '0014_dormitoryoccupancy'),
+        ('student', '0012_student_list_order_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='free_slots',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='occupied',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(condition=models.Q(('free_slots__gt', 0)), fields=['dormitory', 'number'], name='room_free_slots_idx'),
+        ),
+        migrations.RunPython(count_rooms, migrations.RunPython.noop),
+    ]
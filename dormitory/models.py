@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models.signals import post_init, post_save, pre_delete
+from django.dispatch import receiver
 from accounts.models import Director
 from django.core.exceptions import ValidationError
 # Create your models here.
@@ -11,7 +13,6 @@ class Dormitory(models.Model):
         default=1,
         help_text="Shartnomaga asosan boshlang‘ich oylik to‘lov (so‘mda)"
     )
-    last_update_time = models.DateTimeField(blank=True, null=True)
     def __str__(self):
         return self.name
 
@@ -29,11 +30,32 @@ class Room(models.Model):
     dormitory = models.ForeignKey(Dormitory, on_delete=models.CASCADE, related_name='rooms')
     number = models.CharField(max_length=5)
     size = models.PositiveSmallIntegerField()
+    # Talaba saqlanganda/o‘chirilganda yangilanadi (o‘chirilgan talabalar sanalmaydi)
+    occupied = models.PositiveSmallIntegerField(default=0, editable=False)
+    free_slots = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    COUNTERS = ('occupied', 'free_slots')
 
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=['dormitory', 'number'], name='unique_room_per_dormitory')
         ]
+        indexes = [
+            # Bo‘sh joyi bor xonalar (talaba joylashtirish ro‘yxati)
+            models.Index(fields=['dormitory', 'number'], condition=models.Q(free_slots__gt=0),
+                         name='room_free_slots_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.free_slots = max(0, self.size - self.occupied)
+        elif not kwargs.get('update_fields'):
+            # Hisoblagichlar faqat F() bilan o‘zgaradi: formadagi eski qiymat ularni bosib ketmasin
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTERS
+            ]
+        super().save(*args, **kwargs)
 
     def delete(self, *args, **kwargs):
         # Agar delete chaqiruvi qo‘lda bo‘lsa (ya’ni, model instance orqali)
@@ -45,3 +67,71 @@ class Room(models.Model):
     def __str__(self):
         return f"{self.dormitory.name} - {self.number}"
 
+
+class DormitoryOccupancy(models.Model):
+    """Yotoqxona bo‘yicha tayyor sonlar: sahifalar har safar Count qilmasdan bitta qatorni o‘qiydi.
+
+    Talaba, xodim va xona o‘zgarganda signal/update_presence orqali oshirib-kamaytiriladi,
+    reconcile_occupancy buyrug‘i asosiy jadvallar bilan solishtirib tuzatadi.
+    """
+    dormitory = models.OneToOneField(Dormitory, on_delete=models.CASCADE, primary_key=True, related_name='occupancy')
+    # Talabalar: total va inside — o‘chirilmaganlar, deleted — o‘chirilganlar
+    students_total = models.IntegerField(default=0)
+    students_inside = models.IntegerField(default=0)
+    students_deleted = models.IntegerField(default=0)
+    staff_total = models.IntegerField(default=0)
+    staff_inside = models.IntegerField(default=0)
+    # Xonalar: soni, umumiy sig‘imi va ularga biriktirilgan (o‘chirilmagan) talabalar
+    rooms_count = models.IntegerField(default=0)
+    capacity = models.IntegerField(default=0)
+    occupied = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    COUNTERS = ('students_total', 'students_inside', 'students_deleted', 'staff_total', 'staff_inside',
+                'rooms_count', 'capacity', 'occupied')
+
+    def __str__(self):
+        return f"{self.dormitory_id}: {self.students_inside}/{self.students_total}"
+
+    @property
+    def empty_slots(self):
+        return max(0, self.capacity - self.occupied)
+
+
+@receiver(post_save, sender=Dormitory)
+def create_dormitory_occupancy(sender, instance, created, **kwargs):
+    if created:
+        DormitoryOccupancy.objects.get_or_create(dormitory=instance)
+
+
+@receiver(post_init, sender=Room)
+def remember_room_state(sender, instance, **kwargs):
+    instance._occupancy_state = (instance.__dict__.get('dormitory_id'), instance.__dict__.get('size'))
+
+
+@receiver(post_save, sender=Room)
+def count_room(sender, instance, created, **kwargs):
+    from .occupancy import apply_deltas, refresh_free_slots, room_deltas
+
+    old = None if created else getattr(instance, '_occupancy_state', None)
+    new = (instance.dormitory_id, instance.size)
+    deltas = room_deltas(old, new)
+    if old and old != new:
+        occupied = refresh_free_slots(instance)
+        if old[0] != new[0]:
+            # Xona boshqa yotoqxonaga o‘tkazilsa, undagi talabalar ham o‘tadi
+            deltas[old[0]]['occupied'] -= occupied
+            deltas[new[0]]['occupied'] += occupied
+    apply_deltas(deltas)
+    instance._occupancy_state = new
+
+
+@receiver(pre_delete, sender=Room)
+def uncount_room(sender, instance, **kwargs):
+    from .occupancy import apply_deltas, room_deltas
+
+    deltas = room_deltas((instance.dormitory_id, instance.size), None)
+    # Xona o‘chsa talabalar xonasi NULL bo‘ladi (SET_NULL, signalsiz UPDATE)
+    deltas[instance.dormitory_id]['occupied'] -= instance.students.filter(is_deleted=False).count()
+    apply_deltas(deltas)
+
@@ -0,0 +1,239 @@
+from collections import Counter, defaultdict
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .models import Dormitory, DormitoryOccupancy, Room
+
+
+def _deltas():
+    return defaultdict(Counter)
+
+
+def apply_deltas(deltas):
+    """{dormitory_id: {maydon: o‘zgarish}} ni F() bilan (atomar) qo‘shish.
+
+    Qatori hali yo‘q yotoqxona o‘tkazib yuboriladi: u birinchi o‘qilganda to‘liq sanaladi.
+    """
+    with transaction.atomic():
+        for dormitory_id, changes in deltas.items():
+            changes = {field: F(field) + delta for field, delta in changes.items() if delta}
+            if dormitory_id and changes:
+                DormitoryOccupancy.objects.filter(dormitory_id=dormitory_id).update(
+                    **changes, updated_at=timezone.now()
+                )
+
+
+def apply_room_deltas(deltas):
+    """{room_id: o‘zgarish} — xonadagi band va bo‘sh joylarni bitta UPDATE da o‘zgartirish."""
+    with transaction.atomic():
+        for room_id, delta in deltas.items():
+            if room_id and delta:
+                # SET ichidagi F('occupied') eski qiymatni beradi
+                Room.objects.filter(pk=room_id).update(
+                    occupied=F('occupied') + delta,
+                    free_slots=Greatest(F('size') - F('occupied') - delta, 0),
+                )
+
+
+def refresh_free_slots(room):
+    """Sig‘im o‘zgargandan keyin bo‘sh joylarni qayta hisoblash; xonadagi band joylar sonini qaytaradi."""
+    Room.objects.filter(pk=room.pk).update(free_slots=Greatest(F('size') - F('occupied'), 0))
+    room.occupied, room.free_slots = Room.objects.values_list('occupied', 'free_slots').get(pk=room.pk)
+    return room.occupied
+
+
+def merge_deltas(*parts):
+    merged = _deltas()
+    for part in parts:
+        for dormitory_id, changes in part.items():
+            merged[dormitory_id].update(changes)
+    return merged
+
+
+# ---------------------------------------------------------------- talabalar
+
+STUDENT_FIELDS = ('dormitory_id', 'room_id', 'is_in_dormitory', 'is_deleted')
+
+
+def student_state(student):
+    """Hisoblagichlarga ta'sir qiladigan maydonlar; biror maydon yuklanmagan bo‘lsa None."""
+    if any(field not in student.__dict__ for field in STUDENT_FIELDS):
+        return None
+    return tuple(student.__dict__[field] for field in STUDENT_FIELDS)
+
+
+def stored_student_state(model, pk):
+    """Qisman yuklangan (only/defer) talaba uchun holatni bazadan o‘qish; qator yo‘q bo‘lsa None."""
+    return model.objects.filter(pk=pk).values_list(*STUDENT_FIELDS).first()
+
+
+def _occupied_room(state):
+    """Talaba band qilib turgan xona (o‘chirilgan talaba joy egallamaydi)."""
+    if state is None or state[3] is True:
+        return None
+    return state[1]
+
+
+def _student_contribution(state, room_dormitories, sign):
+    deltas = _deltas()
+    if state is None:
+        return deltas
+    dormitory_id, room_id, is_in_dormitory, is_deleted = state
+    if is_deleted is True:
+        deltas[dormitory_id]['students_deleted'] += sign
+    elif is_deleted is False:
+        deltas[dormitory_id]['students_total'] += sign
+        if is_in_dormitory:
+            deltas[dormitory_id]['students_inside'] += sign
+    room_id = _occupied_room(state)
+    if room_id in room_dormitories:
+        deltas[room_dormitories[room_id]]['occupied'] += sign
+    return deltas
+
+
+def student_deltas(old, new):
+    """Talaba holati old dan new ga o‘tganda hisoblagichlar o‘zgarishi (yangi talaba uchun old=None)."""
+    old_room = _occupied_room(old)
+    new_room = _occupied_room(new)
+    room_dormitories = {}
+    if old_room != new_room:
+        # Xona almashsa, band joylar xonaning yotoqxonasida o‘zgaradi
+        room_dormitories = dict(
+            Room.objects.filter(pk__in=[room for room in (old_room, new_room) if room])
+            .values_list('pk', 'dormitory_id')
+        )
+    return merge_deltas(
+        _student_contribution(old, room_dormitories, -1),
+        _student_contribution(new, room_dormitories, 1),
+    )
+
+
+def student_room_deltas(old, new):
+    """Xonalar bo‘yicha o‘zgarish {room_id: ±1}; xona almashmagan bo‘lsa bo‘sh."""
+    deltas = Counter()
+    old_room, new_room = _occupied_room(old), _occupied_room(new)
+    if old_room != new_room:
+        deltas[old_room] -= 1
+        deltas[new_room] += 1
+    return deltas
+
+
+# ---------------------------------------------------------------- xodimlar va xonalar
+
+def staff_deltas(old, new):
+    """old/new: (dormitory_id, ichkaridami) yoki None."""
+    deltas = _deltas()
+    for state, sign in ((old, -1), (new, 1)):
+        if state and state[0]:
+            deltas[state[0]]['staff_total'] += sign
+            if state[1]:
+                deltas[state[0]]['staff_inside'] += sign
+    return deltas
+
+
+def room_deltas(old, new):
+    """old/new: (dormitory_id, sig‘imi) yoki None."""
+    deltas = _deltas()
+    for state, sign in ((old, -1), (new, 1)):
+        if state and state[0]:
+            deltas[state[0]]['rooms_count'] += sign
+            deltas[state[0]]['capacity'] += sign * (state[1] or 0)
+    return deltas
+
+
+# ---------------------------------------------------------------- to‘liq sanash
+
+def count_occupancy(dormitory_ids=None):
+    """Asosiy jadvallardan sanash: {dormitory_id: {maydon: qiymat}}.
+
+    Har bir bog‘lanish alohida guruhlangan so‘rovda (birga JOIN qilinsa sonlar ko‘payib ketadi).
+    """
+    dormitories = Dormitory.objects.all()
+    if dormitory_ids is not None:
+        dormitories = dormitories.filter(pk__in=dormitory_ids)
+
+    counts = {pk: dict.fromkeys(DormitoryOccupancy.COUNTERS, 0) for pk in dormitories.values_list('pk', flat=True)}
+    queries = (
+        dormitories.annotate(
+            students_total=Count('students', filter=Q(students__is_deleted=False)),
+            students_inside=Count('students', filter=Q(students__is_in_dormitory=True, students__is_deleted=False)),
+            students_deleted=Count('students', filter=Q(students__is_deleted=True)),
+        ).values('pk', 'students_total', 'students_inside', 'students_deleted'),
+        dormitories.annotate(
+            staff_total=Count('employees'),
+            staff_inside=Count('employees', filter=Q(employees__user__is_in_dormitory=True)),
+        ).values('pk', 'staff_total', 'staff_inside'),
+        dormitories.annotate(
+            rooms_count=Count('rooms'),
+            capacity=Sum('rooms__size'),
+        ).values('pk', 'rooms_count', 'capacity'),
+        dormitories.annotate(
+            occupied=Count('rooms__students', filter=Q(rooms__students__is_deleted=False)),
+        ).values('pk', 'occupied'),
+    )
+    for query in queries:
+        for row in query:
+            pk = row.pop('pk')
+            counts[pk].update({field: value or 0 for field, value in row.items()})
+    return counts
+
+
+def reconcile_rooms(dormitory_ids=None):
+    """Room.occupied/free_slots ni talabalar jadvali bilan tenglashtirish.
+
+    Natija: [(dormitory_id, 'xona <raqam>', band edi, band bo‘ldi)].
+    """
+    rooms = Room.objects.all()
+    if dormitory_ids is not None:
+        rooms = rooms.filter(dormitory_id__in=dormitory_ids)
+    # GROUP BY bilan FOR UPDATE ishlamaydi; oraliqdagi o‘zgarish keyingi tekshiruvda tuzatiladi
+    rooms = rooms.annotate(
+        actual=Count('students', filter=Q(students__is_deleted=False)),
+    ).only('pk', 'dormitory_id', 'number', 'size', 'occupied', 'free_slots')
+
+    drift, changed = [], []
+    for room in rooms:
+        free_slots = max(0, room.size - room.actual)
+        if (room.occupied, room.free_slots) != (room.actual, free_slots):
+            if room.occupied != room.actual:
+                drift.append((room.dormitory_id, f"xona {room.number}", room.occupied, room.actual))
+            room.occupied, room.free_slots = room.actual, free_slots
+            changed.append(room)
+    Room.objects.bulk_update(changed, ['occupied', 'free_slots'], batch_size=500)
+    return drift
+
+
+def reconcile(dormitory_ids=None):
+    """Hisoblagichlarni asosiy jadvallar bilan tenglashtirish.
+
+    Natija: farq chiqqanlar ro‘yxati [(dormitory_id, maydon, edi, bo‘ldi)].
+    """
+    drift = []
+    with transaction.atomic():
+        drift.extend(reconcile_rooms(dormitory_ids))
+        counts = count_occupancy(dormitory_ids)
+        rows = DormitoryOccupancy.objects.select_for_update().in_bulk(list(counts))
+        for dormitory_id, values in counts.items():
+            row = rows.get(dormitory_id)
+            if row is None:
+                DormitoryOccupancy.objects.create(dormitory_id=dormitory_id, **values)
+                continue
+            changed = [field for field, value in values.items() if getattr(row, field) != value]
+            for field in changed:
+                drift.append((dormitory_id, field, getattr(row, field), values[field]))
+                setattr(row, field, values[field])
+            if changed:
+                row.save(update_fields=changed + ['updated_at'])
+    return drift
+
+
+def occupancy_for(dormitories):
+    """{dormitory_id: DormitoryOccupancy}; qatori yo‘q yotoqxonalar shu yerda sanaladi."""
+    ids = [dormitory.pk for dormitory in dormitories]
+    rows = DormitoryOccupancy.objects.in_bulk(ids)
+    missing = [pk for pk in ids if pk not in rows]
+    if missing:
+        reconcile(missing)
+        rows.update(DormitoryOccupancy.objects.in_bulk(missing))
+    return rows
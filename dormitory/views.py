@@ -1,26 +1,20 @@
 from student.models import Student
-from decimal import Decimal
-from datetime import date
-from dateutil.relativedelta import relativedelta
 from django.views.generic import ListView, DetailView, UpdateView
 
 from django.contrib import messages
-from django.http import HttpResponse
 from .models import Room, Dormitory
-import pandas as pd
-from datetime import datetime
 from django.template.loader import render_to_string
 from django.shortcuts import redirect
 from django.views.generic.edit import CreateView, DeleteView
 from django.http import JsonResponse
 from django.urls import reverse_lazy
 from .forms import RoomForm
-from django.db.models import Count, F, IntegerField, Value, Case, When
-from decimal import Decimal, ROUND_HALF_UP
-from datetime import date
-from dateutil.relativedelta import relativedelta
+from .occupancy import occupancy_for
 from django.views.generic import DetailView
 from utils.utils import filter_by_user_role
+from utils.export import iterate, numbered, table_response
+from payment.debt import ensure_balances, balance_totals
+from payment.models import StudentBalance
 
 def load_rooms(request):
     dormitory_id = request.GET.get('dormitory')
@@ -77,7 +71,7 @@ class RoomDetailView(DetailView):
         room = self.object
         students = room.students.all()
         context['students'] = students
-        context['empty_slots'] = room.size - students.count()
+        context['empty_slots'] = room.free_slots
         return context
 
 class RoomDeleteView(DeleteView):
@@ -111,18 +105,7 @@ class RoomListView(ListView):
         number_q = self.request.GET.get('number', '').strip()
         status_q = self.request.GET.get('status', '').strip()
 
-        # Har bir xonadagi talabalar sonini hisoblash
-        queryset = queryset.annotate(occupied_count=Count('students'))
-
-        # 🔹 Bo‘sh joylar sonini hisoblash (room.empty_slots)
-        queryset = queryset.annotate(
-            empty_slots=Case(
-                When(size__gt=F('occupied_count'), then=F('size') - F('occupied_count')),
-                default=Value(0),
-                output_field=IntegerField()
-            )
-        )
-
+        # Band/bo‘sh joylar Room.occupied va Room.free_slots ustunlarida tayyor turadi
         # Filtrlar
         if dormitory_q:
             queryset = queryset.filter(dormitory__name__icontains=dormitory_q)
@@ -130,66 +113,48 @@ class RoomListView(ListView):
             queryset = queryset.filter(number__icontains=number_q)
 
         if status_q == 'free':
-            queryset = queryset.filter(occupied_count__lt=F('size'))
+            queryset = queryset.filter(free_slots__gt=0)
         elif status_q == 'full':
-            queryset = queryset.filter(occupied_count__gte=F('size'))
+            queryset = queryset.filter(free_slots=0)
 
-        return queryset.order_by('dormitory__name', 'number')
+        return queryset.select_related('dormitory').order_by('dormitory__name', 'number')
 
     def get(self, request, *args, **kwargs):
-        if request.GET.get("export") == "excel":
-            return self.export_to_excel(self.get_queryset())
+        export = request.GET.get("export")
+        if export in ("excel", "csv"):
+            return self.export_to_excel(self.get_queryset(), export)
         return super().get(request, *args, **kwargs)
 
-    def export_to_excel(self, queryset):
-        df = pd.DataFrame(list(queryset.values(
-            'dormitory__name', 'number', 'size'
-        )))
-        df.index = df.index + 1
-        df.insert(0, '№', df.index)
-        df.rename(columns={
-            'dormitory__name': 'Yotoqxona',
-            'number': 'Xona raqami',
-            'size': 'Sig‘imi'
-        }, inplace=True)
-
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        now = datetime.now().strftime("%Y-%m-%d_%H-%M")
-        filename = f"xonalar_{now}.xlsx"
-        response['Content-Disposition'] = f'attachment; filename={filename}'
-        df.to_excel(response, index=False)
-        return response
+    def export_to_excel(self, queryset, export_format="excel"):
+        headers = ['№', 'Yotoqxona', 'Xona raqami', 'Sig‘imi']
+        rows = numbered(iterate(queryset.values_list('dormitory__name', 'number', 'size')))
+        return table_response(export_format, "xonalar", "Xonalar", headers, rows)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         user = self.request.user
 
         if hasattr(user, 'director'):
-            dormitories = Dormitory.objects.filter(director=user.director).prefetch_related('rooms')
+            dormitories = Dormitory.objects.filter(director=user.director)
         elif hasattr(user, 'employee'):
-            dormitories = Dormitory.objects.filter(id=user.employee.dormitory_id).prefetch_related('rooms')
+            dormitories = Dormitory.objects.filter(id=user.employee.dormitory_id)
         else:
             dormitories = Dormitory.objects.none()
 
         context["total_count"] = self.get_queryset().count()
         context["dormitories"] = dormitories
 
+        # Sonlar DormitoryOccupancy hisoblagichlaridan (yotoqxona boshiga so‘rovsiz)
+        occupancy = occupancy_for(dormitories)
         dormitory_stats = []
         for dorm in dormitories:
-            rooms = dorm.rooms.all().annotate(occupied_count=Count('students'))
-            total_rooms = rooms.count()
-            total_students = sum(room.occupied_count for room in rooms)
-            total_capacity = sum(room.size for room in rooms)
-            empty_slots = max(0, total_capacity - total_students)
-
+            row = occupancy[dorm.pk]
             dormitory_stats.append({
                 'name': dorm.name,
-                'room_count': total_rooms,
-                'student_count': total_students,
-                'capacity': total_capacity,
-                'empty_slots': empty_slots,
+                'room_count': row.rooms_count,
+                'student_count': row.occupied,
+                'capacity': row.capacity,
+                'empty_slots': row.empty_slots,
             })
 
         context["dormitory_stats"] = dormitory_stats
@@ -223,52 +188,8 @@ class DormitoryDetailView(DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         dorm = self.get_object()
-        students = Student.objects.filter(dormitory=dorm).select_related('dormitory')
-
-        total_required = Decimal('0.00')
-        total_paid = Decimal('0.00')
-        total_debt = Decimal('0.00')
-
-        this_year = date.today().year
-        july1_this_year = date(this_year, 7, 1)
-        today = july1_this_year if date.today() < july1_this_year else date(this_year + 1, 7, 1)
-        TWO_PLACES = Decimal('0.01')
-
-        for student in students:
-            if not student.arrival_time:
-                continue
-
-            checkout = student.checkout_time or today
-            monthly = Decimal(dorm.monthly_payment or 0)
-            min_required_months = Decimal(dorm.default_monthly_payment or 0)
-            paid_total = Decimal(student.total_payment or 0)
-
-            delta = relativedelta(checkout, student.arrival_time)
-            months_passed = delta.years * 12 + delta.months
-            extra_days = (checkout - (student.arrival_time + relativedelta(months=months_passed))).days
-
-            daily_payment = monthly / Decimal(30) if monthly else Decimal(0)
-
-            # 🔹 Xuddi DebtStatisticsView dagidek mantiq:
-            if Decimal(months_passed) < min_required_months:
-                required_total = Decimal(months_passed) * monthly + Decimal(extra_days) * daily_payment
-            else:
-                required_total = min_required_months * monthly
-
-            debt = max(required_total - paid_total, Decimal(0))
-
-            # 🔹 Yaxlitlash
-            required_total = required_total.quantize(TWO_PLACES, rounding=ROUND_HALF_UP)
-            paid_total = paid_total.quantize(TWO_PLACES, rounding=ROUND_HALF_UP)
-            debt = debt.quantize(TWO_PLACES, rounding=ROUND_HALF_UP)
-
-            total_required += required_total
-            total_paid += paid_total
-            total_debt += debt
-
-        context["total_required"] = total_required.quantize(TWO_PLACES, rounding=ROUND_HALF_UP)
-        context["total_paid"] = total_paid.quantize(TWO_PLACES, rounding=ROUND_HALF_UP)
-        context["total_debt"] = total_debt.quantize(TWO_PLACES, rounding=ROUND_HALF_UP)
+        ensure_balances(Student.objects.filter(dormitory=dorm))
+        context.update(balance_totals(StudentBalance.objects.filter(dormitory=dorm)))
 
         return context
 
@@ -1,9 +1,51 @@
 from django.db import models
+from django.db.models.signals import post_init, post_save, pre_delete
+from django.dispatch import receiver
 from accounts.models import CustomUser
 from dormitory.models import Dormitory
+from dormitory.occupancy import apply_deltas, staff_deltas
 # Create your models here.
 class Employee(models.Model):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='employee')
     dormitory = models.ForeignKey(Dormitory, on_delete=models.CASCADE, null=True, blank=True, related_name='employees')
     def __str__(self):
-        return f"Xodim -> {self.user.get_full_name()}"
\ No newline at end of file
+        return f"Xodim -> {self.user.get_full_name()}"
+
+
+def _is_inside(user_id):
+    return bool(CustomUser.objects.filter(pk=user_id).values_list('is_in_dormitory', flat=True).first())
+
+
+@receiver(post_init, sender=Employee)
+def remember_employee_dormitory(sender, instance, **kwargs):
+    instance._loaded_dormitory_id = instance.__dict__.get('dormitory_id')
+
+
+@receiver(post_save, sender=Employee)
+def count_employee(sender, instance, created, **kwargs):
+    old_dormitory = None if created else instance._loaded_dormitory_id
+    if created or old_dormitory != instance.dormitory_id:
+        inside = _is_inside(instance.user_id)
+        apply_deltas(staff_deltas((old_dormitory, inside), (instance.dormitory_id, inside)))
+    instance._loaded_dormitory_id = instance.dormitory_id
+
+
+@receiver(pre_delete, sender=Employee)
+def uncount_employee(sender, instance, **kwargs):
+    # pre_delete: foydalanuvchi hali o‘chmagan (CASCADE), uning holatini o‘qish mumkin
+    apply_deltas(staff_deltas((instance.dormitory_id, _is_inside(instance.user_id)), None))
+
+
+@receiver(post_init, sender=CustomUser)
+def remember_user_presence(sender, instance, **kwargs):
+    instance._loaded_is_in_dormitory = instance.__dict__.get('is_in_dormitory')
+
+
+@receiver(post_save, sender=CustomUser)
+def count_user_presence(sender, instance, created, **kwargs):
+    old = instance._loaded_is_in_dormitory
+    instance._loaded_is_in_dormitory = instance.is_in_dormitory
+    if created or old is None or old == instance.is_in_dormitory:
+        return
+    dormitory_id = Employee.objects.filter(user_id=instance.pk).values_list('dormitory_id', flat=True).first()
+    apply_deltas(staff_deltas((dormitory_id, old), (dormitory_id, instance.is_in_dormitory)))
@@ -0,0 +1,17 @@
+from django.contrib import admin
+from .models import DeviceSyncJob, DeviceSyncProgress
+
+
+class DeviceSyncProgressInline(admin.TabularInline):
+    model = DeviceSyncProgress
+    extra = 0
+    readonly_fields = ('device', 'done', 'failed', 'updated_at')
+
+
+@admin.register(DeviceSyncJob)
+class DeviceSyncJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'action', 'employee_id', 'dormitory', 'status', 'attempts', 'next_run_at', 'updated_at')
+    list_filter = ('status', 'action', 'dormitory')
+    search_fields = ('employee_id', 'idempotency_key')
+    readonly_fields = ('created_at', 'updated_at')
+    inlines = [DeviceSyncProgressInline]
@@ -0,0 +1,30 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from jobs.tasks import run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = "Qurilmalar bilan sinxronlash vazifalarini bajaruvchi fon worker (Redis talab qilinmaydi)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Navbatni bir marta bo‘shatib chiqish")
+        parser.add_argument('--interval', type=float,
+                            default=getattr(settings, 'DEVICE_SYNC_POLL_INTERVAL', 1.0),
+                            help="Navbat bo‘sh bo‘lganda kutish vaqti (soniya)")
+
+    def handle(self, *args, **options):
+        if options['once']:
+            count = run_pending_jobs()
+            self.stdout.write(f"{count} ta vazifa bajarildi.")
+            return
+
+        self.stdout.write("Worker ishga tushdi. To‘xtatish uchun Ctrl+C.")
+        try:
+            while True:
+                close_old_connections()
+                if not run_pending_jobs(limit=50):
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Worker to‘xtatildi.")
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:42
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('dormitory', '0012_remove_device_main_ip'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeviceSyncJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('add', 'Qo‘shish'), ('update', 'Yangilash'), ('delete', 'O‘chirish'), ('block', 'Bloklash'), ('open', 'Blokdan chiqarish')], max_length=20)),
+                ('employee_id', models.CharField(db_index=True, max_length=20)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pending', 'Navbatda'), ('running', 'Bajarilmoqda'), ('done', 'Bajarildi'), ('failed', 'Xatolik'), ('cancelled', 'Bekor qilindi')], default='pending', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('max_attempts', models.PositiveSmallIntegerField(default=5)),
+                ('next_run_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('idempotency_key', models.CharField(max_length=200)),
+                ('device_results', models.JSONField(blank=True, default=dict)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('dormitory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_jobs', to='dormitory.dormitory')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'next_run_at'], name='sync_job_queue_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'running'])), fields=('idempotency_key',), name='unique_active_sync_job')],
+            },
+        ),
+    ]
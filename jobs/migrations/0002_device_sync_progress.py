@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dormitory', '0012_remove_device_main_ip'),
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='devicesyncjob',
+            name='action',
+            field=models.CharField(choices=[('add', 'Qo‘shish'), ('update', 'Yangilash'), ('delete', 'O‘chirish'), ('block', 'Bloklash'), ('open', 'Blokdan chiqarish'), ('bulk_enroll', 'Ommaviy yuklash')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='DeviceSyncProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('done', models.PositiveIntegerField(default=0)),
+                ('failed', models.JSONField(blank=True, default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('device', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_progress', to='dormitory.device')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='progress', to='jobs.devicesyncjob')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('job', 'device'), name='unique_sync_progress_per_device')],
+            },
+        ),
+    ]
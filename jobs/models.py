@@ -0,0 +1,79 @@
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+from dormitory.models import Dormitory, Device
+
+
+class DeviceSyncJob(models.Model):
+    """Qurilmalar bilan sinxronlash vazifasi (fon worker tomonidan bajariladi)."""
+
+    ACTION_CHOICES = [
+        ('add', 'Qo‘shish'),
+        ('update', 'Yangilash'),
+        ('delete', 'O‘chirish'),
+        ('block', 'Bloklash'),
+        ('open', 'Blokdan chiqarish'),
+        ('bulk_enroll', 'Ommaviy yuklash'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', 'Navbatda'),
+        ('running', 'Bajarilmoqda'),
+        ('done', 'Bajarildi'),
+        ('failed', 'Xatolik'),
+        ('cancelled', 'Bekor qilindi'),
+    ]
+
+    ACTIVE_STATUSES = ('pending', 'running')
+
+    action = models.CharField(max_length=20, choices=ACTION_CHOICES)
+    dormitory = models.ForeignKey(Dormitory, on_delete=models.CASCADE, related_name='sync_jobs')
+    employee_id = models.CharField(max_length=20, db_index=True)
+    payload = models.JSONField(default=dict, blank=True)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    next_run_at = models.DateTimeField(default=timezone.now)
+    idempotency_key = models.CharField(max_length=200)
+
+    # {qurilma_id: "ok" yoki xatolik matni} — qayta urinishda faqat xato bergan qurilmalar so‘raladi
+    device_results = models.JSONField(default=dict, blank=True)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_run_at'], name='sync_job_queue_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['idempotency_key'],
+                condition=Q(status__in=['pending', 'running']),
+                name='unique_active_sync_job',
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.get_action_display()} {self.employee_id} -> {self.dormitory.name} ({self.get_status_display()})"
+
+
+class DeviceSyncProgress(models.Model):
+    """Ommaviy vazifaning har bir qurilma bo‘yicha holati (to‘xtagan joydan davom ettirish uchun)."""
+
+    job = models.ForeignKey(DeviceSyncJob, on_delete=models.CASCADE, related_name='progress')
+    device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='sync_progress')
+    done = models.PositiveIntegerField(default=0)
+    failed = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['job', 'device'], name='unique_sync_progress_per_device')
+        ]
+
+    def __str__(self):
+        return f"{self.job_id} -> {self.device.ipaddress}: {self.done}"
@@ -0,0 +1,230 @@
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from accounts.models import release_id
+from utils.fanout import DeviceError, run_on_devices
+from utils.images import FaceCache, load_face
+from utils.hikvision import (add_user_to_device, delete_user_from_device, update_user_on_device,
+                             block_user_on_device, open_user_on_device, enroll_users_on_device)
+from .models import DeviceSyncJob, DeviceSyncProgress
+
+# action -> (bitta qurilma uchun funksiya, payload dan olinadigan argumentlar)
+ACTIONS = {
+    'add': (add_user_to_device, ('full_name', 'image_path')),
+    'update': (update_user_on_device, ('name',)),
+    'delete': (delete_user_from_device, ()),
+    'block': (block_user_on_device, ()),
+    'open': (open_user_on_device, ()),
+}
+
+# Yangi vazifa qo‘shilganda navbatdagi eski vazifalar bekor qilinadi (masalan, bloklash -> ochish)
+SUPERSEDES = {
+    'block': ('open',),
+    'open': ('block',),
+    'delete': ('add', 'update', 'block', 'open'),
+}
+
+# Shu vaqtdan beri yangilanmagan "running" vazifa to‘xtab qolgan worker niki deb hisoblanadi
+STALE_RUNNING_AFTER = timedelta(minutes=10)
+
+
+def enqueue(action, dormitory, employee_id, payload=None, key=None) -> DeviceSyncJob:
+    """Vazifani navbatga qo‘yish. Xuddi shu kalitli faol vazifa bo‘lsa, o‘sha qaytariladi.
+
+    Faol vazifaning payload i yangisi bilan almashtiriladi: navbatdagisi yangi ma'lumot bilan
+    bajariladi, bajarilayotgani esa tugagach qayta navbatga qo‘yiladi (run_job).
+    """
+    employee_id = str(employee_id)
+    key = key or f"{action}:{dormitory.pk}:{employee_id}"
+    payload = payload or {}
+
+    with transaction.atomic():
+        superseded = SUPERSEDES.get(action)
+        if superseded:
+            DeviceSyncJob.objects.filter(
+                dormitory=dormitory, employee_id=employee_id, action__in=superseded, status='pending'
+            ).update(status='cancelled', updated_at=timezone.now())
+
+        existing = DeviceSyncJob.objects.select_for_update().filter(
+            idempotency_key=key, status__in=DeviceSyncJob.ACTIVE_STATUSES
+        ).first()
+        if existing is None:
+            try:
+                with transaction.atomic():
+                    return DeviceSyncJob.objects.create(
+                        action=action,
+                        dormitory=dormitory,
+                        employee_id=employee_id,
+                        payload=payload,
+                        idempotency_key=key,
+                        max_attempts=getattr(settings, 'DEVICE_SYNC_MAX_ATTEMPTS', 5),
+                    )
+            except IntegrityError:
+                # Parallel so‘rov xuddi shu vazifani biroz oldin yaratgan
+                existing = DeviceSyncJob.objects.select_for_update().get(
+                    idempotency_key=key, status__in=DeviceSyncJob.ACTIVE_STATUSES
+                )
+
+        # Yangi payload eskisining ustiga yoziladi (masalan, o‘chirishdagi release_id saqlanib qoladi)
+        payload = {**existing.payload, **payload}
+        if existing.payload != payload:
+            old_payload, existing.payload = existing.payload, payload
+            if existing.status == 'pending':
+                _restart(existing, old_payload)
+                existing.save(update_fields=['payload', 'device_results', 'attempts', 'next_run_at', 'updated_at'])
+            else:
+                existing.save(update_fields=['payload', 'updated_at'])
+        return existing
+
+
+def _restart(job, old_payload):
+    """Yangi payload bilan vazifani boshidan bajarishga tayyorlash (saqlamaydi)."""
+    job.status = 'pending'
+    job.device_results = {}
+    job.attempts = 0
+    job.next_run_at = timezone.now()
+    if job.action == 'bulk_enroll':
+        old_users = old_payload.get('users', [])
+        if job.payload.get('users', [])[:len(old_users)] != old_users:
+            # Ro‘yxat faqat oxiridan to‘ldirilgan bo‘lsa yuklash to‘xtagan joydan davom etadi
+            job.progress.all().delete()
+
+
+def _save_result(job, fields):
+    """Natijani saqlash; bajarilayotganda payload almashgan bo‘lsa vazifa qayta navbatga qo‘yiladi."""
+    with transaction.atomic():
+        current = DeviceSyncJob.objects.select_for_update().values_list('payload', flat=True).get(pk=job.pk)
+        if current != job.payload:
+            old_payload, job.payload = job.payload, current
+            _restart(job, old_payload)
+            fields = sorted(set(fields) | {'status', 'device_results', 'attempts', 'next_run_at'})
+        job.save(update_fields=fields)
+
+
+def claim_next_job():
+    """Navbatdagi bitta vazifani band qilish (bir nechta worker bir vaqtda ishlay oladi)."""
+    now = timezone.now()
+    # Bitta foydalanuvchining vazifalari ketma-ket bajariladi (masalan, o‘chirish qo‘shishdan oldin tugamasin)
+    busy = DeviceSyncJob.objects.filter(
+        dormitory=OuterRef('dormitory'), employee_id=OuterRef('employee_id'),
+        status='running', updated_at__gte=now - STALE_RUNNING_AFTER,
+    ).exclude(pk=OuterRef('pk'))
+    with transaction.atomic():
+        job = (
+            DeviceSyncJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                Q(status='pending', next_run_at__lte=now) |
+                Q(status='running', updated_at__lt=now - STALE_RUNNING_AFTER)
+            )
+            .exclude(Exists(busy))
+            .order_by('next_run_at', 'id')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = 'running'
+        job.save(update_fields=['status', 'updated_at'])
+        return job
+
+
+def backoff_delay(attempts):
+    base = getattr(settings, 'DEVICE_SYNC_BACKOFF', 10)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), 3600))
+
+
+def _bulk_enroll_on_device(device, job, faces, stopped):
+    """Bitta qurilmaga ommaviy yuklash, holat har partiyadan keyin saqlanadi.
+
+    stopped o‘rnatilgach (deadline tugadi, vazifa qayta navbatga qo‘yildi) holat yozilmaydi va oqim to‘xtaydi:
+    aks holda qayta urinish bilan bir vaqtda bitta DeviceSyncProgress qatoriga yoziladi.
+    """
+    users = job.payload.get('users', [])
+    try:
+        progress, _ = DeviceSyncProgress.objects.get_or_create(job=job, device=device)
+
+        def save_batch(done, failed):
+            if stopped.is_set():
+                raise DeviceError(f"[{device.ipaddress}] Kutish vaqti tugadi, yuklash to‘xtatildi")
+            progress.done = done
+            progress.failed = progress.failed + failed
+            progress.save(update_fields=['done', 'failed', 'updated_at'])
+            # Uzoq davom etadigan vazifa boshqa worker tomonidan "to‘xtab qolgan" deb olinmasligi uchun
+            DeviceSyncJob.objects.filter(pk=job.pk).update(updated_at=timezone.now())
+
+        return enroll_users_on_device(device, users, start=progress.done, on_batch=save_batch, faces=faces)
+    finally:
+        # Fan-out oqimi o‘z ulanishini yopadi
+        connection.close()
+
+
+def _run_devices(job, devices):
+    if job.action == 'bulk_enroll':
+        deadline = getattr(settings, 'DEVICE_SYNC_BULK_DEADLINE', 3600)
+        # Suratlar barcha qurilmalar uchun bir marta tayyorlanadi
+        faces = FaceCache()
+        stopped = threading.Event()
+        try:
+            return run_on_devices(devices, _bulk_enroll_on_device, job, faces, stopped, deadline=deadline)
+        finally:
+            # deadline dan keyin ham ishlayotgan oqimlar keyingi partiyada to‘xtaydi
+            stopped.set()
+
+    func, arg_names = ACTIONS[job.action]
+    args = [job.payload.get(name) for name in arg_names]
+    if job.action == 'add':
+        # Surat bir marta o‘qiladi, barcha qurilmalarga shu baytlar yuboriladi
+        args[-1] = load_face(args[-1]) or args[-1]
+    return run_on_devices(devices, func, job.employee_id, *args)
+
+
+def run_job(job: DeviceSyncJob) -> DeviceSyncJob:
+    """Vazifani faqat hali muvaffaqiyatli bajarilmagan qurilmalarda bajarish."""
+    done_devices = [int(pk) for pk, result in job.device_results.items() if result == 'ok']
+    devices = job.dormitory.devices.exclude(pk__in=done_devices)
+
+    errors = []
+    for result in _run_devices(job, devices):
+        job.device_results[str(result.device.pk)] = 'ok' if result.ok else result.error
+        if not result.ok:
+            errors.append(result.error)
+
+    job.attempts += 1
+    if not errors:
+        job.status = 'done'
+        job.last_error = ''
+    else:
+        job.last_error = "; ".join(errors)
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+        else:
+            job.status = 'pending'
+            job.next_run_at = timezone.now() + backoff_delay(job.attempts)
+
+    _save_result(job, ['device_results', 'attempts', 'status', 'last_error', 'next_run_at', 'updated_at'])
+    if job.status == 'done' and job.action == 'delete' and job.payload.get('release_id'):
+        # Foydalanuvchi barcha qurilmalardan o‘chdi: endi uning ID si yangi odamga berilishi mumkin
+        release_id(job.payload['release_id'], int(job.employee_id))
+    return job
+
+
+def run_pending_jobs(limit=None):
+    """Navbatdagi vazifalarni bajarish, bajarilganlar sonini qaytaradi."""
+    count = 0
+    while limit is None or count < limit:
+        job = claim_next_job()
+        if job is None:
+            break
+        try:
+            run_job(job)
+        except Exception as e:
+            job.attempts += 1
+            job.last_error = f"Istisno yuz berdi: {e}"
+            job.status = 'failed' if job.attempts >= job.max_attempts else 'pending'
+            job.next_run_at = timezone.now() + backoff_delay(job.attempts)
+            _save_result(job, ['attempts', 'status', 'last_error', 'next_run_at', 'updated_at'])
+        count += 1
+    return count
@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import job_status, job_list
+
+urlpatterns = [
+    path('', job_list, name='sync_jobs'),
+    path('<int:pk>/', job_status, name='sync_job_status'),
+]
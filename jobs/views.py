@@ -0,0 +1,58 @@
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from utils.utils import filter_by_user_role
+from .models import DeviceSyncJob
+
+
+def job_to_dict(job):
+    return {
+        "id": job.pk,
+        "action": job.action,
+        "employee_id": job.employee_id,
+        "status": job.status,
+        "status_display": job.get_status_display(),
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "next_run_at": job.next_run_at.isoformat(),
+        "last_error": job.last_error,
+        "device_results": job.device_results,
+        "updated_at": job.updated_at.isoformat(),
+    }
+
+
+def job_progress(job):
+    """Ommaviy vazifa uchun: har qurilmada nechta bajarildi va umumiy natija."""
+    total = len(job.payload.get('users', []))
+    rows = list(job.progress.select_related('device'))
+    failed = set()
+    for row in rows:
+        failed.update(row.failed)
+    return {
+        "total": total,
+        "done": min((row.done for row in rows), default=0),
+        "devices": {row.device.ipaddress: row.done for row in rows},
+        "success_count": total - len(failed) if job.status == 'done' else None,
+        "failed_count": len(failed),
+    }
+
+
+def job_status(request, pk):
+    """UI so‘rab turadigan vazifa holati."""
+    queryset = filter_by_user_role(DeviceSyncJob.objects.all(), request.user)
+    job = get_object_or_404(queryset, pk=pk)
+    data = job_to_dict(job)
+    if job.action == 'bulk_enroll':
+        data["progress"] = job_progress(job)
+    return JsonResponse(data)
+
+
+def job_list(request):
+    """Xodim/talaba bo‘yicha oxirgi vazifalar: ?employee_id=10001"""
+    queryset = filter_by_user_role(DeviceSyncJob.objects.all(), request.user)
+    employee_id = request.GET.get('employee_id', '').strip()
+    if employee_id:
+        queryset = queryset.filter(employee_id=employee_id)
+    status = request.GET.get('status', '').strip()
+    if status:
+        queryset = queryset.filter(status=status)
+    return JsonResponse({"jobs": [job_to_dict(job) for job in queryset[:20]]})
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Payment
+from .models import Payment, StudentBalance
 
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
@@ -12,3 +12,10 @@ class PaymentAdmin(admin.ModelAdmin):
     def has_change_permission(self, request, obj=None):
         return False
 
+
+@admin.register(StudentBalance)
+class StudentBalanceAdmin(admin.ModelAdmin):
+    list_display = ('student', 'dormitory', 'paid_total', 'required_total', 'debt', 'recomputed_at')
+    list_filter = ('dormitory',)
+    search_fields = ('student__first_name', 'student__last_name')
+    readonly_fields = [field.name for field in StudentBalance._meta.fields]
@@ -0,0 +1,142 @@
+from datetime import date
+from decimal import Decimal, ROUND_HALF_UP
+import numpy as np
+from django.db import transaction
+from django.db.models import DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from .models import StudentBalance
+
+TWO_PLACES = Decimal('0.01')
+
+
+def contract_end_date(today=None):
+    """To‘lov hisoblanadigan oxirgi sana: o‘quv yili tugaydigan navbatdagi 1-iyul."""
+    today = today or date.today()
+    july1_this_year = date(today.year, 7, 1)
+    return july1_this_year if today < july1_this_year else date(today.year + 1, 7, 1)
+
+
+def _add_months(start_month, start_day, months):
+    """start + months oy (oy oxiri bo‘yicha qisqartirib, relativedelta kabi)."""
+    target = start_month + months.astype('timedelta64[M]')
+    target_days = target.astype('datetime64[D]')
+    month_length = ((target + 1).astype('datetime64[D]') - target_days).astype(int)
+    return target_days + (np.minimum(start_day, month_length) - 1).astype('timedelta64[D]')
+
+
+def months_and_days(arrivals, checkouts):
+    """relativedelta(checkout, arrival) dagi to‘liq oylar va qolgan kunlarni barcha talabalar uchun birdan hisoblash."""
+    arrivals = np.array(arrivals, dtype='datetime64[D]')
+    checkouts = np.array(checkouts, dtype='datetime64[D]')
+
+    arrival_month = arrivals.astype('datetime64[M]')
+    arrival_day = (arrivals - arrival_month.astype('datetime64[D]')).astype(int) + 1
+    months = (checkouts.astype('datetime64[M]') - arrival_month).astype(int)
+
+    # Oylar farqi bir oy ko‘p chiqishi mumkin (masalan 31-yanvar -> 30-mart), bir qadam tuzatamiz
+    anchor = _add_months(arrival_month, arrival_day, months)
+    forward = checkouts >= arrivals
+    months = np.where(forward, months - (checkouts < anchor), months + (checkouts > anchor))
+
+    anchor = _add_months(arrival_month, arrival_day, months)
+    days = (checkouts - anchor).astype(int)
+    return months, days
+
+
+def compute_debts(students, today=None):
+    """Talabalar bo‘yicha kerakli to‘lov, to‘langan summa va qarzdorlikni hisoblash.
+
+    To‘lovlar bitta Sum annotatsiyasi bilan olinadi, oylar/kunlar NumPy da vektor
+    ko‘rinishida hisoblanadi. Kelgan sanasi yo‘q talabalar tashlab ketiladi.
+    Har bir talabaga months_passed, extra_days, required_total, paid_total va debt
+    atributlari qo‘shilib, ro‘yxat qaytariladi.
+    """
+    end_date = contract_end_date(today)
+    students = list(
+        students.filter(arrival_time__isnull=False)
+        .select_related('dormitory')
+        .annotate(paid_sum=Coalesce(
+            Sum('payments__amount'), Value(0), output_field=DecimalField(max_digits=12, decimal_places=2)
+        ))
+    )
+    if not students:
+        return []
+
+    months, days = months_and_days(
+        [student.arrival_time for student in students],
+        [student.checkout_time or end_date for student in students],
+    )
+
+    for student, months_passed, extra_days in zip(students, months.tolist(), days.tolist()):
+        monthly = Decimal(student.dormitory.monthly_payment or 0)
+        min_required_months = Decimal(student.dormitory.default_monthly_payment or 0)
+        paid_total = Decimal(student.paid_sum or 0)
+        daily_payment = monthly / Decimal(30) if monthly else Decimal(0)
+
+        if Decimal(months_passed) < min_required_months:
+            required_total = Decimal(months_passed) * monthly + Decimal(extra_days) * daily_payment
+        else:
+            required_total = min_required_months * monthly
+
+        debt = max(required_total - paid_total, Decimal(0))
+
+        student.months_passed = months_passed
+        student.extra_days = extra_days
+        student.required_total = required_total.quantize(TWO_PLACES, rounding=ROUND_HALF_UP)
+        student.paid_total = paid_total.quantize(TWO_PLACES, rounding=ROUND_HALF_UP)
+        student.debt = debt.quantize(TWO_PLACES, rounding=ROUND_HALF_UP)
+
+    return students
+
+
+def refresh_balances(students, today=None):
+    """Berilgan talabalar uchun StudentBalance yozuvlarini qayta hisoblash (bitta bulk upsert bilan)."""
+    end_date = contract_end_date(today)
+    rows = [
+        StudentBalance(
+            student=student,
+            dormitory_id=student.dormitory_id,
+            months_passed=student.months_passed,
+            extra_days=student.extra_days,
+            paid_total=student.paid_total,
+            required_total=student.required_total,
+            debt=student.debt,
+            period_end=end_date,
+        )
+        for student in compute_debts(students, today)
+    ]
+
+    with transaction.atomic():
+        # Kelgan sanasi olib tashlangan talabaning balansi endi hisoblanmaydi
+        StudentBalance.objects.filter(
+            student__in=students.filter(arrival_time__isnull=True)
+        ).delete()
+        StudentBalance.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['student'],
+            update_fields=['dormitory', 'months_passed', 'extra_days', 'paid_total',
+                           'required_total', 'debt', 'period_end', 'recomputed_at'],
+        )
+    return len(rows)
+
+
+def ensure_balances(students, today=None):
+    """Balansi yo‘q yoki o‘tgan o‘quv yili uchun hisoblangan talabalarni yangilash."""
+    stale = students.filter(arrival_time__isnull=False).filter(
+        Q(balance__isnull=True) | Q(balance__period_end__lt=contract_end_date(today))
+    )
+    if stale.exists():
+        return refresh_balances(stale, today)
+    return 0
+
+
+def balance_totals(balances):
+    """StudentBalance so‘rovi bo‘yicha umumiy summalar (bitta aggregate so‘rov)."""
+    totals = balances.aggregate(
+        total_required=Sum('required_total'),
+        total_paid=Sum('paid_total'),
+        total_debt=Sum('debt'),
+    )
+    return {key: (value or Decimal('0.00')).quantize(TWO_PLACES, rounding=ROUND_HALF_UP)
+            for key, value in totals.items()}
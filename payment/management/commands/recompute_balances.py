@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from student.models import Student
+from payment.debt import refresh_balances
+
+
+class Command(BaseCommand):
+    help = "Barcha talabalarning StudentBalance yozuvlarini qaytadan hisoblash"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dormitory', type=int, help="Faqat shu yotoqxona (id) talabalari")
+
+    def handle(self, *args, **options):
+        students = Student.objects.all()
+        if options['dormitory']:
+            students = students.filter(dormitory_id=options['dormitory'])
+        count = refresh_balances(students)
+        self.stdout.write(f"{count} ta talaba balansi yangilandi.")
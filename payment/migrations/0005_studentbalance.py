@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dormitory', '0012_remove_device_main_ip'),
+        ('payment', '0004_alter_payment_student'),
+        ('student', '0010_alter_student_parent_login_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentBalance',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('months_passed', models.IntegerField(default=0)),
+                ('extra_days', models.IntegerField(default=0)),
+                ('paid_total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('required_total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('debt', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('period_end', models.DateField()),
+                ('recomputed_at', models.DateTimeField(auto_now=True)),
+                ('dormitory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balances', to='dormitory.dormitory')),
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='balance', to='student.student')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dormitory', 'debt'], name='balance_dormitory_debt_idx'), models.Index(fields=['period_end'], name='balance_period_end_idx')],
+            },
+        ),
+    ]
@@ -1,6 +1,9 @@
 from django.db import models
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
 from student.models import Student
 from accounts.models import CustomUser
+from dormitory.models import Dormitory
 
 # Create your models here.
 class Payment(models.Model):
@@ -15,4 +18,63 @@ class Payment(models.Model):
         return f"{self.student} - {self.amount} so‘m - {self.add_time.strftime('%Y-%m-%d %H:%M')}"
 
 class MonthlyPayment(models.Model):
-    monthly = models.PositiveIntegerField()
\ No newline at end of file
+    monthly = models.PositiveIntegerField()
+
+
+class StudentBalance(models.Model):
+    """Talabaning hisoblangan to‘lov holati (qarzdorlik ro‘yxati va filtrlari shu jadvaldan o‘qiladi)."""
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, related_name='balance')
+    dormitory = models.ForeignKey(Dormitory, on_delete=models.CASCADE, related_name='balances')
+    months_passed = models.IntegerField(default=0)
+    extra_days = models.IntegerField(default=0)
+    paid_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    required_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    debt = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    period_end = models.DateField()  # hisob qaysi sanagacha qilingan (1-iyul o‘tgach qayta hisoblanadi)
+    recomputed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['dormitory', 'debt'], name='balance_dormitory_debt_idx'),
+            models.Index(fields=['period_end'], name='balance_period_end_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student} - qarz: {self.debt} so‘m"
+
+
+# Balansni yangilash: to‘lov qo‘shilganda, talaba sanalari yoki yotoqxona tarifi o‘zgarganda
+BALANCE_STUDENT_FIELDS = {'arrival_time', 'checkout_time', 'dormitory'}
+BALANCE_DORMITORY_FIELDS = ('monthly_payment', 'default_monthly_payment')
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def update_balance_on_payment(sender, instance, **kwargs):
+    from .debt import refresh_balances
+    if instance.student_id:
+        refresh_balances(Student.objects.filter(pk=instance.student_id))
+
+
+@receiver(post_save, sender=Student)
+def update_balance_on_student_change(sender, instance, created, update_fields=None, **kwargs):
+    from .debt import refresh_balances
+    if created or update_fields is None or BALANCE_STUDENT_FIELDS & set(update_fields):
+        refresh_balances(Student.objects.filter(pk=instance.pk))
+
+
+@receiver(pre_save, sender=Dormitory)
+def remember_dormitory_tariff(sender, instance, update_fields=None, **kwargs):
+    if instance.pk and (update_fields is None or set(BALANCE_DORMITORY_FIELDS) & set(update_fields)):
+        instance._old_tariff = (
+            Dormitory.objects.filter(pk=instance.pk).values_list(*BALANCE_DORMITORY_FIELDS).first()
+        )
+
+
+@receiver(post_save, sender=Dormitory)
+def update_balances_on_tariff_change(sender, instance, **kwargs):
+    from .debt import refresh_balances
+    old_tariff = instance.__dict__.pop('_old_tariff', None)
+    new_tariff = tuple(getattr(instance, field) for field in BALANCE_DORMITORY_FIELDS)
+    if old_tariff is not None and old_tariff != new_tariff:
+        refresh_balances(Student.objects.filter(dormitory=instance))
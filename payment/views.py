@@ -1,18 +1,16 @@
 from django.views.generic.edit import CreateView
 from django.contrib.auth.mixins import LoginRequiredMixin
-from datetime import date
-from dateutil.relativedelta import relativedelta
 from django.views.generic import ListView
 from django.views import View
 from django.http import JsonResponse, HttpResponse
-from django.db.models import Q
-from datetime import datetime
-import pandas as pd
-from .models import Payment, Student
-from decimal import Decimal
+from django.db.models import F, Q
+from django.db.models.functions import Lower
+from utils.export import iterate, numbered, fmt_date, table_response
+from .models import Payment, Student, StudentBalance
+from .debt import ensure_balances, balance_totals
 from django.contrib import messages
 from django.shortcuts import redirect
-from utils.hikvision import block_user_on_devices, open_user_on_devices
+from jobs.tasks import enqueue
 from utils.utils import filter_by_user_role_payment
 from django.template.loader import render_to_string
 
@@ -39,19 +37,17 @@ class DebtStatisticsView(ListView):
             blocked = 0
             for student in students:
                 if student.debt > 0:
-                    ok, _ = block_user_on_devices(student.dormitory, str(student.pk))
-                    if ok:
-                        blocked += 1
-            messages.success(request, f"{blocked} ta qarzdor bloklandi.")
+                    enqueue('block', student.dormitory, student.pk)
+                    blocked += 1
+            messages.success(request, f"{blocked} ta qarzdor bloklash uchun navbatga qo‘yildi.")
             return redirect("debt_statistics")
 
         elif action == "open_all":
             opened = 0
             for student in students:
-                ok, _ = open_user_on_devices(student.dormitory, str(student.pk))
-                if ok:
-                    opened += 1
-            messages.success(request, f"{opened} ta talaba blokdan chiqarildi.")
+                enqueue('open', student.dormitory, student.pk)
+                opened += 1
+            messages.success(request, f"{opened} ta talaba blokdan chiqarish uchun navbatga qo‘yildi.")
             return redirect("debt_statistics")
 
         messages.error(request, "Noto‘g‘ri amal.")
@@ -75,48 +71,25 @@ class DebtStatisticsView(ListView):
         if q:
             queryset = queryset.filter(Q(first_name__icontains=q) | Q(last_name__icontains=q))
 
-        results = []
-        this_year = date.today().year
-        july1_this_year = date(this_year, 7, 1)
-        today = july1_this_year if date.today() < july1_this_year else date(this_year + 1, 7, 1)
+        # Balans jadvali yangi o‘quv yili yoki yangi talabalar uchun kerak bo‘lsa to‘ldiriladi
+        ensure_balances(queryset)
 
-        for student in queryset:
-            if not student.arrival_time:
-                continue
+        queryset = queryset.filter(balance__isnull=False).select_related('dormitory').annotate(
+            months_passed=F('balance__months_passed'),
+            extra_days=F('balance__extra_days'),
+            required_total=F('balance__required_total'),
+            paid_total=F('balance__paid_total'),
+            debt=F('balance__debt'),
+        )
 
-            checkout = student.checkout_time or today
-            monthly = Decimal(student.dormitory.monthly_payment or 0)
-            min_required_months = Decimal(student.dormitory.default_monthly_payment or 0)
-            paid_total = Decimal(student.total_payment or 0)
+        if debt_filter == 'debtors':
+            queryset = queryset.filter(balance__debt__gt=0)
+        elif debt_filter == 'no_debt':
+            queryset = queryset.filter(balance__debt=0)
+        elif debt_filter:
+            queryset = queryset.none()
 
-            delta = relativedelta(checkout, student.arrival_time)
-            months_passed = delta.years * 12 + delta.months
-            extra_days = (checkout - (student.arrival_time + relativedelta(months=months_passed))).days
-
-            daily_payment = monthly / Decimal(30)
-
-            if months_passed < min_required_months:
-                required_total = Decimal(months_passed) * monthly + Decimal(extra_days) * daily_payment
-            else:
-                required_total = min_required_months * monthly
-
-            debt = max(required_total - paid_total, Decimal(0))
-
-            if (
-                debt_filter == 'debtors' and debt > 0
-                or debt_filter == 'no_debt' and debt == 0
-                or debt_filter == ''
-            ):
-                student.months_passed = months_passed
-                student.extra_days = extra_days
-                student.required_total = round(required_total, 2)
-                student.paid_total = float(paid_total)
-                student.debt = round(debt, 2)
-                results.append(student)
-
-        results = sorted(results, key=lambda s: (s.first_name.lower(), s.last_name.lower()))
-
-        return results
+        return queryset.order_by(Lower('first_name'), Lower('last_name'))
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -124,10 +97,7 @@ class DebtStatisticsView(ListView):
         context['q'] = self.request.GET.get('q', '')
         context['debt_filter'] = self.request.GET.get('debt_filter', '')
 
-        students = context['students']
-        context['total_required'] = sum(s.required_total for s in students)
-        context['total_paid'] = sum(s.paid_total for s in students)
-        context['total_debt'] = sum(s.debt for s in students)
+        context.update(balance_totals(StudentBalance.objects.filter(student__in=self.object_list.values('pk'))))
 
         return context
 
@@ -205,8 +175,9 @@ class PaymentListView(ListView):
         return context
 
     def get(self, request, *args, **kwargs):
-        if request.GET.get("export") == "excel":
-            return self.export_to_excel()
+        export = request.GET.get("export")
+        if export in ("excel", "csv"):
+            return self.export_to_excel(export)
 
         self.object_list = self.get_queryset()
         context = self.get_context_data()
@@ -217,46 +188,26 @@ class PaymentListView(ListView):
 
         return self.render_to_response(context)
 
-    def export_to_excel(self):
-        queryset = self.get_queryset()
-
-        df = pd.DataFrame(list(queryset.values(
-            'student__first_name', 'student__last_name', 'student__room__number',
-            'amount', 'add_time', 'payment_time', 'added_by__first_name', 'added_by__last_name'
-        )))
-
-        df.index += 1
-        df.insert(0, '№', df.index)
-
-        df.rename(columns={
-            'student__first_name': 'Ismi',
-            'student__last_name': 'Familiyasi',
-            'student__room__number': 'Xonasi',
-            'amount': 'To‘lov miqdori',
-            'add_time': 'Qo‘shilgan vaqt',
-            'payment_time': 'Chek sanasi',
-            'added_by__first_name': 'Qo‘shgan (Ism)',
-            'added_by__last_name': 'Qo‘shgan (Familiya)',
-        }, inplace=True)
-
-        # Sana formatini to‘g‘rilash
-        if 'Qo‘shilgan vaqt' in df.columns:
-            df['Qo‘shilgan vaqt'] = pd.to_datetime(df['Qo‘shilgan vaqt'], errors='coerce').dt.strftime('%Y-%m-%d %H:%M')
-        else:
-            print("⚠️ Ustun topilmadi: Qo‘shilgan vaqt")
+    def export_to_excel(self, export_format="excel"):
+        queryset = self.get_queryset().select_related('student__room', 'added_by')
 
-        if 'Chek sanasi' in df.columns:
-            df['Chek sanasi'] = pd.to_datetime(df['Chek sanasi'], errors='coerce').dt.strftime('%Y-%m-%d')
-        else:
-            print("⚠️ Ustun topilmadi: Chek sanasi")
+        headers = ['№', 'Ismi', 'Familiyasi', 'Xonasi', 'To‘lov miqdori', 'Qo‘shilgan vaqt',
+                   'Chek sanasi', 'Qo‘shgan (Ism)', 'Qo‘shgan (Familiya)']
+        def rows():
+            for payment in iterate(queryset):
+                student, added_by = payment.student, payment.added_by
+                yield [
+                    student.first_name if student else '',
+                    student.last_name if student else '',
+                    student.room.number if student and student.room else '',
+                    payment.amount,
+                    fmt_date(payment.add_time, '%Y-%m-%d %H:%M'),
+                    fmt_date(payment.payment_time),
+                    added_by.first_name if added_by else '',
+                    added_by.last_name if added_by else '',
+                ]
 
-        now = datetime.now().strftime("%Y-%m-%d_%H-%M")
-        filename = f"tolovlar_{now}.xlsx"
-
-        response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = f'attachment; filename={filename}'
-        df.to_excel(response, index=False)
-        return response
+        return table_response(export_format, "tolovlar", "To‘lovlar", headers, numbered(rows()))
 
 
 class PaymentCreateView(LoginRequiredMixin, CreateView):
@@ -290,8 +241,6 @@ class PaymentCreateView(LoginRequiredMixin, CreateView):
         self.object.added_by = self.request.user
         self.object.save()
 
-        student.save()
-
         return JsonResponse({'success': True})
 
     def form_invalid(self, form):
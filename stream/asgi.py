@@ -0,0 +1,71 @@
+import asyncio
+from urllib.parse import parse_qs
+from django.conf import settings
+from .hub import hub, format_sse
+from .bus import listener
+
+SSE_PATH = '/stream/events/'
+
+
+def _last_event_id(scope):
+    """Brauzer qayta ulanganda Last-Event-ID sarlavhasini yuboradi (yoki ?lastEventId=)."""
+    value = dict(scope.get('headers') or []).get(b'last-event-id', b'').decode()
+    if not value:
+        value = parse_qs(scope.get('query_string', b'').decode()).get('lastEventId', [''])[0]
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+async def _wait_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+async def sse_app(scope, receive, send):
+    """Jonli eventlar oqimi (text/event-stream).
+
+    Har bir mijoz uchun oqim (thread) band qilinmaydi: hammasi bitta event loopda,
+    heartbeat ham shu yerda yuboriladi.
+    """
+    if scope['method'] != 'GET':
+        await send({'type': 'http.response.start', 'status': 405, 'headers': [(b'allow', b'GET')]})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [
+            (b'content-type', b'text/event-stream; charset=utf-8'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),  # nginx javobni buferlamasligi uchun
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n', 'more_body': True})
+
+    # Boshqa worker larda qabul qilingan eventlar ham shu jarayonga kelishi uchun
+    listener.ensure_started()
+
+    heartbeat = getattr(settings, 'STREAM_HEARTBEAT', 15)
+    subscription = hub.subscribe(_last_event_id(scope))
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    try:
+        while not disconnected.done():
+            next_message = asyncio.ensure_future(subscription.get(heartbeat))
+            await asyncio.wait({next_message, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected.done():
+                next_message.cancel()
+                break
+
+            message = next_message.result()
+            chunk = format_sse(message) if message else ":keep-alive\n\n"
+            await send({'type': 'http.response.body', 'body': chunk.encode(), 'more_body': True})
+    except OSError:
+        pass  # mijoz uzilgan
+    finally:
+        subscription.close()
+        disconnected.cancel()
@@ -0,0 +1,132 @@
+import json
+import os
+import select
+import threading
+import time
+from django.conf import settings
+from django.db import connection, connections
+from django.utils.html import escape
+from .hub import hub
+from .ingest import recent_events
+
+CHANNEL = 'stream_events'
+# Event id lari barcha worker lar uchun umumiy (stream/migrations/0001_event_id_sequence.py)
+SEQUENCE = 'stream_event_id'
+# PostgreSQL NOTIFY payload chegarasi 8000 bayt
+MAX_PAYLOAD = 7900
+PROCESS_ID = f"{os.getpid()}-{time.time_ns()}"
+
+
+def is_enabled():
+    """Bus faqat PostgreSQL da ishlaydi, boshqa bazada eventlar faqat shu jarayonga tarqatiladi."""
+    return connection.vendor == 'postgresql' and getattr(settings, 'STREAM_BUS_ENABLED', True)
+
+
+def render_event(event_json):
+    return (
+        "<div style='margin:10px;padding:10px;border:1px solid #ccc;'>"
+        "<pre style='white-space:pre-wrap;font-size:12px;'>"
+        f"{escape(json.dumps(event_json, indent=2, ensure_ascii=False))}</pre></div>"
+    )
+
+
+def _shrink(event_json):
+    """Katta eventdan faqat kerakli maydonlarni qoldirish."""
+    access_event = event_json.get("AccessControllerEvent") or {}
+    return {
+        "ipAddress": event_json.get("ipAddress"),
+        "dateTime": event_json.get("dateTime"),
+        "eventType": event_json.get("eventType"),
+        "AccessControllerEvent": {
+            key: access_event.get(key)
+            for key in ("employeeNoString", "name", "serialNo", "majorEventType", "subEventType")
+        },
+    }
+
+
+def _dispatch(message):
+    """Bus dan (yoki mahalliy) kelgan xabarni shu jarayonning hub iga uzatish."""
+    if message.get('key') and message.get('origin') != PROCESS_ID:
+        # Boshqa worker qayta ishlagan event: shu yerga qayta kelsa takroriy deb tashlanadi
+        recent_events.add(message['key'])
+    hub.publish(render_event(message['data']), event_id=message['id'])
+
+
+def _next_event_id():
+    """Bir vaqtda event qabul qilgan ikki worker bir xil id bermasligi uchun id bazadagi ketma-ketlikdan olinadi."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT nextval(%s)", [SEQUENCE])
+        return cursor.fetchone()[0]
+
+
+def publish_event(event_json, key=None):
+    """Webhook eventini barcha worker larning jonli oqimiga yuborish."""
+    if not is_enabled():
+        _dispatch({'id': hub.next_id(), 'key': key, 'origin': PROCESS_ID, 'data': event_json})
+        return
+
+    listener.ensure_started()
+    message = {'id': _next_event_id(), 'key': key, 'origin': PROCESS_ID, 'data': event_json}
+    payload = json.dumps(message, ensure_ascii=False, separators=(',', ':'))
+    if len(payload.encode()) > MAX_PAYLOAD:
+        message['data'] = _shrink(event_json)
+        payload = json.dumps(message, ensure_ascii=False, separators=(',', ':'))
+
+    # Xabar shu jarayonga ham LISTEN orqali qaytadi, shuning uchun hub ga to‘g‘ridan-to‘g‘ri yozilmaydi
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_notify(%s, %s)", [CHANNEL, payload])
+
+
+class Listener:
+    """Har bir jarayonda bitta fon oqimi: alohida ulanishda LISTEN qilib, xabarlarni hub ga beradi."""
+
+    def __init__(self):
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        if not is_enabled():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='stream-bus-listener', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        delay = 1
+        while True:
+            conn = None
+            try:
+                db = connections['default']
+                conn = db.get_new_connection(db.get_connection_params())
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL};")
+                print(f"[BUS] {CHANNEL} kanali tinglanmoqda")
+                delay = 1
+                self._listen(conn)
+            except Exception as e:
+                print(f"[BUS] Tinglovchi xatosi: {e}, {delay} soniyadan keyin qayta ulanadi")
+                time.sleep(delay)
+                delay = min(delay * 2, 30)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+    def _listen(self, conn):
+        while True:
+            if select.select([conn], [], [], 30) == ([], [], []):
+                continue
+            conn.poll()
+            while conn.notifies:
+                notify = conn.notifies.pop(0)
+                try:
+                    _dispatch(json.loads(notify.payload))
+                except (ValueError, KeyError) as e:
+                    print(f"[BUS] Noto‘g‘ri xabar: {e}")
+
+
+listener = Listener()
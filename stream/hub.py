@@ -0,0 +1,124 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from django.conf import settings
+
+
+class Subscription:
+    """Bitta SSE mijozining navbati. Navbat to‘lsa (sekin mijoz) eng eski xabar tashlanadi."""
+
+    def __init__(self, hub, last_event_id=None):
+        self.hub = hub
+        self.queue = asyncio.Queue(maxsize=getattr(settings, 'STREAM_SUBSCRIBER_QUEUE', 100))
+        self.pending = hub.replay(last_event_id) if last_event_id is not None else []
+        self.replayed = {message[0] for message in self.pending}
+
+    def put(self, message):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout):
+        """Navbatdagi xabar (id, event, data); timeout ichida kelmasa None (heartbeat vaqti)."""
+        while True:
+            if self.pending:
+                message = self.pending.pop(0)
+            else:
+                try:
+                    message = await asyncio.wait_for(self.queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    return None
+            # Replay va navbatga bir vaqtda tushgan xabar ikki marta yuborilmaydi
+            if message[0] not in self.replayed:
+                return message
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class BroadcastHub:
+    """Jarayon ichidagi eventlarni barcha SSE mijozlarga tarqatish.
+
+    Oxirgi eventlar halqa buferda saqlanadi (Last-Event-ID bo‘yicha qayta yuborish uchun).
+    publish istalgan oqimdan chaqirilishi mumkin, mijozlar navbatlari esa event loop ichida.
+    """
+
+    def __init__(self, replay_size=None):
+        self._buffer = deque(maxlen=replay_size or getattr(settings, 'STREAM_REPLAY_SIZE', 200))
+        # Qayta ishga tushgandan keyin ham id lar o‘sib borishi uchun vaqtdan boshlanadi
+        # (bus yoqilganda id lar bazadagi umumiy ketma-ketlikdan keladi, bu faqat bitta jarayon uchun)
+        self._last_id = time.time_ns() // 1000
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._loop = None
+
+    def next_id(self):
+        with self._lock:
+            self._last_id += 1
+            return self._last_id
+
+    def publish(self, data, event=None, event_id=None):
+        """event_id berilmasa jarayon ichida yangisi olinadi (bus orqali kelganda publisher beradi)."""
+        with self._lock:
+            if event_id is None:
+                self._last_id += 1
+                event_id = self._last_id
+            else:
+                self._last_id = max(self._last_id, event_id)
+            message = (event_id, event, data)
+            self._buffer.append(message)
+            loop = self._loop
+
+        if loop is not None and self._subscribers and not loop.is_closed():
+            try:
+                running = asyncio.get_running_loop()
+            except RuntimeError:
+                running = None
+            if running is loop:
+                self._deliver(message)
+            else:
+                loop.call_soon_threadsafe(self._deliver, message)
+        return message[0]
+
+    def _deliver(self, message):
+        for subscription in list(self._subscribers):
+            subscription.put(message)
+
+    def replay(self, last_event_id):
+        with self._lock:
+            if last_event_id > self._last_id:
+                # Boshqa (eski) jarayonning id si — bufer to‘liq yuboriladi
+                last_event_id = 0
+            return [message for message in self._buffer if message[0] > last_event_id]
+
+    def recent(self, count):
+        """Oxirgi count ta xabar ma'lumoti, yangisi birinchi (sahifa ochilganda ko‘rsatish uchun)."""
+        with self._lock:
+            return [data for _, _, data in list(self._buffer)[-count:]][::-1]
+
+    def subscribe(self, last_event_id=None):
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(self, last_event_id)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self._subscribers.discard(subscription)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+
+hub = BroadcastHub()
+
+
+def format_sse(message):
+    """SSE formatidagi matn: ko‘p qatorli data har bir qator uchun alohida "data:" bilan."""
+    event_id, event, data = message
+    lines = [f"id: {event_id}"]
+    if event:
+        lines.append(f"event: {event}")
+    lines.extend(f"data: {line}" for line in str(data).splitlines() or [""])
+    return "\n".join(lines) + "\n\n"
@@ -0,0 +1,204 @@
+import atexit
+import json
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from dormitory.models import Device
+from Logs.utils import update_presence
+
+
+# ---------------------------------------------------------------- parser
+
+def _multipart_json(content_type, body):
+    """Multipart tanasidan application/json qismini ajratish.
+
+    Butun tana bo‘laklarga bo‘linmaydi (rasm qismi katta bo‘lishi mumkin), faqat
+    JSON qismining chegaralari qidiriladi.
+    """
+    _, _, boundary = content_type.partition('boundary=')
+    boundary = boundary.split(';', 1)[0].strip().strip('"').encode()
+    if not boundary:
+        return None
+
+    marker = body.find(b'application/json')
+    while marker != -1:
+        start = body.find(b'\r\n\r\n', marker)
+        if start == -1:
+            return None
+        start += 4
+        end = body.find(b'\r\n--' + boundary, start)
+        try:
+            return json.loads(body[start:end if end != -1 else len(body)])
+        except ValueError:
+            marker = body.find(b'application/json', start)
+    return None
+
+
+def parse_event(content_type, body):
+    """Hikvision event JSON ini qaytaradi (multipart yoki oddiy JSON), topilmasa None."""
+    if 'multipart/form-data' in content_type:
+        event_json = _multipart_json(content_type, body)
+        if event_json is not None:
+            return event_json
+    try:
+        event_json = json.loads(body)
+    except ValueError:
+        return None
+    return event_json if isinstance(event_json, dict) else None
+
+
+def event_key(event_json):
+    """Takroriy event ni aniqlash kaliti: qurilma IP si va event seriya raqami."""
+    access_event = event_json.get("AccessControllerEvent") or {}
+    serial_no = access_event.get("serialNo")
+    if serial_no is not None:
+        return f"{event_json.get('ipAddress')}:{serial_no}"
+    return event_json.get("eventId") or event_json.get("dateTime") or str(hash(str(event_json)))
+
+
+# ---------------------------------------------------------------- device cache
+
+class DeviceCache:
+    """IP -> (device_pk, entrance, dormitory_id). Qurilma o‘zgarsa signal orqali tozalanadi,
+    boshqa jarayonlardagi o‘zgarishlar uchun ttl o‘tgach qayta yuklanadi."""
+
+    def __init__(self):
+        self._devices = None
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+
+    def _ttl(self):
+        return getattr(settings, 'STREAM_DEVICE_CACHE_TTL', 60)
+
+    def get(self, ip):
+        devices = self._devices
+        if devices is None or time.monotonic() - self._loaded_at > self._ttl():
+            with self._lock:
+                devices = {
+                    ipaddress: (pk, entrance, dormitory_id)
+                    for pk, ipaddress, entrance, dormitory_id
+                    in Device.objects.values_list('pk', 'ipaddress', 'entrance', 'dormitory_id')
+                }
+                self._devices, self._loaded_at = devices, time.monotonic()
+        return devices.get(ip)
+
+    def clear(self):
+        self._devices = None
+
+
+device_cache = DeviceCache()
+
+
+@receiver(post_save, sender=Device)
+@receiver(post_delete, sender=Device)
+def clear_device_cache(sender, instance, **kwargs):
+    device_cache.clear()
+
+
+# ---------------------------------------------------------------- dedup
+
+class RecentEvents:
+    """Qayta ishlangan eventlar: vaqt bo‘yicha tartiblangan, hajmi va muddati cheklangan.
+
+    Eskilari faqat boshidan olib tashlanadi, shuning uchun har bir tekshiruv O(1).
+    """
+
+    def __init__(self, max_size=None, ttl=None):
+        self.max_size = max_size or getattr(settings, 'STREAM_DEDUP_MAX', 10000)
+        self.ttl = ttl or getattr(settings, 'STREAM_DEDUP_TTL', 3600)
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, key):
+        """Kalit yangi bo‘lsa True (va eslab qoladi), takroriy bo‘lsa False."""
+        now = time.monotonic()
+        with self._lock:
+            while self._seen:
+                oldest_key, seen_at = next(iter(self._seen.items()))
+                if len(self._seen) < self.max_size and now - seen_at <= self.ttl:
+                    break
+                self._seen.popitem(last=False)
+
+            if key in self._seen:
+                return False
+            self._seen[key] = now
+            return True
+
+
+recent_events = RecentEvents()
+
+
+# ---------------------------------------------------------------- presence batcher
+
+class PresenceBatcher:
+    """is_in_dormitory o‘zgarishlarini yig‘ib, har flush_interval soniyada bir nechta UPDATE bilan yozish.
+
+    Bitta odam uchun oxirgi holat qoladi. Yozish alohida fon oqimida bajariladi,
+    webhook javobi bazani kutmaydi.
+    """
+
+    def __init__(self, flush_interval=None):
+        self.flush_interval = flush_interval or getattr(settings, 'STREAM_PRESENCE_FLUSH_INTERVAL', 0.3)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def submit(self, employee_no, in_dorm):
+        with self._lock:
+            self._pending[employee_no] = in_dorm
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='presence-batcher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[PRESENCE] Yozishda xatolik: {e}")
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        close_old_connections()
+        update_presence(pending)
+        return len(pending)
+
+
+presence_batcher = PresenceBatcher()
+atexit.register(presence_batcher.flush)
+
+
+def ingest_event(event_json):
+    """Bitta event ni qayta ishlash. Qabul qilingan bo‘lsa True qaytaradi."""
+    emp_no_str = (event_json.get("AccessControllerEvent") or {}).get("employeeNoString")
+    # Agar employeeNoString bo'lmasa, bu eventni o'tkazib yuboramiz (dedup ga ham yozilmaydi)
+    if not emp_no_str:
+        return False
+
+    if not recent_events.add(event_key(event_json)):
+        return False
+
+    ip = event_json.get("ipAddress")
+    try:
+        emp_no = int(emp_no_str)
+    except ValueError:
+        return False
+
+    device = device_cache.get(ip) if ip else None
+    if device is None:
+        return False
+
+    _, entrance, _ = device
+    presence_batcher.submit(emp_no, bool(entrance))
+    return True
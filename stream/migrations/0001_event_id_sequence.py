@@ -0,0 +1,28 @@
+import time
+from django.db import migrations
+
+
+SEQUENCE = 'stream_event_id'
+
+
+def create_sequence(apps, schema_editor):
+    # Bus faqat PostgreSQL da ishlaydi, boshqa bazada id lar jarayon ichida beriladi
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    # Oldingi (vaqtdan boshlangan) id lardan katta bo‘lishi uchun: brauzerdagi Last-Event-ID lar eskirmaydi
+    schema_editor.execute(f"CREATE SEQUENCE IF NOT EXISTS {SEQUENCE} START WITH {time.time_ns() // 1000}")
+
+
+def drop_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f"DROP SEQUENCE IF EXISTS {SEQUENCE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = []
+
+    operations = [
+        migrations.RunPython(create_sequence, drop_sequence),
+    ]
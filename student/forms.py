@@ -1,4 +1,5 @@
 from django import forms
+from django.db.models import Q
 from .models import Student, Dormitory, Room
 
 class StudentCreateForm(forms.ModelForm):
@@ -45,7 +46,10 @@ class StudentCreateForm(forms.ModelForm):
         if 'dormitory' in self.data:
             try:
                 dormitory_id = int(self.data.get('dormitory'))
-                self.fields['room'].queryset = Room.objects.filter(dormitory_id=dormitory_id)
+                # Bo‘sh joyi bor xonalar (talabaning hozirgi xonasi ham qoladi)
+                self.fields['room'].queryset = Room.objects.filter(dormitory_id=dormitory_id).filter(
+                    Q(free_slots__gt=0) | Q(pk=self.instance.room_id)
+                )
             except (ValueError, TypeError):
                 pass
         elif self.instance.pk:
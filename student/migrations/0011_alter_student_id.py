@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:48
+
+import student.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student', '0010_alter_student_parent_login_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='student',
+            name='id',
+            field=student.models.AutoIncrementField(editable=False, primary_key=True, serialize=False),
+        ),
+    ]
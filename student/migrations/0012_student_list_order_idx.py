@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dormitory', '0012_remove_device_main_ip'),
+        ('student', '0011_alter_student_id'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['room', 'last_name', 'first_name', 'id'], name='student_list_order_idx'),
+        ),
+    ]
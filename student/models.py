@@ -1,33 +1,31 @@
 from django.db import models
-from django.db.models.signals import post_delete
+from django.conf import settings
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 import os
 from dormitory.models import Dormitory, Room
+from dormitory.occupancy import (
+    apply_deltas, apply_room_deltas, stored_student_state, student_deltas, student_room_deltas, student_state,
+)
+from accounts.models import AutoIncrementField as BaseAutoIncrementField
 from django.utils.text import slugify  # Fayl nomini xavfsiz qilish uchun
 from django.core.exceptions import ValidationError
+from utils.thumbnails import delete_thumbnails
+from .stats import bump_stats_version
+
+class AutoIncrementField(BaseAutoIncrementField):
+    """Talabalar ID si 10000 dan boshlanadi (xodimlar oralig‘idan keyin)."""
 
-class AutoIncrementField(models.PositiveIntegerField):
     def __init__(self, start_from=10000, *args, **kwargs):
-        self.start_from = start_from
-        kwargs['editable'] = False
-        kwargs['primary_key'] = True
-        super().__init__(*args, **kwargs)
-
-    def pre_save(self, model_instance, add):
-        if not getattr(model_instance, self.attname):
-            existing_ids = list(model_instance.__class__.objects.values_list(
-                self.attname, flat=True).order_by(self.attname))
-            if not existing_ids:
-                setattr(model_instance, self.attname, self.start_from)
-                return super().pre_save(model_instance, add)
-            full_range = set(range(self.start_from, existing_ids[-1] + 2))
-            existing_set = set(existing_ids)
-            gaps = full_range - existing_set
-            if gaps:
-                setattr(model_instance, self.attname, min(gaps))
-            else:
-                setattr(model_instance, self.attname, existing_ids[-1] + 1)
-        return super().pre_save(model_instance, add)
+        super().__init__(start_from, *args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.start_from != 10000:
+            kwargs['start_from'] = self.start_from
+        else:
+            kwargs.pop('start_from', None)
+        return name, path, args, kwargs
 
 def student_image_upload_to(instance, filename):
     ext = filename.split('.')[-1]
@@ -40,7 +38,7 @@ def student_image_upload_to(instance, filename):
     return os.path.join('residents/', new_filename)
 
 class Student(models.Model):
-
+    id = AutoIncrementField()
     dormitory = models.ForeignKey(Dormitory, models.CASCADE, related_name='students')
     first_name = models.CharField(max_length=50)
     last_name = models.CharField(max_length=50)
@@ -68,8 +66,16 @@ class Student(models.Model):
         super().clean()
 
         if self.image:
-            if self.image.size > 204799:  # 200 KB = 200 * 1024 = 204800 bytes
-                raise ValidationError({'image': "Rasm hajmi 200KB dan oshmasligi kerak."})
+            # Qurilmaga yuborishdan oldin surat kichraytiriladi (utils/images.py), bu faqat yuklash chegarasi
+            max_size = getattr(settings, 'FACE_UPLOAD_MAX_BYTES', 10 * 1024 * 1024)
+            if self.image.size > max_size:
+                raise ValidationError({'image': f"Rasm hajmi {max_size // (1024 * 1024)}MB dan oshmasligi kerak."})
+
+    class Meta:
+        indexes = [
+            # Talabalar ro‘yxatidagi kursorli sahifalash tartibi
+            models.Index(fields=['room', 'last_name', 'first_name', 'id'], name='student_list_order_idx'),
+        ]
 
     def __str__(self):
         return f"({self.room}) {self.first_name} {self.last_name} "
@@ -79,4 +85,42 @@ class Student(models.Model):
 def auto_delete_file_on_delete(sender, instance, **kwargs):
     if instance.image:
         if os.path.isfile(instance.image.path):
+            delete_thumbnails(instance.image.path)
             os.remove(instance.image.path)
+
+
+@receiver(post_init, sender=Student)
+def remember_student_dormitory(sender, instance, **kwargs):
+    # Boshqa yotoqxonaga o‘tkazilsa, eski yotoqxona statistikasi ham yangilanishi uchun
+    instance._loaded_dormitory_id = instance.__dict__.get('dormitory_id')
+    instance._occupancy_state = student_state(instance)
+
+
+@receiver(pre_save, sender=Student)
+@receiver(pre_delete, sender=Student)
+def load_student_state(sender, instance, **kwargs):
+    # Qisman yuklangan obyekt (only/defer): oldingi holat bazadan olinadi
+    if instance._occupancy_state is None and instance.pk and not instance._state.adding:
+        instance._occupancy_state = stored_student_state(sender, instance.pk)
+
+
+@receiver(post_save, sender=Student)
+def count_student(sender, instance, created, **kwargs):
+    new = student_state(instance) or stored_student_state(sender, instance.pk)
+    old = None if created else instance._occupancy_state
+    apply_deltas(student_deltas(old, new))
+    apply_room_deltas(student_room_deltas(old, new))
+    instance._occupancy_state = new
+
+
+@receiver(post_delete, sender=Student)
+def uncount_student(sender, instance, **kwargs):
+    apply_deltas(student_deltas(instance._occupancy_state, None))
+    apply_room_deltas(student_room_deltas(instance._occupancy_state, None))
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def invalidate_student_stats(sender, instance, **kwargs):
+    bump_stats_version(instance.dormitory_id, getattr(instance, '_loaded_dormitory_id', None))
+    instance._loaded_dormitory_id = instance.dormitory_id
@@ -0,0 +1,62 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from dormitory.occupancy import occupancy_for
+
+
+def _timeout():
+    return getattr(settings, 'STUDENT_STATS_CACHE_TIMEOUT', 300)
+
+
+def _version_key(dormitory_id):
+    return f"student_stats:version:{dormitory_id}"
+
+
+def bump_stats_version(*dormitory_ids):
+    """Yotoqxona talabalari o‘zgardi: shu yotoqxonaga tegishli keshlangan sonlar eskiradi."""
+    now = time.time_ns()
+    cache.set_many({_version_key(pk): now for pk in set(dormitory_ids) if pk}, None)
+
+
+def _versions(dormitory_ids):
+    keys = {_version_key(pk): pk for pk in dormitory_ids}
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def dormitory_stats(dormitories):
+    """Yotoqxonalar ro‘yxati total, in_dorm va deleted_count atributlari bilan.
+
+    Sonlar DormitoryOccupancy hisoblagichlaridan bitta so‘rov bilan olinadi.
+    """
+    dormitories = list(dormitories)
+    occupancy = occupancy_for(dormitories)
+    for dorm in dormitories:
+        row = occupancy.get(dorm.pk)
+        dorm.total, dorm.in_dorm, dorm.deleted_count = (
+            (row.students_total, row.students_inside, row.students_deleted) if row else (0, 0, 0)
+        )
+    return dormitories
+
+
+def cached_count(queryset, dormitory_ids):
+    """Filtrlangan talabalar soni; kalit so‘rov matni va yotoqxonalar versiyasidan tuziladi."""
+    try:
+        sql = str(queryset.query)
+    except EmptyResultSet:
+        return 0
+    versions = _versions(dormitory_ids)
+    digest = hashlib.md5(f"{sql}|{sorted(versions.items())}".encode()).hexdigest()
+    key = f"student_count:{digest}"
+
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, _timeout())
+    return count
@@ -1,26 +1,24 @@
-import tempfile
 from django.utils import timezone
-from django.db.models import Count, Q
-import os
+from django.db.models import Q, Sum, Value, DecimalField
+from django.db.models.functions import Coalesce
 from django.views.generic import ListView, DetailView, UpdateView, CreateView, DeleteView
 from django.urls import reverse_lazy, reverse
 from .forms import StudentCreateForm
 from dormitory.models import Dormitory, Room
 from .models import Student
-import pandas as pd
-from django.http import HttpResponse
-from datetime import datetime
-from openpyxl import Workbook
-from utils.hikvision import add_user_to_devices, delete_user_from_devices, open_user_on_devices, block_user_on_devices
+from utils.export import iterate, numbered, fmt_date, table_response
+from utils.hikvision import delete_user_from_devices
+from utils.images import ImageError, face_upload
+from jobs.tasks import enqueue
 from django.shortcuts import render, get_object_or_404
 from django.http import JsonResponse
-from django.db import models
 from django.views.decorators.csrf import csrf_exempt
 from utils.utils import filter_by_user_role
+from utils.pagination import keyset_paginate
+from .stats import dormitory_stats, cached_count
 from django.views import View
 from django.contrib import messages
 from django.shortcuts import redirect
-import time
 
 
 class StudentListView(ListView):
@@ -28,6 +26,8 @@ class StudentListView(ListView):
     template_name = 'student/home.html'
     context_object_name = 'object_list'
     paginate_by = 20
+    # Sahifalash kursori shu tartibga (va Student Meta dagi indeksga) bog‘liq
+    ordering_fields = ('room', 'last_name', 'first_name', 'id')
 
     def get_queryset(self):
 
@@ -63,61 +63,25 @@ class StudentListView(ListView):
         if faculty:
             queryset = queryset.filter(faculty__icontains=faculty)
 
-        return queryset.order_by('room', 'last_name', 'first_name')
+        return queryset.select_related('dormitory', 'room').order_by(*self.ordering_fields)
 
     def get(self, request, *args, **kwargs):
-        if request.GET.get("export") == "excel":
-            queryset = self.get_queryset()
-
-            df = pd.DataFrame(list(queryset.values(
-                'pk', 'first_name', 'last_name', 'dormitory__name', 'faculty', 'room__number',
-                'phone_number', 'parent_full_name', 'is_in_dormitory', 'arrival_time', 'checkout_time'
-            )))
-
-            # total_payment ni qo‘shish
-            df['total_payment'] = [student.total_payment for student in queryset]
-
-            df.index = df.index + 1
-            df.insert(0, '№', df.index)
-
-            # Sarlavhalarni o'zgartirish
-            df.rename(columns={
-		'pk': 'Student ID',
-                'first_name': 'Ismi',
-                'last_name': 'Familiyasi',
-                'dormitory__name': 'Yotoqxonasi',
-                'faculty': 'Fakulteti',
-                'room': 'Xonasi',
-                'phone_number': 'Telefon raqami',
-		'parent_full_name': 'Ota-onasi',
-                'is_in_dormitory': 'Yotoqxonada',
-                'arrival_time': 'Kelgan sana',
-                'checkout_time': 'Ketadigan sana',
-                'total_payment': 'To\'lov summasi'
-            }, inplace=True)
-
-            # Boolean qiymatlarni formatlash
-            df['Yotoqxonada'] = df['Yotoqxonada'].map({True: 'Ha', False: 'Yo\'q'})
-
-            # Sana maydonlarini formatlash (None qiymatlarni hisobga olgan holda)
-            for date_col in ['Kelgan sana', 'Ketadigan sana']:
-                df[date_col] = pd.to_datetime(df[date_col], errors='coerce')
-                df[date_col] = df[date_col].dt.strftime('%Y-%m-%d')
-                df[date_col] = df[date_col].replace('NaT', '')
-
-            now = datetime.now().strftime("%Y-%m-%d_%H-%M")
-            filename = f"talabalar_{now}.xlsx"
-
-            response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-            response['Content-Disposition'] = f'attachment; filename={filename}'
-            df.to_excel(response, index=False)
-            return response
+        export = request.GET.get("export")
+        if export in ("excel", "csv"):
+            return self.export_to_excel(self.get_queryset(), export)
 
         return super().get(request, *args, **kwargs)
 
+    def paginate_queryset(self, queryset, page_size):
+        # OFFSET o‘rniga kursor: chuqur sahifalar ham indeks bo‘yicha bitta so‘rovda olinadi
+        page = keyset_paginate(
+            queryset, self.ordering_fields, page_size,
+            after=self.request.GET.get('after'), before=self.request.GET.get('before'),
+        )
+        return None, page, page.object_list, page.has_other_pages()
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["total_count"] = self.get_queryset().count()
         context["device_errors"] = self.request.session.pop("device_errors", None)
 
         user = self.request.user
@@ -127,61 +91,56 @@ class StudentListView(ListView):
         else:
             dormitories = Dormitory.objects.filter(employees__user=user).distinct()
 
-        # 🧩 Har bir yotoqxona bo‘yicha statistikalar (faol talabalar)
-        dormitory_stats = dormitories.annotate(
-            total=Count('students', filter=Q(students__is_deleted=False)),
-            in_dorm=Count('students', filter=Q(students__is_in_dormitory=True, students__is_deleted=False))
-        )
-
-        # 🧩 O‘chirilgan talabalar soni (umumiy)
-        # 🧩 Har bir yotoqxona bo‘yicha statistikalar (faol va o‘chirilgan talabalar)
-        dormitory_stats = dormitories.annotate(
-            total=Count('students', filter=Q(students__is_deleted=False)),
-            in_dorm=Count('students', filter=Q(students__is_in_dormitory=True, students__is_deleted=False)),
-            deleted_count=Count('students', filter=Q(students__is_deleted=True))
-        )
+        # 🧩 Har bir yotoqxona bo‘yicha statistikalar (faol va o‘chirilgan talabalar), keshdan
+        dormitory_stats_list = dormitory_stats(dormitories)
 
         # 🧩 Umumiy faol talabalar soni
-        active_students_count = Student.objects.filter(
-            dormitory__in=dormitories,
-            is_deleted=False
-        ).count()
+        active_students_count = sum(stat.total for stat in dormitory_stats_list)
 
-        context['dormitory_stats'] = dormitory_stats
+        if user.is_superuser and not dormitory_stats_list:
+            scope_ids = list(Dormitory.objects.values_list('pk', flat=True))
+        else:
+            scope_ids = [dorm.pk for dorm in dormitory_stats_list]
+        context["total_count"] = cached_count(self.get_queryset(), scope_ids)
+
+        # Sahifa havolalari uchun joriy filtrlar (kursorsiz)
+        query = self.request.GET.copy()
+        for param in ('page', 'after', 'before'):
+            query.pop(param, None)
+        context['page_query'] = query.urlencode()
+
+        context['dormitory_stats'] = dormitory_stats_list
         context['all_student_count'] = active_students_count
         context['dormitories'] = dormitories
 
         return context
 
-    def render_to_response(self, context, **response_kwargs):
-        if self.request.GET.get('export') == 'excel':
-            return self.export_to_excel(context['object_list'])
-        return super().render_to_response(context, **response_kwargs)
-
-    def export_to_excel(self, queryset):
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Talabalar ro'yxati"
-
-        # Sarlavhalar
-        ws.append(['Ismi', 'Familiyasi', 'Xonasi', 'Fakulteti', 'Yotoqxonada'])
-
-        # Ma’lumotlar
-        for student in queryset:
-            ws.append([
+    def export_to_excel(self, queryset, export_format="excel"):
+        # To‘lovlar bitta Sum annotatsiyasi bilan, qatorlar bazadan bo‘laklab o‘qiladi
+        queryset = queryset.annotate(paid_sum=Coalesce(
+            Sum('payments__amount'), Value(0), output_field=DecimalField(max_digits=12, decimal_places=2)
+        ))
+        headers = ['№', 'Student ID', 'Ismi', 'Familiyasi', 'Yotoqxonasi', 'Fakulteti', 'Xonasi',
+                   'Telefon raqami', 'Ota-onasi', 'Yotoqxonada', 'Kelgan sana', 'Ketadigan sana',
+                   "To'lov summasi"]
+        rows = numbered(
+            [
+                student.pk,
                 student.first_name,
                 student.last_name,
-                student.room,
+                student.dormitory.name,
                 student.faculty,
-                'Ichkarida' if student.is_in_dormitory else 'Tashqarida'
-            ])
-
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+                student.room.number if student.room else '',
+                student.phone_number,
+                student.parent_full_name,
+                'Ha' if student.is_in_dormitory else "Yo'q",
+                fmt_date(student.arrival_time),
+                fmt_date(student.checkout_time),
+                student.paid_sum,
+            ]
+            for student in iterate(queryset)
         )
-        response['Content-Disposition'] = 'attachment; filename=talabalar.xlsx'
-        wb.save(response)
-        return response
+        return table_response(export_format, "talabalar", "Talabalar", headers, rows)
 
 class StudentDetailView(DetailView):
     model = Student
@@ -220,21 +179,16 @@ class StudentDeleteView(View):
 
     def post(self, request, pk):
         student = get_object_or_404(Student, pk=pk)
-        dormitory = student.dormitory
-        student_id = str(student.id)
-
-        # Qurilmalardan o‘chirishga harakat qilamiz
-        success, reason = delete_user_from_devices(dormitory, student_id)
-
-        if success:
-            student.is_deleted = True
-            student.checkout_time = timezone.now().date()
-            student.room = None
-            student.parent_full_name = (request.user.get_full_name() or request.user.username) + ' tomonidan o`chirilgan'
-            student.save(update_fields=["is_deleted", "checkout_time", "room", "parent_full_name"])
-            messages.success(request, "Talaba qurilmalardan muvaffaqiyatli o‘chirildi va tizimda 'o‘chirilgan' deb belgilandi.")
-        else:
-            messages.error(request, f"Talabani qurilmalardan o‘chirib bo‘lmadi: {reason}")
+
+        student.is_deleted = True
+        student.checkout_time = timezone.now().date()
+        student.room = None
+        student.parent_full_name = (request.user.get_full_name() or request.user.username) + ' tomonidan o`chirilgan'
+        student.save(update_fields=["is_deleted", "checkout_time", "room", "parent_full_name"])
+
+        # Qurilmalardan o‘chirish fon worker orqali bajariladi
+        enqueue('delete', student.dormitory, student.id)
+        messages.success(request, "Talaba tizimda 'o‘chirilgan' deb belgilandi, qurilmalardan o‘chirilmoqda.")
 
         return redirect(self.success_url)
 
@@ -289,35 +243,24 @@ class StudentCreateView(CreateView):
         full_name = f"{form.cleaned_data['first_name']} {form.cleaned_data['last_name']}"
         dormitory = form.cleaned_data.get('dormitory')
 
-        if photo_file and photo_file.size >= 200 * 1024:
-            messages.error(self.request, "Rasm hajmi 200KB dan oshmasligi kerak.")
-            return render(self.request, self.template_name, {'form': form})
-
         if not photo_file:
             messages.error(self.request, "Surat yuklanmagan. Iltimos, rasmni tanlang.")
             return render(self.request, self.template_name, {'form': form})
 
-        # Rasmni vaqtinchalik saqlash
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as tmp:
-            for chunk in photo_file.chunks():
-                tmp.write(chunk)
-            tmp_file_path = tmp.name
+        # Surat qurilma talabiga keltiriladi (aylantirish, kesish, 200KB gacha JPEG)
+        try:
+            student.image = face_upload(photo_file)
+        except ImageError as e:
+            messages.error(self.request, str(e))
+            return render(self.request, self.template_name, {'form': form})
 
         student.save()
 
-        success, reason = add_user_to_devices(dormitory, str(student.id), full_name, tmp_file_path)
-
-        if os.path.exists(tmp_file_path):
-            os.remove(tmp_file_path)
-
-        if success:
+        # Qurilmalarga yuklash fon worker orqali bajariladi, holatini talaba sahifasida kuzatish mumkin
+        enqueue('add', dormitory, student.id, {'full_name': full_name, 'image_path': student.image.path})
 
-            messages.success(self.request, "Talaba qurilmalarga muvaffaqiyatli qo‘shildi.")
-            return redirect(self.success_url)
-        else:
-            student.delete()
-            messages.error(self.request, f"Talaba qurilmalarga qo‘shilmadi: {reason}")
-            return render(self.request, self.template_name, {'form': form})
+        messages.success(self.request, "Talaba saqlandi va qurilmalarga yuborilmoqda.")
+        return redirect(self.success_url)
 
     def form_invalid(self, form):
         messages.error(self.request, "Ma'lumotlarda xatolik mavjud.")
@@ -325,10 +268,8 @@ class StudentCreateView(CreateView):
 
 def load_rooms_ajax(request):
     dormitory_id = request.GET.get('dormitory')
-    rooms = Room.objects.filter(dormitory_id=dormitory_id)
-
-    # Faqat to‘liq band bo‘lmagan xonalar
-    rooms = rooms.annotate(occupied=Count('students')).filter(occupied__lt=models.F('size'))
+    # Faqat to‘liq band bo‘lmagan xonalar (room_free_slots_idx qisman indeksi)
+    rooms = Room.objects.filter(dormitory_id=dormitory_id, free_slots__gt=0).order_by('number')
 
     return JsonResponse(list(rooms.values('id', 'number')), safe=False)
 
@@ -339,21 +280,15 @@ def toggle_block(request, pk):
     print(Sid)
     if request.method == 'POST':
         if student.blocked:
-            success, reason = open_user_on_devices(student.dormitory, Sid)
-            if success:
-                student.blocked = False
-                student.save()
-                messages.success(request, "Foydalanuvchi ochildi.")
-            else:
-                messages.error(request, f"Ochishda xatolik: {reason}")
+            enqueue('open', student.dormitory, Sid)
+            student.blocked = False
+            student.save(update_fields=['blocked'])
+            messages.success(request, "Foydalanuvchi ochildi, qurilmalarga yuborilmoqda.")
         else:
-            success, reason = block_user_on_devices(student.dormitory, Sid)
-            if success:
-                student.blocked = True
-                student.save()
-                messages.success(request, "Foydalanuvchi bloklandi.")
-            else:
-                messages.error(request, f"Bloklashda xatolik: {reason}")
+            enqueue('block', student.dormitory, Sid)
+            student.blocked = True
+            student.save(update_fields=['blocked'])
+            messages.success(request, "Foydalanuvchi bloklandi, qurilmalarga yuborilmoqda.")
 
     return redirect('student_detail', pk=student.pk)
 
@@ -366,22 +301,21 @@ class AddStudentsToDevicesView(View):
         if not dormitory:
             return JsonResponse({"error": "Yotoqxona topilmadi yoki sizga tegishli emas!"}, status=400)
 
-        students = Student.objects.filter(dormitory=dormitory, is_deleted=False)
-        success_count = 0
-        failed_count = 0
+        students = Student.objects.filter(dormitory=dormitory, is_deleted=False).order_by('pk')
+        users = [
+            {
+                "employee_id": str(student.pk),
+                "full_name": f"{student.first_name} {student.last_name}",
+                "image_path": student.image.path if student.image else "",
+            }
+            for student in students.only('pk', 'first_name', 'last_name', 'image')
+        ]
 
-        for student in students:
-            full_name = f"{student.first_name} {student.last_name}"
-            image_path = student.image.path if student.image else ""
-            success, error = add_user_to_devices(dormitory, str(student.id), full_name, image_path)
-            if success:
-                success_count += 1
-            else:
-                failed_count += 1
-            time.sleep(0.7)  # 0.7 soniya interval (so‘ralgandek)
+        # Yuklash fon worker da partiyalab bajariladi, holatni status_url orqali kuzatish mumkin
+        job = enqueue('bulk_enroll', dormitory, '*', {"users": users}, key=f"bulk_enroll:{dormitory.pk}")
 
         return JsonResponse({
-            "success_count": success_count,
-            "failed_count": failed_count
+            "job_id": job.pk,
+            "status_url": reverse('sync_job_status', kwargs={'pk': job.pk}),
+            "total": len(job.payload.get("users", [])),
         })
-
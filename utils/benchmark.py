@@ -0,0 +1,108 @@
+import json
+import statistics
+import time
+from collections import namedtuple
+from urllib.parse import urlencode
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from utils.instrumentation import RequestMetrics
+
+
+# url_name — sahifa, dormitory — URL ga yotoqxona id si kerakmi, params — GET parametrlari
+# (qiymatdagi {dormitory} yotoqxona id si bilan almashtiriladi)
+Scenario = namedtuple('Scenario', ['name', 'url_name', 'dormitory', 'params'])
+
+SCENARIOS = (
+    Scenario('students', 'students', False, {}),
+    Scenario('students_export', 'students', False, {'export': 'excel'}),
+    Scenario('debt_statistics', 'debt_statistics', False, {}),
+    Scenario('dormitory_detail', 'dormitory_detail', True, {}),
+    Scenario('payments', 'payments', False, {}),
+    Scenario('payments_export', 'payments', False, {'export': 'excel'}),
+    Scenario('rooms', 'rooms', False, {}),
+    Scenario('rooms_export', 'rooms', False, {'export': 'excel'}),
+    # Bazadagi (AccessEvent) loglar, butun davr: ZIP ichida xodimlar va talabalar xlsx fayllari
+    Scenario('logs_export', 'logs', False, {
+        'export': 'excel', 'dormitory': '{dormitory}', 'start_time': '2000-01-01T00:00', 'end_time': '2100-01-01T00:00',
+    }),
+)
+
+
+def _url(scenario, dormitory):
+    url = reverse(scenario.url_name, args=[dormitory.pk] if scenario.dormitory else [])
+    if scenario.params:
+        url += '?' + urlencode({key: str(value).format(dormitory=dormitory.pk) for key, value in scenario.params.items()})
+    return url
+
+
+def _measure(client, url):
+    """Bitta so‘rov: (status, ms, RequestMetrics, javob hajmi); oqimli javob oxirigacha o‘qiladi."""
+    metrics = RequestMetrics()
+    with connection.execute_wrapper(metrics.record_query):
+        started = time.perf_counter()
+        response = client.get(url)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        elapsed = (time.perf_counter() - started) * 1000
+    return response.status_code, elapsed, metrics, len(body)
+
+
+def run(user, dormitory, names=None, repeat=5, warmup=1):
+    """Ssenariylarni user nomidan bajarish.
+
+    Natija: {nomi: {url, status, queries, db_ms, duplicates, min_ms, median_ms, max_ms, bytes}},
+    duplicates — bitta so‘rovda eng ko‘p takrorlangan SQL soni (N+1 belgisi).
+    """
+    client = Client()
+    client.force_login(user)
+
+    results = {}
+    for scenario in SCENARIOS:
+        if names and scenario.name not in names:
+            continue
+        url = _url(scenario, dormitory)
+        for _ in range(warmup):
+            _measure(client, url)
+
+        runs = [_measure(client, url) for _ in range(repeat)]
+        timings = [elapsed for _, elapsed, _, _ in runs]
+        status, _, metrics, size = runs[-1]
+        duplicates = metrics.fingerprints.most_common(1)
+        results[scenario.name] = {
+            'url': url,
+            'status': status,
+            'queries': metrics.queries,
+            'db_ms': round(metrics.db_ms, 1),
+            'duplicates': duplicates[0][1] if duplicates else 0,
+            'min_ms': round(min(timings), 1),
+            'median_ms': round(statistics.median(timings), 1),
+            'max_ms': round(max(timings), 1),
+            'bytes': size,
+        }
+    return results
+
+
+def compare(results, baseline, tolerance=0.25):
+    """Oldingi natija bilan solishtirish: SQL so‘rovlar ko‘paygan yoki median vaqt tolerance dan oshgan ssenariylar."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result['status'] != before['status']:
+            regressions.append(f"{name}: status {before['status']} -> {result['status']}")
+        if result['queries'] > before['queries']:
+            regressions.append(f"{name}: SQL so‘rovlar {before['queries']} -> {result['queries']}")
+        if result['median_ms'] > before['median_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: median {before['median_ms']} ms -> {result['median_ms']} ms")
+    return regressions
+
+
+def load(path):
+    with open(path, encoding='utf-8') as source:
+        return json.load(source)
+
+
+def save(path, results):
+    with open(path, 'w', encoding='utf-8') as target:
+        json.dump(results, target, ensure_ascii=False, indent=2)
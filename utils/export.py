@@ -0,0 +1,143 @@
+import csv
+import tempfile
+import zipfile
+from datetime import datetime
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from openpyxl import Workbook
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+CHUNK_SIZE = 2000          # bazadan bir martada o‘qiladigan qatorlar
+STREAM_BLOCK = 64 * 1024   # javobga bir martada yoziladigan baytlar
+
+
+def iterate(queryset, chunk_size=CHUNK_SIZE):
+    """Querysetni keshlamasdan, bo‘laklab o‘qish."""
+    return queryset.iterator(chunk_size=chunk_size)
+
+
+def fmt_date(value, fmt='%Y-%m-%d'):
+    """Sana/vaqtni Excel uchun matnga o‘tkazish (None -> bo‘sh qator)."""
+    if not value:
+        return ''
+    if isinstance(value, datetime) and timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.strftime(fmt)
+
+
+def numbered(rows):
+    """Har bir qator boshiga № ustunini qo‘shish."""
+    for number, row in enumerate(rows, start=1):
+        yield [number, *row]
+
+
+def export_filename(prefix, ext):
+    return f"{prefix}_{datetime.now().strftime('%Y-%m-%d_%H-%M')}.{ext}"
+
+
+def _write_workbook(target, sheets):
+    """sheets: (nomi, sarlavhalar, qatorlar) ro‘yxati. Write-only rejimda qatorlar xotirada saqlanmaydi."""
+    wb = Workbook(write_only=True)
+    for title, headers, rows in sheets:
+        ws = wb.create_sheet(title=title[:31])
+        ws.append(headers)
+        for row in rows:
+            ws.append(row)
+    wb.save(target)
+
+
+def _stream_file(file):
+    try:
+        file.seek(0)
+        while True:
+            block = file.read(STREAM_BLOCK)
+            if not block:
+                break
+            yield block
+    finally:
+        file.close()
+
+
+def _read_block(parts):
+    """Iteratordan kamida STREAM_BLOCK bayt (oxirgisi kamroq, tugaganda b'')."""
+    block = bytearray()
+    for part in parts:
+        block += part
+        if len(block) >= STREAM_BLOCK:
+            break
+    return bytes(block)
+
+
+class ExportResponse(StreamingHttpResponse):
+    """ASGI da ham oqimli javob.
+
+    Django sinxron iteratorni ASGI da sync_to_async(list) bilan oldin to‘liq o‘qib oladi
+    (butun fayl xotiraga tushadi). Bu yerda iterator bloklab o‘qiladi: har bir blok
+    view ishlagan oqimda (thread_sensitive) olinadi, shuning uchun bazadagi kursor ham shu ulanishda qoladi.
+    WSGI da odatdagi sinxron iteratsiya ishlatiladi.
+    """
+
+    async def __aiter__(self):
+        parts = self.streaming_content
+        read = sync_to_async(_read_block)
+        while block := await read(parts):
+            yield block
+
+
+def _attachment(streaming_content, content_type, filename):
+    response = ExportResponse(streaming_content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
+
+
+def excel_response(filename, sheets):
+    """Bir yoki bir nechta varaqli xlsx fayl.
+
+    xlsx — zip arxiv, shuning uchun u vaqtinchalik faylga yoziladi va bo‘laklab uzatiladi:
+    xotira qatorlar soniga bog‘liq bo‘lmaydi.
+    """
+    file = tempfile.TemporaryFile()
+    _write_workbook(file, sheets)
+    return _attachment(_stream_file(file), XLSX_CONTENT_TYPE, filename)
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def csv_response(filename, headers, rows):
+    """CSV ni to‘g‘ridan-to‘g‘ri oqim sifatida yuborish (Excel to‘g‘ri ochishi uchun BOM bilan)."""
+    writer = csv.writer(_Echo())
+
+    def content():
+        yield '\ufeff' + writer.writerow(headers)
+        for row in rows:
+            yield writer.writerow(row)
+
+    return _attachment(content(), 'text/csv; charset=utf-8', filename)
+
+
+def zip_response(filename, workbooks):
+    """workbooks: (fayl nomi, sheets) ro‘yxati; har bir xlsx zip ichiga alohida fayl bo‘lib yoziladi."""
+    file = tempfile.TemporaryFile()
+    with zipfile.ZipFile(file, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, sheets in workbooks:
+            with tempfile.TemporaryFile() as book:
+                _write_workbook(book, sheets)
+                book.seek(0)
+                with archive.open(name, 'w') as entry:
+                    while True:
+                        block = book.read(STREAM_BLOCK)
+                        if not block:
+                            break
+                        entry.write(block)
+    return _attachment(_stream_file(file), 'application/zip', filename)
+
+
+def table_response(export_format, prefix, title, headers, rows):
+    """?export=csv bo‘lsa CSV, aks holda bitta varaqli xlsx."""
+    if export_format == 'csv':
+        return csv_response(export_filename(prefix, 'csv'), headers, rows)
+    return excel_response(export_filename(prefix, 'xlsx'), [(title, headers, rows)])
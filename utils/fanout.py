@@ -0,0 +1,62 @@
+from collections import namedtuple
+from contextvars import copy_context
+from concurrent.futures import ThreadPoolExecutor, wait
+from django.conf import settings
+
+
+# Har bir qurilma bo‘yicha natija: ok=True bo‘lsa value, aks holda error to‘ldiriladi
+DeviceResult = namedtuple('DeviceResult', ['device', 'ok', 'value', 'error'])
+
+
+class DeviceError(Exception):
+    """Qurilma so‘rovni bajarmadi (xabar foydalanuvchiga ko‘rsatiladi)."""
+
+
+def run_on_devices(devices, func, *args, max_workers=None, deadline=None, **kwargs):
+    """func(device, *args, **kwargs) ni barcha qurilmalarda parallel bajarish.
+
+    Bir vaqtda ishlaydigan oqimlar soni max_workers bilan cheklanadi, deadline
+    soniyada javob bermagan qurilma xato deb hisoblanadi va boshqalarni kutdirmaydi.
+    Natija qurilmalar tartibida DeviceResult ro‘yxati ko‘rinishida qaytadi.
+    """
+    devices = list(devices)
+    if not devices:
+        return []
+
+    if max_workers is None:
+        max_workers = getattr(settings, 'HIKVISION_MAX_WORKERS', 8)
+    if deadline is None:
+        deadline = getattr(settings, 'HIKVISION_DEVICE_DEADLINE', 30)
+
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(devices)))
+    try:
+        # Har bir oqimga chaqiruvchi konteksti nusxasi (so‘rov o‘lchovlari shu orqali yig‘iladi)
+        futures = [executor.submit(copy_context().run, func, device, *args, **kwargs) for device in devices]
+        wait(futures, timeout=deadline)
+
+        results = []
+        for device, future in zip(devices, futures):
+            if not future.done():
+                future.cancel()
+                results.append(DeviceResult(device, False, None, f"[{device.ipaddress}] Javob kutish vaqti tugadi"))
+                continue
+
+            error = future.exception()
+            if error is None:
+                results.append(DeviceResult(device, True, future.result(), None))
+            elif isinstance(error, DeviceError):
+                results.append(DeviceResult(device, False, None, str(error)))
+            else:
+                results.append(DeviceResult(device, False, None, f"[{device.ipaddress}] Istisno yuz berdi: {error}"))
+        return results
+    finally:
+        # Sekin qurilmani kutmasdan qaytamiz, qolgan oqimlar fonda tugaydi
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def summarize(results) -> tuple[bool, str | None]:
+    """DeviceResult ro‘yxatini eski (muvaffaqiyat, sabab) ko‘rinishiga keltirish."""
+    errors = [result.error for result in results if not result.ok]
+    if errors:
+        return False, "; ".join(errors)
+    return True, None
@@ -0,0 +1,200 @@
+import math
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from accounts.models import CustomUser, Director, IdSequence
+from dormitory.models import Device, Dormitory, Room
+from dormitory.occupancy import reconcile
+from employee.models import Employee
+from expense.models import Expense
+from Logs.models import AccessEvent
+from payment.debt import refresh_balances
+from payment.models import Payment
+from student.models import Student
+from student.stats import bump_stats_version
+
+
+FIRST_NAMES = (
+    'Aziz', 'Bekzod', 'Dilshod', 'Jasur', 'Javohir', 'Sardor', 'Shoxrux', 'Otabek', 'Sanjar', 'Ulug‘bek',
+    'Nodir', 'Temur', 'Islom', 'Abdulla', 'Muhammad', 'Dilnoza', 'Madina', 'Malika', 'Nilufar', 'Gulnoza',
+    'Shahnoza', 'Zarina', 'Kamola', 'Sevara', 'Mohira', 'Feruza', 'Dildora', 'Maftuna', 'Sabina', 'Laylo',
+)
+LAST_NAMES = (
+    'Karimov', 'Rahimov', 'Toshmatov', 'Abdullayev', 'Yusupov', 'Ismoilov', 'Qodirov', 'Nazarov', 'Saidov',
+    'Ergashev', 'Mirzayev', 'Xolmatov', 'Sobirov', 'Jo‘rayev', 'Aliyev', 'Umarov', 'Haydarov', 'Raximov',
+)
+FACULTIES = (
+    'Axborot texnologiyalari', 'Iqtisodiyot', 'Filologiya', 'Matematika', 'Fizika', 'Kimyo', 'Biologiya',
+    'Tarix', 'Huquqshunoslik', 'Pedagogika', 'Energetika', 'Qurilish',
+)
+EXPENSE_NOTES = (
+    'Kommunal to‘lovlar', 'Ta’mirlash ishlari', 'Tozalash vositalari', 'Mebel', 'Internet', 'Choyshablar',
+    'Elektr jihozlari', 'Suv isitgich', 'Qo‘riqlash xizmati',
+)
+
+BATCH_SIZE = 1000
+
+
+def _name(rng):
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    if first.endswith('a') and last.endswith('v'):
+        last += 'a'  # ayollar familiyasi
+    return first, last
+
+
+def _phone(rng):
+    return f"+99890{rng.randint(1000000, 9999999)}"
+
+
+def _create_user(role, first_name, last_name, rng):
+    # CustomUser.save username va parolni o‘zi qo‘yadi
+    user = CustomUser(first_name=first_name, last_name=last_name, role=role, phone_number=_phone(rng))
+    user.save()
+    return user
+
+
+def _next_student_id():
+    field = Student._meta.pk
+    last = Student.objects.aggregate(last=Max('pk'))['last']
+    return max(field.start_from, (last or 0) + 1)
+
+
+def _sync_student_sequence(next_value):
+    """bulk_create ID larni qo‘lda beradi: keyingi talaba shu ID lardan keyin boshlansin."""
+    name = Student._meta.pk.sequence_name
+    IdSequence.objects.filter(name=name, next_value__lt=next_value).update(next_value=next_value)
+
+
+def generate(dormitories=3, rooms=None, room_size=4, students=20000, payments=4, expenses=100,
+             devices=2, employees=3, fill=0.9, deleted=0.05, events=2000, prefix='BENCH', seed=None, log=print):
+    """Sinov ma'lumotlari: direktor, yotoqxonalar, xonalar, qurilmalar, xodimlar, talabalar, to‘lovlar, chiqimlar
+    va kirish-chiqish eventlari (events — har bir yotoqxona uchun, oxirgi 30 kun).
+
+    Talabalar, to‘lovlar, chiqimlar va eventlar bulk_create bilan yoziladi (signalsiz), shuning uchun
+    oxirida xona/yotoqxona hisoblagichlari va balanslar qayta hisoblanadi.
+    Natija: (direktor foydalanuvchisi, yotoqxonalar ro‘yxati).
+    """
+    rng = random.Random(seed)
+    today = date.today()
+    if rooms is None:
+        # Talabalar (o‘chirilganlaridan tashqari) fill ulushida joylashadigan xonalar soni
+        rooms = max(1, math.ceil(students * (1 - deleted) / (dormitories * room_size * fill)))
+
+    with transaction.atomic():
+        director_user = _create_user('director', prefix.title(), 'Direktor', rng)
+        director = Director.objects.create(user=director_user)
+
+        dorms = []
+        for index in range(1, dormitories + 1):
+            tariff = rng.choice((250000, 300000, 350000, 400000))
+            dorms.append(Dormitory.objects.create(
+                director=director, name=f"{prefix}-{director_user.pk}-{index}", address=f"{index}-ko‘cha",
+                monthly_payment=tariff, default_monthly_payment=tariff,
+            ))
+        log(f"{len(dorms)} ta yotoqxona")
+
+        staff = {}
+        for dorm in dorms:
+            staff[dorm.pk] = []
+            for _ in range(employees):
+                user = _create_user('employee', *_name(rng), rng)
+                Employee.objects.create(user=user, dormitory=dorm)
+                staff[dorm.pk].append(user)
+            # Xodimsiz yotoqxonada to‘lov va chiqimlarni direktor kiritadi
+            staff[dorm.pk] = staff[dorm.pk] or [director_user]
+            Device.objects.bulk_create([
+                Device(dormitory=dorm, ipaddress=f"10.{dorm.pk % 256}.{index // 256}.{index % 256}",
+                       username='admin', password='admin12345', entrance=index % 2 == 0)
+                for index in range(devices)
+            ])
+        log(f"{employees * len(dorms)} ta xodim, {devices * len(dorms)} ta qurilma")
+
+        room_objects = [
+            Room(dormitory=dorm, number=str(100 * (index // 50 + 1) + index % 50 + 1),
+                 size=rng.choice((room_size - 1, room_size, room_size, room_size + 1)) if room_size > 1 else 1)
+            for dorm in dorms for index in range(rooms)
+        ]
+        Room.objects.bulk_create(room_objects, batch_size=BATCH_SIZE)
+        room_objects = list(Room.objects.filter(dormitory__in=dorms).select_related('dormitory'))
+        log(f"{len(room_objects)} ta xona")
+
+        # Xonalardagi bo‘sh joylar (fill ulushigacha to‘ldiriladi)
+        slots = [room for room in room_objects for _ in range(room.size)]
+        rng.shuffle(slots)
+        slots = slots[:int(len(slots) * fill)]
+
+        next_id = _next_student_id()
+        student_objects = []
+        for index in range(students):
+            first_name, last_name = _name(rng)
+            arrival = today - timedelta(days=rng.randint(0, 700))
+            is_deleted = rng.random() < deleted
+            room = None if is_deleted or index >= len(slots) else slots[index]
+            dorm = room.dormitory if room else rng.choice(dorms)
+            student_objects.append(Student(
+                id=next_id + index, dormitory_id=dorm.pk, room=room,
+                first_name=first_name, last_name=last_name, faculty=rng.choice(FACULTIES),
+                phone_number=_phone(rng), is_in_dormitory=rng.random() < 0.7,
+                parent_full_name=" ".join(_name(rng)), contract_number=f"{arrival.year}-{next_id + index}",
+                contract_date=arrival, arrival_time=arrival,
+                checkout_time=today - timedelta(days=rng.randint(0, 30)) if is_deleted else None,
+                is_deleted=is_deleted, blocked=rng.random() < 0.02,
+            ))
+        Student.objects.bulk_create(student_objects, batch_size=BATCH_SIZE)
+        _sync_student_sequence(next_id + students)
+        log(f"{students} ta talaba")
+
+        tariffs = {dorm.pk: Decimal(dorm.monthly_payment) for dorm in dorms}
+        payment_objects = []
+        for student in student_objects:
+            tariff = tariffs[student.dormitory_id]
+            days = (today - student.arrival_time).days
+            for _ in range(rng.randint(0, 2 * payments)):
+                payment_objects.append(Payment(
+                    student_id=student.pk, student_name=f"{student.first_name} {student.last_name}",
+                    amount=tariff * rng.choice((1, 1, 2, 3)), added_by=rng.choice(staff[student.dormitory_id]),
+                    payment_time=student.arrival_time + timedelta(days=rng.randint(0, days)),
+                ))
+        Payment.objects.bulk_create(payment_objects, batch_size=BATCH_SIZE)
+        log(f"{len(payment_objects)} ta to‘lov")
+
+        Expense.objects.bulk_create([
+            Expense(dormitory=dorm, amount=Decimal(rng.randint(10, 5000) * 1000), note=rng.choice(EXPENSE_NOTES),
+                    created_by=rng.choice(staff[dorm.pk]))
+            for dorm in dorms for _ in range(expenses)
+        ], batch_size=BATCH_SIZE)
+        log(f"{expenses * len(dorms)} ta chiqim")
+
+        event_objects = []
+        now = timezone.now()
+        for dorm in dorms:
+            people = [(student.pk, f"{student.first_name} {student.last_name}") for student in student_objects
+                      if student.dormitory_id == dorm.pk and not student.is_deleted]
+            people += [(user.pk, user.get_full_name()) for user in staff[dorm.pk]]
+            dorm_devices = list(Device.objects.filter(dormitory=dorm).order_by('pk')) or [None]
+            serials = {device: 0 for device in dorm_devices}
+            moments = sorted(now - timedelta(seconds=rng.randint(0, 30 * 86400)) for _ in range(events))
+            for moment in moments:
+                device = rng.choice(dorm_devices)
+                serials[device] += 1
+                employee_no, name = rng.choice(people)
+                event_objects.append(AccessEvent(
+                    device=device, dormitory=dorm, employee_no=employee_no,
+                    person_type=AccessEvent.person_type_for(employee_no),
+                    direction='in' if device is None or device.entrance else 'out',
+                    serial_no=serials[device], time=moment, name=name,
+                    major=5, minor=76 if rng.random() < 0.03 else 75,
+                ))
+        AccessEvent.objects.bulk_create(event_objects, batch_size=BATCH_SIZE)
+        log(f"{len(event_objects)} ta kirish-chiqish eventi")
+
+    # Signalsiz yozilganlar uchun hisoblagichlar va balanslar
+    dorm_ids = [dorm.pk for dorm in dorms]
+    reconcile(dorm_ids)
+    refresh_balances(Student.objects.filter(dormitory_id__in=dorm_ids))
+    bump_stats_version(*dorm_ids)
+    log("Hisoblagichlar va balanslar yangilandi")
+    return director_user, dorms
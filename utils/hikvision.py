@@ -1,482 +1,638 @@
-
-from dormitory.models import Dormitory
-import os
+from dormitory.models import Device, Dormitory
+import heapq
 import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-from datetime import datetime, timedelta
+from datetime import datetime
+from itertools import chain, islice
+import hashlib
+import time
 import pytz
-import requests
-from requests.auth import HTTPDigestAuth
-from accounts.models import CustomUser
-from student.models import Student
+from django.conf import settings
+from django.core.cache import caches
+from utils.fanout import DeviceError, run_on_devices, summarize
+from utils.images import load_face
+from utils.isapi import get_client
+from utils.pagination import decode_cursor, encode_cursor
+from utils.people import resolve_people
 
-def update_dormitory_status(dormitories):
-    tz = pytz.timezone("Asia/Tashkent")
+TASHKENT = pytz.timezone("Asia/Tashkent")
 
-    all_logs = []
-    errors = []
 
-    for dormitory in dormitories:
-        last_time_str = str(dormitory.last_update_time) if dormitory.last_update_time else ""
+EVENTS_PAGE_SIZE = 20  # qurilma imkoniyatiga qarab o'zgartiring
 
-        try:
-            start_time = datetime.strptime(last_time_str, "%Y-%m-%d %H:%M")
-            if start_time.tzinfo is None:
-                start_time = tz.localize(start_time)
-        except:
-            start_time = datetime.now(tz) - timedelta(minutes=5)
-
-        end_time = datetime.now(tz)
-        if start_time.tzinfo is None:
-            start_time = tz.localize(start_time)
-        if end_time.tzinfo is None:
-            end_time = tz.localize(end_time)
-
-        start_iso = start_time.strftime("%Y-%m-%dT%H:%M:%S+05:00")
-        end_iso = end_time.strftime("%Y-%m-%dT%H:%M:%S+05:00")
-
-        all_devices_success = True  # Har bir yotoqxona uchun alohida tekshiriladi
-
-        for device in dormitory.devices.all():
-            url = f"http://{device.ipaddress}/ISAPI/AccessControl/AcsEvent?format=json"
-            headers = {
-                "Content-Type": "application/json",
-                "Accept": "application/json"
-            }
-            search_position = 0
-            max_results = 20
-
-            while True:
-                payload = {
-                    "AcsEventCond": {
-                        "searchID": "100001",
-                        "searchResultPosition": search_position,
-                        "maxResults": max_results,
-                        "major": 5,
-                        "minor": 75,
-                        "startTime": start_iso,
-                        "endTime": end_iso,
-                        "picEnable": False,
-                        "timeReverseOrder": True
-                    }
-                }
-
-                try:
-                    response = requests.post(
-                        url, json=payload, headers=headers,
-                        auth=HTTPDigestAuth(device.username, device.password), timeout=10
-                    )
-
-                    if response.status_code != 200:
-                        errors.append(f"{device.ipaddress} — Status code: {response.status_code}")
-                        all_devices_success = False
-                        break
-
-                    data = response.json()
-                    info_list = data.get("AcsEvent", {}).get("InfoList", [])
-
-                    if not info_list:
-                        break
-
-                    for entry in info_list:
-                        emp_id = entry.get("employeeNoString")
-                        try:
-                            emp_id = int(emp_id)
-                        except:
-                            continue
-
-                        if emp_id < 10000:
-                            try:
-                                user = CustomUser.objects.get(pk=emp_id)
-                                user.is_in_dormitory = device.entrance
-                                user.save(update_fields=['is_in_dormitory'])
-                            except CustomUser.DoesNotExist:
-                                continue
-                        else:
-                            try:
-                                student = Student.objects.get(pk=emp_id)
-                                student.is_in_dormitory = device.entrance
-                                student.save(update_fields=['is_in_dormitory'])
-                            except Student.DoesNotExist:
-                                continue
-
-                        all_logs.append({
-                            "id": emp_id,
-                            "status": "Kirish" if device.entrance else "Chiqish",
-                            "time": entry.get("time"),
-                            "dormitory": dormitory.name
-                        })
-
-                    if len(info_list) < max_results:
-                        break
-                    search_position += max_results
-
-                except Exception as e:
-                    errors.append(f"{device.ipaddress} — Xatolik: {str(e)}")
-                    all_devices_success = False
-                    break
-
-        if all_devices_success:
-            new_last_time = (end_time - timedelta(minutes=3)).strftime("%Y-%m-%d %H:%M")
-            dormitory.last_update_time = new_last_time
-            dormitory.save(update_fields=["last_update_time"])
-
-    return all_logs, errors
 
-def add_user_to_devices(dormitory: Dormitory, employee_id: str, full_name: str, image_path: str) -> tuple[bool, str | None]:
-    """Barcha qurilmalarga foydalanuvchini (ism+familiya+id) va rasmni yuklash.
-    Xatolik bo‘lsa: (False, xatolik_sababi), muvaffaqiyatli bo‘lsa: (True, None)
-    """
+def fetch_events_page(device, start_iso, end_iso, position=0, major=0, minor=0, pic_enable=False,
+                      security=False, employee_no=None):
+    """Bitta qurilmadan bitta sahifa eventlar (yangidan eskiga).
 
-    devices = dormitory.devices.all()
-
-    for device in devices:
-        base_url = f"http://{device.ipaddress}"
-        username = device.username
-        password = device.password
-
-        # 1. Foydalanuvchini qo‘shish
-        user_payload = {
-            "UserInfo": {
-                "employeeNo": employee_id,
-                "name": full_name,
-                "userType": "normal",
-                "Valid": {
-                    "enable": True,
-                    "beginTime": "2024-01-01T00:00:00",
-                    "endTime": "2030-12-31T23:59:59"
-                },
-                "doorRight": "1",
-                "RightPlan": [{"doorNo": 1, "planTemplateNo": "1"}],
-                "userVerifyMode": "face",
-                "maxOpenDoorTime": 10,
-                "userGroup": 1,
-                "localUIRight": False,
-                "userPassword": "",
-                "passwordType": "normal",
-                "openDoorType": {
-                    "doorType": "local"
-                }
-            }
+    employee_no berilsa qidiruv qurilmaning o‘zida bajariladi (employeeNoString). Bu maydonni
+    tanimaydigan proshivka uchun filtrsiz so‘raladi — natija chaqiruvchida filtrlanadi.
+    """
+    client = get_client(device)
+    path = "/ISAPI/AccessControl/AcsEvent?format=json"
+    if security:
+        path += "&security=1"
+    headers = {
+        "Content-Type": "application/json",
+        "Accept": "application/json"
+    }
+    payload = {
+        "AcsEventCond": {
+            "searchID": "100001",
+            "searchResultPosition": position,
+            "maxResults": EVENTS_PAGE_SIZE,
+            "major": major,
+            "minor": minor,
+            "startTime": start_iso,
+            "endTime": end_iso,
+            "picEnable": pic_enable,
+            "timeReverseOrder": True
         }
-
-        try:
-            auth = HTTPDigestAuth(username, password)
-            headers = {"Content-Type": "application/json"}
-            user_url = f"{base_url}/ISAPI/AccessControl/UserInfo/Record?format=json&security=1"
-            user_response = requests.post(user_url, auth=auth, json=user_payload, headers=headers, verify=False)
-
-            if user_response.status_code != 200:
-                reason = f"[{device.ipaddress}] Foydalanuvchi qo‘shilmadi: {user_response.text}"
-                print("❌", reason)
-                return False, reason
-
-            # 2. Yuz rasm yuklash
-            if not os.path.exists(image_path):
-                reason = f"Surat topilmadi: {image_path}"
-                print("❌", reason)
-                return False, reason
-
-            face_url = f"{base_url}/ISAPI/Intelligent/FDLib/FaceDataRecord?format=json"
-            files = {
-                "FaceDataRecord": (
-                    None,
-                    f'{{"faceLibType":"blackFD","FDID":"1","FPID":"{employee_id}"}}',
-                    "application/json"
-                ),
-                "img": (
-                    os.path.basename(image_path),
-                    open(image_path, "rb"),
-                    "image/jpeg"
-                )
+    }
+    pushed_down = bool(employee_no) and client.supports_event_filter is not False
+    if pushed_down:
+        payload["AcsEventCond"]["employeeNoString"] = str(employee_no)
+
+    response = client.post(path, json=payload, headers=headers)
+    if pushed_down and response.status_code == 200:
+        client.supports_event_filter = True
+    elif pushed_down and response.status_code == 400 and client.supports_event_filter is None:
+        client.supports_event_filter = False
+        del payload["AcsEventCond"]["employeeNoString"]
+        response = client.post(path, json=payload, headers=headers)
+
+    if response.status_code != 200:
+        raise DeviceError(f"{device.ipaddress} — Status code: {response.status_code}")
+    return response.json().get("AcsEvent", {}).get("InfoList", [])
+
+
+def _matches(entry, employee_no=None, major=0, minor=0):
+    """Qurilma filtrni e'tiborsiz qoldirgan bo‘lsa ham natija to‘g‘ri bo‘lishi uchun mahalliy tekshiruv."""
+    if employee_no and entry.get("employeeNoString") != str(employee_no):
+        return False
+    if major and entry.get("major") != major:
+        return False
+    if minor and entry.get("minor") != minor:
+        return False
+    return True
+
+
+def iter_device_events(device, start_iso, end_iso, **kwargs):
+    """Qurilma eventlari yangidan eskiga; keyingi sahifa faqat kerak bo‘lganda so‘raladi."""
+    position = 0
+    last_serial = None
+
+    while True:
+        page = fetch_events_page(device, start_iso, end_iso, position, **kwargs)
+        for entry in page:
+            serial_no = entry.get("serialNo")
+            # So‘rovlar orasida yangi event kelsa ro‘yxat suriladi — takrorlangan eventlar tashlanadi
+            if serial_no is not None and last_serial is not None and serial_no >= last_serial:
+                continue
+            if serial_no is not None:
+                last_serial = serial_no
+            yield entry
+
+        # Agar qaytgan eventlar soni sahifa hajmidan kam bo'lsa, tugatamiz
+        if len(page) < EVENTS_PAGE_SIZE:
+            return
+        position += len(page)
+
+
+def fetch_events_after(device, last_serial_no, start_iso, end_iso, max_pages=None):
+    """Qurilmadan seriya raqami last_serial_no dan katta eventlarni eskidan yangiga qarab olish.
+
+    O‘sish tartibida sahifalanadi: so‘rov davomida kelgan yangi eventlar oxiriga qo‘shiladi va
+    oldingi sahifalarni siljitmaydi. beginSerialNo ni qo‘llamaydigan qurilmalar uchun natija
+    baribir seriya raqami bo‘yicha filtrlanadi. max_pages ga yetilsa qolgani keyingi safar olinadi.
+    """
+    client = get_client(device)
+    path = "/ISAPI/AccessControl/AcsEvent?format=json&security=1"
+    max_results = 30
+    max_pages = max_pages or getattr(settings, 'ACCESS_EVENT_MAX_PAGES', 50)
+    search_id = f"{device.pk}-{last_serial_no}"
+    entries = []
+
+    for page in range(max_pages):
+        payload = {
+            "AcsEventCond": {
+                "searchID": search_id,
+                "searchResultPosition": page * max_results,
+                "maxResults": max_results,
+                "major": 0,
+                "minor": 0,
+                "startTime": start_iso,
+                "endTime": end_iso,
+                "beginSerialNo": last_serial_no + 1,
+                "picEnable": False,
+                "timeReverseOrder": False
             }
+        }
+        response = client.post(path, json=payload)
+        if response.status_code != 200:
+            raise DeviceError(f"{device.ipaddress} — Status code: {response.status_code}")
+
+        acs_event = response.json().get("AcsEvent", {})
+        info_list = acs_event.get("InfoList", [])
+        entries.extend(entry for entry in info_list if (entry.get("serialNo") or 0) > last_serial_no)
+
+        # "MORE" — yana natija bor, "OK" / "NO MATCH" — tugadi
+        if acs_event.get("responseStatusStrg") != "MORE" and len(info_list) < max_results:
+            break
+
+    return entries
+
+
+def latest_serial_no(device, end_iso) -> int:
+    """Qurilmadagi eng yangi eventning seriya raqami (jurnal bo‘sh bo‘lsa 0)."""
+    payload = {
+        "AcsEventCond": {
+            "searchID": f"{device.pk}-latest",
+            "searchResultPosition": 0,
+            "maxResults": 1,
+            "major": 0,
+            "minor": 0,
+            "startTime": "2000-01-01T00:00:00+05:00",
+            "endTime": end_iso,
+            "picEnable": False,
+            "timeReverseOrder": True
+        }
+    }
+    response = get_client(device).post("/ISAPI/AccessControl/AcsEvent?format=json&security=1", json=payload)
+    if response.status_code != 200:
+        raise DeviceError(f"{device.ipaddress} — Status code: {response.status_code}")
+    info_list = response.json().get("AcsEvent", {}).get("InfoList", [])
+    return max((entry.get("serialNo") or 0 for entry in info_list), default=0)
+
+
+def _user_info(employee_id: str, full_name: str) -> dict:
+    return {
+        "employeeNo": employee_id,
+        "name": full_name,
+        "userType": "normal",
+        "Valid": {
+            "enable": True,
+            "beginTime": "2024-01-01T00:00:00",
+            "endTime": "2030-12-31T23:59:59"
+        },
+        "doorRight": "1",
+        "RightPlan": [{"doorNo": 1, "planTemplateNo": "1"}],
+        "userVerifyMode": "face",
+        "maxOpenDoorTime": 10,
+        "userGroup": 1,
+        "localUIRight": False,
+        "userPassword": "",
+        "passwordType": "normal",
+        "openDoorType": {
+            "doorType": "local"
+        }
+    }
+
+
+def _upload_face(client, device, employee_id: str, image, upsert=False):
+    """image — surat baytlari (load_face) yoki fayl yo‘li."""
+    face = load_face(image) if isinstance(image, str) else image
+    if not face:
+        raise DeviceError(f"Surat topilmadi: {image}")
+
+    files = {
+        "FaceDataRecord": (
+            None,
+            f'{{"faceLibType":"blackFD","FDID":"1","FPID":"{employee_id}"}}',
+            "application/json"
+        ),
+        "img": (
+            f"{employee_id}.jpg",
+            face,
+            "image/jpeg"
+        )
+    }
+    if upsert:
+        # FDSetUp mavjud yuzni almashtiradi, yo‘q bo‘lsa qo‘shadi (qayta yuklash uchun)
+        face_response = client.put("/ISAPI/Intelligent/FDLib/FDSetUp?format=json", files=files)
+    else:
+        face_response = client.post("/ISAPI/Intelligent/FDLib/FaceDataRecord?format=json", files=files)
+
+    if face_response.status_code != 200:
+        raise DeviceError(f"[{device.ipaddress}] Surat yuklanmadi: {face_response.text}")
+
+
+def add_user_to_device(device, employee_id: str, full_name: str, image):
+    """Bitta qurilmaga foydalanuvchini (ism+familiya+id) va rasmni (baytlar yoki fayl yo‘li) yuklash."""
+    client = get_client(device)
+
+    # 1. Foydalanuvchini qo‘shish
+    user_response = client.post("/ISAPI/AccessControl/UserInfo/Record?format=json&security=1",
+                                json={"UserInfo": _user_info(employee_id, full_name)},
+                                headers={"Content-Type": "application/json"})
+    if user_response.status_code != 200:
+        raise DeviceError(f"[{device.ipaddress}] Foydalanuvchi qo‘shilmadi: {user_response.text}")
+
+    # 2. Yuz rasm yuklash
+    _upload_face(client, device, employee_id, image)
+
+
+def _unsupported(response) -> bool:
+    """Qurilma so‘rov shaklini umuman qo‘llamasligini bildiruvchi javob (notSupport / badJsonContent)."""
+    if response.status_code not in (400, 404):
+        return False
+    try:
+        sub_status = str(response.json().get("subStatusCode", ""))
+    except ValueError:
+        return False
+    return sub_status.startswith(("notSupport", "badJsonContent"))
 
-            face_response = requests.post(face_url, auth=auth, files=files, verify=False)
-            if face_response.status_code != 200:
-                reason = f"[{device.ipaddress}] Surat yuklanmadi: {face_response.text}"
-                print("❌", reason)
-                return False, reason
-
-            print(f"[{device.ipaddress}] ✅ Foydalanuvchi va surat yuklandi.")
-
-        except Exception as e:
-            reason = f"[{device.ipaddress}] Istisno yuz berdi: {str(e)}"
-            print("❌", reason)
-            return False, reason
 
-    return True, None
+def _record_users(client, device, batch) -> list:
+    """Foydalanuvchilarni bitta so‘rovda (ko‘p yozuvli UserInfo SetUp) yozish, yozilganlar ro‘yxatini qaytaradi.
 
-def delete_user_from_devices(dormitory: Dormitory, employee_id: str) -> tuple[bool, str | None]:
+    SetUp mavjud foydalanuvchini yangilaydi, shuning uchun qayta yozishda partiya buzilmaydi.
+    Qurilma ko‘p yozuvli so‘rovni qo‘llamasa (notSupport / badJsonContent) bu eslab qolinadi;
+    boshqa xatoda faqat shu partiya har biri alohida SetUp bilan yoziladi.
+    """
+    headers = {"Content-Type": "application/json"}
+    if client.supports_batch_records is not False:
+        response = client.put("/ISAPI/AccessControl/UserInfo/SetUp?format=json",
+                              json={"UserInfo": [_user_info(u["employee_id"], u["full_name"]) for u in batch]},
+                              headers=headers)
+        if response.status_code == 200:
+            client.supports_batch_records = True
+            return [u["employee_id"] for u in batch]
+        if client.supports_batch_records is None and _unsupported(response):
+            client.supports_batch_records = False
+
+    recorded = []
+    for user in batch:
+        response = client.put("/ISAPI/AccessControl/UserInfo/SetUp?format=json",
+                              json={"UserInfo": _user_info(user["employee_id"], user["full_name"])},
+                              headers=headers)
+        if response.status_code == 200:
+            recorded.append(user["employee_id"])
+        else:
+            print(f"[{device.ipaddress}] ❌ {user['employee_id']} yozilmadi: {response.text}")
+    return recorded
+
+
+def enroll_users_on_device(device, users, start=0, on_batch=None, faces=None):
+    """Ko‘p foydalanuvchini qurilmaga partiyalab yozish va yuz rasmlarini ketma-ket yuklash.
+
+    users — {"employee_id", "full_name", "image_path"} lug‘atlari ro‘yxati. start dan
+    boshlanadi (to‘xtagan joydan davom ettirish uchun). Har partiyadan keyin
+    on_batch(bajarilganlar_soni, xato_bergan_idlar) chaqiriladi. faces (FaceCache)
+    berilsa suratlar qurilmalar o‘rtasida umumiy: har biri bir marta tayyorlanadi.
+    """
+    client = get_client(device)
+    batch_size = getattr(settings, 'HIKVISION_ENROLL_BATCH_SIZE', 20)
+
+    done = start
+    while done < len(users):
+        batch = users[done:done + batch_size]
+        recorded = set(_record_users(client, device, batch))
+
+        failed = []
+        for user in batch:
+            if user["employee_id"] not in recorded:
+                failed.append(user["employee_id"])
+                continue
+            try:
+                # Qurilmaga navbat bilan yuboriladi: keyingi rasm oldingisiga javob kelgach ketadi
+                image = (faces.get(user["image_path"]) if faces else None) or user["image_path"]
+                _upload_face(client, device, user["employee_id"], image, upsert=True)
+            except DeviceError as e:
+                print("❌", e)
+                failed.append(user["employee_id"])
 
-    devices = dormitory.devices.all()
+        done += len(batch)
+        if on_batch:
+            on_batch(done, failed)
+    return done
 
-    for device in devices:
-        base_url = f"http://{device.ipaddress}"
-        username = device.username
-        password = device.password
-        auth = HTTPDigestAuth(username, password)
 
-        delete_url = f"{base_url}/ISAPI/AccessControl/UserInfo/Delete?format=json"
-        payload = {
-            "UserInfoDelCond": {
-                "EmployeeNoList": [{"employeeNo": employee_id}]
-            }
+def add_user_to_devices(dormitory: Dormitory, employee_id: str, full_name: str, image_path: str) -> tuple[bool, str | None]:
+    """Barcha qurilmalarga foydalanuvchini (ism+familiya+id) va rasmni yuklash.
+    Xatolik bo‘lsa: (False, xatolik_sababi), muvaffaqiyatli bo‘lsa: (True, None)
+    """
+    # Surat bir marta o‘qiladi, barcha qurilmalarga shu baytlar yuboriladi
+    image = load_face(image_path) or image_path
+    results = run_on_devices(dormitory.devices.all(), add_user_to_device, employee_id, full_name, image)
+    for result in results:
+        if result.ok:
+            print(f"[{result.device.ipaddress}] ✅ Foydalanuvchi va surat yuklandi.")
+        else:
+            print("❌", result.error)
+    return summarize(results)
+
+
+def delete_user_from_device(device, employee_id: str):
+    payload = {
+        "UserInfoDelCond": {
+            "EmployeeNoList": [{"employeeNo": employee_id}]
         }
+    }
 
-        headers = {"Content-Type": "application/json"}
+    response = get_client(device).put("/ISAPI/AccessControl/UserInfo/Delete?format=json", json=payload,
+                                      headers={"Content-Type": "application/json"})
+    if response.status_code != 200:
+        raise DeviceError(f"[{device.ipaddress}] ❌ O‘chirishda xatolik: {response.status_code} - {response.text}")
 
-        try:
-            response = requests.put(delete_url, auth=auth, json=payload, headers=headers, verify=False)
-            if response.status_code == 200:
-                print(f"[{device.ipaddress}] ✅ Foydalanuvchi (ID: {employee_id}) o‘chirildi.")
-            else:
-                reason = f"[{device.ipaddress}] ❌ O‘chirishda xatolik: {response.status_code} - {response.text}"
-                print(reason)
-                return False, reason
 
-        except Exception as e:
-            reason = f"[{device.ipaddress}] ❌ Istisno yuz berdi: {str(e)}"
-            print(reason)
-            return False, reason
+def delete_user_from_devices(dormitory: Dormitory, employee_id: str) -> tuple[bool, str | None]:
+    results = run_on_devices(dormitory.devices.all(), delete_user_from_device, employee_id)
+    for result in results:
+        if result.ok:
+            print(f"[{result.device.ipaddress}] ✅ Foydalanuvchi (ID: {employee_id}) o‘chirildi.")
+        else:
+            print(result.error)
+    return summarize(results)
+
+
+def _modify_user_on_device(device, payload):
+    response = get_client(device).put("/ISAPI/AccessControl/UserInfo/Modify?format=json", json=payload,
+                                      headers={"Content-Type": "application/json"})
+    if response.status_code != 200:
+        raise DeviceError(f"[{device.ipaddress}] ❌ Xato: {response.status_code} - {response.text}")
+
+
+def update_user_on_device(device, employee_id: str, name: str):
+    payload = {
+        "UserInfo": {
+            "employeeNo": employee_id,
+            "name": name,
+            "userType": "normal",
+            "Valid": {
+                "enable": True,
+                "beginTime": "2025-01-01T00:00:00",
+                "endTime": "2030-12-31T23:59:59",
+                "timeType": "local"
+            },
+            "doorRight": "1",
+            "RightPlan": [{"doorNo": 1, "planTemplateNo": "1"}],
+            "gender": "unknown",
+            "localUIRight": False,
+            "maxOpenDoorTime": 100,
+            "userVerifyMode": "face",
+            "password": ""
+        }
+    }
+    _modify_user_on_device(device, payload)
 
-    return True, None
 
 def update_user_on_devices(dormitory: Dormitory, employee_id: str, name: str) -> tuple[bool, str | None]:
+    results = run_on_devices(dormitory.devices.all(), update_user_on_device, employee_id, name)
+    for result in results:
+        if result.ok:
+            print(f"[{result.device.ipaddress}] ✅ Yangilandi: {employee_id} ({name})")
+    return summarize(results)
 
-    urllib3.disable_warnings()
-
-    devices = dormitory.devices.all()
 
-    for device in devices:
-        base_url = f"http://{device.ipaddress}"
-        auth = HTTPDigestAuth(device.username, device.password)
+def _event_time(entry):
+    try:
+        return datetime.fromisoformat(entry.get("time"))
+    except (TypeError, ValueError):
+        return None
 
-        update_url = f"{base_url}/ISAPI/AccessControl/UserInfo/Modify?format=json"
-        payload = {
-            "UserInfo": {
-                "employeeNo": employee_id,
-                "name": name,
-                "userType": "normal",
-                "Valid": {
-                    "enable": True,
-                    "beginTime": "2025-01-01T00:00:00",
-                    "endTime": "2030-12-31T23:59:59",
-                    "timeType": "local"
-                },
-                "doorRight": "1",
-                "RightPlan": [{"doorNo": 1, "planTemplateNo": "1"}],
-                "gender": "unknown",
-                "localUIRight": False,
-                "maxOpenDoorTime": 100,
-                "userVerifyMode": "face",
-                "password": ""
-            }
-        }
 
-        try:
-            response = requests.put(update_url, auth=auth, json=payload, headers={"Content-Type": "application/json"},
-                                    verify=False)
-            if response.status_code == 200:
-                print(f"[{device.ipaddress}] ✅ Yangilandi: {employee_id} ({name})")
-            else:
-                return False, f"[{device.ipaddress}] ❌ Xato: {response.status_code} - {response.text}"
-        except Exception as e:
-            return False, f"[{device.ipaddress}] ❌ Istisno: {str(e)}"
-
-    return True, None
-
-def getLogs(dormitory: Dormitory, start_time_str, end_time_str):
-    tz = pytz.timezone("Asia/Tashkent")
-    try:
-        start_time = datetime.strptime(start_time_str, "%Y-%m-%d %H:%M")
-        end_time = datetime.strptime(end_time_str, "%Y-%m-%d %H:%M")
-    except ValueError:
-        raise ValueError("Sanani formatda kiriting: YYYY-MM-DD HH:MM")
-    devices = dormitory.devices.all()
-    start_time = tz.localize(start_time)
-    end_time = tz.localize(end_time)
+# ---------------------------------------------------------------- daqiqalik kesh
 
-    start_iso = start_time.strftime("%Y-%m-%dT%H:%M:%S+05:00")
-    end_iso = end_time.strftime("%Y-%m-%dT%H:%M:%S+05:00")
+def _device_iso(timestamp):
+    return datetime.fromtimestamp(timestamp, TASHKENT).strftime("%Y-%m-%dT%H:%M:%S+05:00")
 
-    errors = []
-    all_logs = []
 
-    for device in devices:
-        device_ip = device.ipaddress
-        username = device.username
-        password = device.password
-        entrance = device.entrance
+def _bucket_prefix(device, kwargs):
+    """Kesh kaliti qurilma va so‘rov filtrlariga bog‘liq (filtrlangan sahifa boshqa natija)."""
+    signature = hashlib.md5(repr(sorted(kwargs.items())).encode()).hexdigest()[:12]
+    return f"acs_events:{device.pk}:{device.ipaddress}:{signature}"
 
-        url = f"http://{device_ip}/ISAPI/AccessControl/AcsEvent?format=json&security=1"
-        headers = {
-            "Content-Type": "application/json",
-            "Accept": "application/json"
-        }
 
-        search_position = 0
-        max_results = 20  # qurilma imkoniyatiga qarab o'zgartiring
-
-        while True:
-            payload = {
-                "AcsEventCond": {
-                    "searchID": "100001",
-                    "searchResultPosition": search_position,
-                    "maxResults": max_results,
-                    "major": 0,
-                    "minor": 0,
-                    "startTime": start_iso,
-                    "endTime": end_iso,
-                    "picEnable": True,
-                    "timeReverseOrder": True
-                }
-            }
+def cached_device_events(device, start_time, end_time, **kwargs):
+    """Qurilma eventlari yangidan eskiga, daqiqalik bo‘laklar (bucket) bo‘yicha keshlangan.
 
-            try:
-                response = requests.post(url, json=payload, headers=headers,
-                                         auth=HTTPDigestAuth(username, password), timeout=10)
-
-                if response.status_code == 200:
-                    data = response.json()
-                    events = data.get("AcsEvent", {})
-                    info_list = events.get("InfoList", [])
-
-                    if not info_list:
-                        # Loglar qolmadi, siklni to'xtatamiz
-                        break
-
-                    for entry in info_list:
-                        raw_time = entry.get("time")
-                        try:
-                            dt = datetime.fromisoformat(raw_time)
-                            formatted_time = dt.strftime("%Y-%m-%d %H:%M")
-                        except Exception:
-                            formatted_time = raw_time
-
-                        employee_no_str = entry.get("employeeNoString")
-                        try:
-                            employee_no_int = int(employee_no_str)
-                        except (ValueError, TypeError):
-                            employee_no_int = 0
-
-                        # Hodim yoki talaba borligini tekshirish
-                        if employee_no_int < 10000:
-                            exists = CustomUser.objects.filter(pk=employee_no_int).exists()
-                        else:
-                            exists = Student.objects.filter(pk=employee_no_int).exists()
-
-                        log_entry = {
-                            "employeeNo": employee_no_int,
-                            "name": entry.get("name"),
-                            "time": formatted_time,
-                            "status": "Kirish" if entrance else "Chiqish",
-                            "exists": exists,
-                        }
-                        all_logs.append(log_entry)
-
-                    # Agar qaytgan eventlar soni max_results dan kam bo'lsa, tugatamiz
-                    if len(info_list) < max_results:
-                        break
-
-                    # Keyingi sahifaga o'tamiz
-                    search_position += max_results
-
-                else:
-                    errors.append(f"{device_ip} — So‘rov xatosi: {response.status_code}")
-                    break
-
-            except Exception as e:
-                errors.append(f"{device_ip} — Xatolik: {str(e)}")
-                break
-
-    all_logs.sort(key=lambda x: x["time"], reverse=True)
-
-    return all_logs, errors,
+    Tugagan daqiqa eventlari endi o‘zgarmaydi va keshda saqlanadi; oxirgi
+    LOGS_CACHE_LIVE_EDGE soniya har safar qurilmadan olinadi. Keshda yo‘q ketma-ket
+    daqiqalar bitta oraliq qilib so‘raladi, shuning uchun ustma-ust oynalarda faqat
+    yangi daqiqalar yuklanadi. Bo‘lak faqat to‘liq o‘qilgandan keyin keshga yoziladi.
+    """
+    size = getattr(settings, 'LOGS_CACHE_BUCKET', 60)
+    timeout = getattr(settings, 'LOGS_CACHE_TIMEOUT', 86400)
+    start_ts, end_ts = int(start_time.timestamp()), int(end_time.timestamp())
+    # Bu bo‘lakdan boshlab qurilma hali yangi event yozishi mumkin
+    live_edge = int(time.time() - getattr(settings, 'LOGS_CACHE_LIVE_EDGE', 60)) // size
+
+    cache = caches[getattr(settings, 'LOGS_CACHE_ALIAS', 'default')]
+    prefix = _bucket_prefix(device, kwargs)
+    buckets = range(end_ts // size, start_ts // size - 1, -1)
+    keys = {bucket: f"{prefix}:{bucket}" for bucket in buckets}
+    cached = cache.get_many(keys.values())
+
+    def in_window(entry):
+        event_time = _event_time(entry)
+        return event_time is None or start_ts <= event_time.timestamp() <= end_ts
+
+    index = 0
+    while index < len(buckets):
+        bucket = buckets[index]
+        if keys[bucket] in cached:
+            yield from filter(in_window, cached[keys[bucket]])
+            index += 1
+            continue
+
+        # Keshda yo‘q ketma-ket bo‘laklar: bitta so‘rov bilan olinadi
+        run_end = index
+        while run_end + 1 < len(buckets) and keys[buckets[run_end + 1]] not in cached:
+            run_end += 1
+        newest, oldest = bucket, buckets[run_end]
+
+        current, collected = newest, []
+        for entry in iter_device_events(device, _device_iso(oldest * size), _device_iso(newest * size + size - 1), **kwargs):
+            event_time = _event_time(entry)
+            entry_bucket = int(event_time.timestamp()) // size if event_time else current
+            while entry_bucket < current and current > oldest:
+                if current < live_edge:
+                    cache.set(keys[current], collected, timeout)
+                current, collected = current - 1, []
+            collected.append(entry)
+            if in_window(entry):
+                yield entry
+
+        # Oraliq oxirigacha o‘qildi: qolgan (bo‘sh bo‘lsa ham) bo‘laklar tugagan
+        while current >= oldest:
+            if current < live_edge:
+                cache.set(keys[current], collected, timeout)
+            current, collected = current - 1, []
+        index = run_end + 1
+
+
+def _open_stream(device, start_time, end_time, **kwargs):
+    """Qurilma oqimini ochish: birinchi sahifa shu yerda (parallel oqimda) olinadi."""
+    stream = cached_device_events(device, start_time, end_time, **kwargs)
+    first = next(stream, None)
+    return [] if first is None else chain([first], stream)
+
+
+def _device_stream(device, events, errors, employee_no=None, major=0, minor=0):
+    """Qurilma oqimi (kalit, qurilma, event) ko‘rinishida; keyingi sahifadagi xato oqimni to‘xtatadi."""
+    try:
+        for entry in events:
+            event_time = _event_time(entry)
+            if event_time is None or not _matches(entry, employee_no, major, minor):
+                continue
+            yield (event_time.timestamp(), device.pk, entry.get("serialNo") or 0), device, entry
+    except DeviceError as e:
+        errors.append(str(e))
+    except Exception as e:
+        errors.append(f"[{device.ipaddress}] Istisno yuz berdi: {e}")
+
+
+def merged_device_events(devices, start_time, end_time, errors, **kwargs):
+    """Bir nechta qurilma eventlarini yangidan eskiga bitta oqimga birlashtirish.
+
+    Har bir qurilma oqimi o‘zi vaqt bo‘yicha kamayib boradi, shuning uchun ular heap bilan
+    (k-way merge) birlashtiriladi: hammasini yig‘ib saralash shart emas. Birinchi sahifalar
+    parallel olinadi, keyingilari faqat o‘qish davom etganda so‘raladi.
+    """
+    filters = {key: kwargs[key] for key in ("employee_no", "major", "minor") if key in kwargs}
+    streams = []
+    for result in run_on_devices(devices, _open_stream, start_time, end_time, **kwargs):
+        if not result.ok:
+            errors.append(result.error)
+            continue
+        streams.append(_device_stream(result.device, result.value, errors, **filters))
+    return heapq.merge(*streams, key=lambda item: item[0], reverse=True)
 
-def block_user_on_devices(dormitory: Dormitory, employee_id: str) -> tuple[bool, str | None]:
 
-    urllib3.disable_warnings()
+def _parse_range(start_time_str, end_time_str):
+    try:
+        start_time = datetime.strptime(start_time_str, "%Y-%m-%d %H:%M")
+        end_time = datetime.strptime(end_time_str, "%Y-%m-%d %H:%M")
+    except ValueError:
+        raise ValueError("Sanani formatda kiriting: YYYY-MM-DD HH:MM")
+    return TASHKENT.localize(start_time), TASHKENT.localize(end_time)
 
-    devices = dormitory.devices.all()
 
-    for device in devices:
-        base_url = f"http://{device.ipaddress}"
-        auth = HTTPDigestAuth(device.username, device.password)
+def get_merged_logs(dormitories, start_time_str, end_time_str, cursor=None, limit=None,
+                    employee_no=None, direction=None, major=0, minor=0):
+    """Bir yoki bir nechta yotoqxona qurilmalaridan loglar, yangilari birinchi.
 
-        update_url = f"{base_url}/ISAPI/AccessControl/UserInfo/Modify?format=json"
-        payload = {
-            "UserInfo": {
-                "employeeNo": employee_id,
-                "userType": "blackList",
-                "Valid": {
-                    "enable": True,
-                    "beginTime": "2025-01-01T00:00:00",
-                    "endTime": "2030-12-31T23:59:59",
-                    "timeType": "local"
-                },
-                "doorRight": "1",
-                "RightPlan": [{"doorNo": 1, "planTemplateNo": "1"}],
-                "gender": "unknown",
-                "localUIRight": False,
-                "maxOpenDoorTime": 100,
-                "userVerifyMode": "face",
-                "password": ""
-            }
-        }
+    limit berilsa faqat shuncha log o‘qiladi va keyingi sahifa uchun kursor qaytadi
+    (qurilmalar hammasi to‘liq o‘qilishini kutmasdan). Filtrlar qurilmaga yuboriladi:
+    odam va event turi — AcsEventCond da, yo‘nalish — faqat kirish yoki chiqish
+    qurilmalarini so‘rash bilan. Natija: (loglar, xatolar, kursor).
+    """
+    start_time, end_time = _parse_range(start_time_str, end_time_str)
 
+    # Kursor — (vaqt, qurilma id, seriya raqami); noto‘g‘ri bo‘lsa birinchi sahifa
+    after = decode_cursor(cursor, ((int, float), int, int))
+    if after:
         try:
-            response = requests.put(update_url, auth=auth, json=payload, headers={"Content-Type": "application/json"},
-                                    verify=False)
-            if response.status_code == 200:
-                print(f"[{device.ipaddress}] ✅ Yangilandi: {employee_id}")
-            else:
-                return False, f"[{device.ipaddress}] ❌ Xato: {response.status_code} - {response.text}"
-        except Exception as e:
-            return False, f"[{device.ipaddress}] ❌ Istisno: {str(e)}"
-
-    return True, None
+            after_time = datetime.fromtimestamp(after[0], end_time.tzinfo)
+        except (OverflowError, OSError, ValueError):
+            after = None
+        else:
+            # Kursordagi vaqtdan (shu soniya ham) eskilarni so‘raymiz, allaqachon ko‘rsatilganlari tashlanadi
+            end_time = min(end_time, after_time)
+            after = tuple(after)
+
+    devices = Device.objects.filter(dormitory__in=dormitories).select_related('dormitory')
+    if direction:
+        devices = devices.filter(entrance=(direction == 'in'))
+    errors = []
+    merged = merged_device_events(devices, start_time, end_time, errors, pic_enable=True, security=True,
+                                  employee_no=employee_no, major=major, minor=minor)
+    if after:
+        merged = (item for item in merged if item[0] < after)
 
-def open_user_on_devices(dormitory: Dormitory, employee_id: str) -> tuple[bool, str | None]:
+    items = list(merged if limit is None else islice(merged, limit + 1))
+    next_cursor = None
+    if limit is not None and len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(list(items[-1][0]))
 
-    urllib3.disable_warnings()
+    # Hodim yoki talaba borligini sahifa uchun ikki so‘rov bilan tekshirish
+    students, users = resolve_people(entry.get("employeeNoString") for _, _, entry in items)
 
-    devices = dormitory.devices.all()
+    all_logs = []
+    for _, device, entry in items:
+        employee_no_str = entry.get("employeeNoString")
+        try:
+            employee_no_int = int(employee_no_str)
+        except (ValueError, TypeError):
+            employee_no_int = 0
+
+        if employee_no_int < 10000:
+            exists = employee_no_int in users
+        else:
+            exists = employee_no_int in students
+
+        all_logs.append({
+            "employeeNo": employee_no_int,
+            "name": entry.get("name"),
+            "time": _event_time(entry).strftime("%Y-%m-%d %H:%M"),
+            "status": "Kirish" if device.entrance else "Chiqish",
+            "exists": exists,
+            "dormitory": device.dormitory.name,
+        })
+
+    return all_logs, errors, next_cursor
+
+
+def block_user_on_device(device, employee_id: str):
+    payload = {
+        "UserInfo": {
+            "employeeNo": employee_id,
+            "userType": "blackList",
+            "Valid": {
+                "enable": True,
+                "beginTime": "2025-01-01T00:00:00",
+                "endTime": "2030-12-31T23:59:59",
+                "timeType": "local"
+            },
+            "doorRight": "1",
+            "RightPlan": [{"doorNo": 1, "planTemplateNo": "1"}],
+            "gender": "unknown",
+            "localUIRight": False,
+            "maxOpenDoorTime": 100,
+            "userVerifyMode": "face",
+            "password": ""
+        }
+    }
+    _modify_user_on_device(device, payload)
 
-    for device in devices:
-        base_url = f"http://{device.ipaddress}"
-        auth = HTTPDigestAuth(device.username, device.password)
 
-        update_url = f"{base_url}/ISAPI/AccessControl/UserInfo/Modify?format=json"
-        payload = {
-            "UserInfo": {
-                "employeeNo": employee_id,
-                "userType": "normal",
-                "Valid": {
-                    "enable": True,
-                    "beginTime": "2025-01-01T00:00:00",
-                    "endTime": "2030-12-31T23:59:59",
-                    "timeType": "local"
-                },
-                "doorRight": "1",
-                "RightPlan": [{"doorNo": 1, "planTemplateNo": "1"}],
-                "gender": "unknown",
-                "localUIRight": False,
-                "maxOpenDoorTime": 100,
-                "userVerifyMode": "face",
-                "password": ""
-            }
+def block_user_on_devices(dormitory: Dormitory, employee_id: str) -> tuple[bool, str | None]:
+    results = run_on_devices(dormitory.devices.all(), block_user_on_device, employee_id)
+    for result in results:
+        if result.ok:
+            print(f"[{result.device.ipaddress}] ✅ Yangilandi: {employee_id}")
+    return summarize(results)
+
+
+def open_user_on_device(device, employee_id: str):
+    payload = {
+        "UserInfo": {
+            "employeeNo": employee_id,
+            "userType": "normal",
+            "Valid": {
+                "enable": True,
+                "beginTime": "2025-01-01T00:00:00",
+                "endTime": "2030-12-31T23:59:59",
+                "timeType": "local"
+            },
+            "doorRight": "1",
+            "RightPlan": [{"doorNo": 1, "planTemplateNo": "1"}],
+            "gender": "unknown",
+            "localUIRight": False,
+            "maxOpenDoorTime": 100,
+            "userVerifyMode": "face",
+            "password": ""
         }
+    }
+    _modify_user_on_device(device, payload)
 
-        try:
-            response = requests.put(update_url, auth=auth, json=payload, headers={"Content-Type": "application/json"},
-                                    verify=False)
-            if response.status_code == 200:
-                print(f"[{device.ipaddress}] ✅ Yangilandi: {employee_id}")
-            else:
-                return False, f"[{device.ipaddress}] ❌ Xato: {response.status_code} - {response.text}"
-        except Exception as e:
-            return False, f"[{device.ipaddress}] ❌ Istisno: {str(e)}"
-
-    return True, None
 
+def open_user_on_devices(dormitory: Dormitory, employee_id: str) -> tuple[bool, str | None]:
+    results = run_on_devices(dormitory.devices.all(), open_user_on_device, employee_id)
+    for result in results:
+        if result.ok:
+            print(f"[{result.device.ipaddress}] ✅ Yangilandi: {employee_id}")
+    return summarize(results)
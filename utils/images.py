@@ -0,0 +1,129 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict, namedtuple
+from io import BytesIO
+from PIL import Image, ImageOps, UnidentifiedImageError
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+
+# Qurilmaga yuboriladigan tayyor surat: JPEG baytlari va ularning sha256 xeshi
+FaceImage = namedtuple('FaceImage', ['data', 'sha256', 'width', 'height'])
+
+JPEG_QUALITIES = (90, 85, 80, 75, 70, 60, 50)
+MIN_SIDE = 160  # bundan kichraytirilmaydi (qurilma yuzni taniy olmaydi)
+
+
+class ImageError(ValueError):
+    """Faylni rasm sifatida o‘qib bo‘lmadi (xabar foydalanuvchiga ko‘rsatiladi)."""
+
+
+def _max_bytes():
+    return getattr(settings, 'FACE_IMAGE_MAX_BYTES', 200 * 1024)
+
+
+def _crop_portrait(image, ratio):
+    """Rasmni qurilma nisbatiga (eni/bo‘yi) kesish.
+
+    Eni ortiqcha bo‘lsa o‘rtadan, bo‘yi ortiqcha bo‘lsa yuqoriroqdan kesiladi:
+    yuz odatda rasmning yuqori qismida bo‘ladi.
+    """
+    width, height = image.size
+    if width / height > ratio:
+        new_width = round(height * ratio)
+        left = (width - new_width) // 2
+        return image.crop((left, 0, left + new_width, height))
+
+    new_height = round(width / ratio)
+    top = (height - new_height) // 4
+    return image.crop((0, top, width, top + new_height))
+
+
+def _encode(image, max_bytes):
+    """Progressive JPEG; hajm max_bytes dan oshsa sifat, keyin o‘lcham kamaytiriladi."""
+    while True:
+        for quality in JPEG_QUALITIES:
+            buffer = BytesIO()
+            image.save(buffer, format='JPEG', quality=quality, progressive=True, optimize=True)
+            if buffer.tell() <= max_bytes:
+                return buffer.getvalue()
+
+        if min(image.size) * 0.8 < MIN_SIDE:
+            return buffer.getvalue()
+        image = image.resize((round(image.width * 0.8), round(image.height * 0.8)), Image.LANCZOS)
+
+
+def normalize_face(source):
+    """Yuklangan suratni qurilma uchun tayyorlash.
+
+    EXIF bo‘yicha aylantiriladi, qurilma nisbatiga kesiladi, FACE_IMAGE_SIZE dan
+    katta bo‘lsa kichraytiriladi va FACE_IMAGE_MAX_BYTES dan oshmaydigan JPEG qilinadi.
+    source — fayl obyekti yoki fayl yo‘li.
+    """
+    try:
+        with Image.open(source) as original:
+            image = ImageOps.exif_transpose(original).convert('RGB')
+    except (UnidentifiedImageError, OSError) as e:
+        raise ImageError(f"Rasmni o‘qib bo‘lmadi: {e}")
+
+    width, height = getattr(settings, 'FACE_IMAGE_SIZE', (480, 640))
+    image = _crop_portrait(image, width / height)
+    # Kichik rasm kattalashtirilmaydi
+    image.thumbnail((width, height), Image.LANCZOS)
+
+    data = _encode(image, _max_bytes())
+    with Image.open(BytesIO(data)) as encoded:
+        size = encoded.size
+    return FaceImage(data, hashlib.sha256(data).hexdigest(), *size)
+
+
+def face_upload(uploaded_file):
+    """Forma orqali kelgan suratni normallashtirib, ImageField ga beriladigan fayl qaytaradi."""
+    face = normalize_face(uploaded_file)
+    stem = os.path.splitext(os.path.basename(uploaded_file.name or 'face'))[0]
+    return ContentFile(face.data, name=f"{stem}.jpg")
+
+
+def load_face(image_path):
+    """Qurilmaga yuboriladigan surat baytlari, surat topilmasa yoki o‘qilmasa None.
+
+    Oldin saqlangan (normallashtirilmagan) surat shu yerda normallashtiriladi.
+    """
+    if not image_path or not os.path.exists(image_path):
+        return None
+
+    with open(image_path, 'rb') as image_file:
+        data = image_file.read()
+    if data.startswith(b'\xff\xd8\xff') and len(data) <= _max_bytes():
+        return data
+
+    try:
+        return normalize_face(BytesIO(data)).data
+    except ImageError as e:
+        print(f"❌ {image_path}: {e}")
+        return None
+
+
+class FaceCache:
+    """Bir nechta qurilmaga yuboriladigan suratlar: har biri bir marta o‘qiladi va normallashtiriladi.
+
+    Qurilmalar partiyalarni deyarli bir vaqtda yuboradi, shuning uchun oxirgi max_entries
+    ta surat saqlanadi (orqada qolgan qurilma uchun surat qayta o‘qiladi).
+    """
+
+    def __init__(self, max_entries=200):
+        self.max_entries = max_entries
+        self._faces = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, image_path):
+        with self._lock:
+            if image_path in self._faces:
+                self._faces.move_to_end(image_path)
+                return self._faces[image_path]
+            face = load_face(image_path)
+            self._faces[image_path] = face
+            if len(self._faces) > self.max_entries:
+                self._faces.popitem(last=False)
+            return face
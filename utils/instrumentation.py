@@ -0,0 +1,202 @@
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+
+
+# Gistogramma chegaralari, millisekund (oxirgi katak — undan kattalari)
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_IN_LIST_RE = re.compile(r'\((?:%s, )+%s\)')
+_NUMBER_RE = re.compile(r'\b\d+\b')
+
+# Joriy so‘rov o‘lchovlari (fan-out oqimlariga copy_context bilan o‘tadi)
+_current = ContextVar('instrumentation_metrics', default=None)
+
+
+def enabled():
+    return getattr(settings, 'INSTRUMENTATION_ENABLED', False)
+
+
+def fingerprint(sql):
+    """So‘rov shakli: IN (%s, %s, ...) ro‘yxati uzunligi va SQL ichidagi sonlar farq qilmaydi."""
+    return _NUMBER_RE.sub('N', _IN_LIST_RE.sub('(...)', sql))
+
+
+class RequestMetrics:
+    """Bitta so‘rov davomidagi SQL va ISAPI o‘lchovlari."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_ms = 0.0
+        self.fingerprints = Counter()
+        self.isapi_ms = defaultdict(float)
+        # ISAPI chaqiruvlari fan-out oqimlaridan keladi
+        self.lock = threading.Lock()
+
+    def record_query(self, execute, sql, params, many, context):
+        """connection.execute_wrapper uchun."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self.queries += 1
+            self.db_ms += elapsed
+            self.fingerprints[fingerprint(sql)] += 1
+
+    def record_isapi(self, ipaddress, elapsed_ms):
+        with self.lock:
+            self.isapi_ms[ipaddress] += elapsed_ms
+
+    def duplicates(self):
+        """Bir necha marta bajarilgan so‘rovlar [(shakli, soni)] (N+1 belgisi)."""
+        threshold = getattr(settings, 'INSTRUMENTATION_DUPLICATE_THRESHOLD', 3)
+        return [(sql, count) for sql, count in self.fingerprints.most_common() if count >= threshold]
+
+
+def activate(metrics):
+    return _current.set(metrics)
+
+
+def deactivate(token):
+    _current.reset(token)
+
+
+class _Slice:
+    """Bitta vaqt oralig‘idagi yig‘indilar."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.queries = 0
+        self.max_queries = 0
+        self.db_ms = 0.0
+        self.duplicates = Counter()
+
+    def add(self, elapsed_ms, queries, db_ms, duplicates):
+        index = 0
+        while index < len(BUCKETS_MS) and elapsed_ms > BUCKETS_MS[index]:
+            index += 1
+        self.buckets[index] += 1
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.queries += queries
+        self.max_queries = max(self.max_queries, queries)
+        self.db_ms += db_ms
+        self.add_duplicates(duplicates)
+
+    def add_duplicates(self, duplicates):
+        # Bitta so‘rovdagi eng ko‘p takrorlanish saqlanadi
+        for sql, count in duplicates:
+            self.duplicates[sql] = max(self.duplicates[sql], count)
+
+
+def _percentile(buckets, count, fraction):
+    """Katak yuqori chegarasi bo‘yicha taxminiy persentil (ms)."""
+    target = count * fraction
+    seen = 0
+    for index, bucket in enumerate(buckets):
+        seen += bucket
+        if seen >= target:
+            return BUCKETS_MS[index] if index < len(BUCKETS_MS) else None
+    return None
+
+
+class RollingHistogram:
+    """Kalit (view yoki qurilma) bo‘yicha oxirgi INSTRUMENTATION_WINDOW soniyalik gistogramma.
+
+    Ma'lumot jarayon xotirasida: har bir worker o‘z so‘rovlarini ko‘rsatadi.
+    """
+
+    def __init__(self, window=None, slice_seconds=60):
+        self.window = window
+        self.slice_seconds = slice_seconds
+        self._series = defaultdict(dict)
+        self._lock = threading.Lock()
+
+    def window_seconds(self):
+        return self.window or getattr(settings, 'INSTRUMENTATION_WINDOW', 3600)
+
+    def observe(self, key, elapsed_ms, queries=0, db_ms=0.0, duplicates=()):
+        slice_start = int(time.time() // self.slice_seconds)
+        with self._lock:
+            slices = self._series[key]
+            if slice_start not in slices:
+                slices[slice_start] = _Slice()
+                self._prune(slices, slice_start)
+            slices[slice_start].add(elapsed_ms, queries, db_ms, duplicates)
+
+    def _prune(self, slices, now_slice):
+        oldest = now_slice - self.window_seconds() // self.slice_seconds
+        for slice_start in [start for start in slices if start < oldest]:
+            del slices[slice_start]
+
+    def snapshot(self):
+        """{kalit: yig‘indi} — umumiy vaqt bo‘yicha kamayish tartibida."""
+        now_slice = int(time.time() // self.slice_seconds)
+        result = {}
+        with self._lock:
+            for key, slices in list(self._series.items()):
+                self._prune(slices, now_slice)
+                if not slices:
+                    del self._series[key]
+                    continue
+                total = _Slice()
+                for part in slices.values():
+                    total.buckets = [a + b for a, b in zip(total.buckets, part.buckets)]
+                    total.count += part.count
+                    total.total_ms += part.total_ms
+                    total.max_ms = max(total.max_ms, part.max_ms)
+                    total.queries += part.queries
+                    total.max_queries = max(total.max_queries, part.max_queries)
+                    total.db_ms += part.db_ms
+                    total.add_duplicates(part.duplicates.items())
+                result[key] = {
+                    'count': total.count,
+                    'total_ms': round(total.total_ms, 1),
+                    'avg_ms': round(total.total_ms / total.count, 1),
+                    'p50_ms': _percentile(total.buckets, total.count, 0.5),
+                    'p95_ms': _percentile(total.buckets, total.count, 0.95),
+                    'max_ms': round(total.max_ms, 1),
+                    'avg_queries': round(total.queries / total.count, 1),
+                    'max_queries': total.max_queries,
+                    'avg_db_ms': round(total.db_ms / total.count, 1),
+                    'histogram': dict(zip([f"<={bound}" for bound in BUCKETS_MS] + ['>'], total.buckets)),
+                    'duplicates': [
+                        {'sql': sql, 'count': count} for sql, count in total.duplicates.most_common(5)
+                    ],
+                }
+        return dict(sorted(result.items(), key=lambda item: item[1]['total_ms'], reverse=True))
+
+
+views = RollingHistogram()
+devices = RollingHistogram()
+
+
+def record_isapi(ipaddress, elapsed_ms):
+    """DeviceClient.request dan chaqiriladi: qurilma gistogrammasi va joriy so‘rov (bo‘lsa)."""
+    if not enabled():
+        return
+    devices.observe(ipaddress, elapsed_ms)
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.record_isapi(ipaddress, elapsed_ms)
+
+
+@staff_member_required
+def instrumentation_stats(request):
+    """Yig‘ilgan o‘lchovlar (faqat admin)."""
+    return JsonResponse({
+        'enabled': enabled(),
+        'window': views.window_seconds(),
+        'views': views.snapshot(),
+        'isapi': devices.snapshot(),
+    }, json_dumps_params={'ensure_ascii': False, 'indent': 2})
@@ -0,0 +1,96 @@
+import threading
+import time
+from types import SimpleNamespace
+import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPDigestAuth
+from django.conf import settings
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from dormitory.models import Device
+from utils.instrumentation import record_isapi
+
+
+class SharedDigestAuth(HTTPDigestAuth):
+    """Digest nonce holatini oqimlar o‘rtasida umumiy saqlaydigan HTTPDigestAuth.
+
+    requests holatni har bir oqim uchun alohida saqlaydi, fan-out esa har safar
+    boshqa oqimdan murojaat qiladi. Umumiy holat bilan oxirgi nonce qayta
+    ishlatiladi va 401 challenge faqat birinchi so‘rovda (yoki nonce eskirganda) bo‘ladi.
+    Holat DeviceClient.lock ostida ishlatiladi.
+    """
+
+    def __init__(self, username, password):
+        super().__init__(username, password)
+        self._thread_local = SimpleNamespace()
+
+
+class DeviceClient:
+    """Bitta qurilma uchun doimiy (keep-alive) HTTP sessiya."""
+
+    def __init__(self, device):
+        self.ipaddress = device.ipaddress
+        self.signature = (device.ipaddress, device.username, device.password)
+        self.base_url = f"http://{device.ipaddress}"
+
+        self.session = requests.Session()
+        self.session.auth = SharedDigestAuth(device.username, device.password)
+        self.session.verify = False
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # Digest holati bitta so‘rovga tegishli, shuning uchun qurilmaga so‘rovlar navbat bilan
+        self.lock = threading.Lock()
+
+        # Ko‘p yozuvli UserInfo so‘rovini qo‘llashi (None — hali noma'lum)
+        self.supports_batch_records = None
+        # AcsEventCond da employeeNoString filtrini qo‘llashi (None — hali noma'lum)
+        self.supports_event_filter = None
+
+    def request(self, method, path, **kwargs):
+        kwargs.setdefault("timeout", getattr(settings, "HIKVISION_TIMEOUT", (3, 10)))
+        with self.lock:
+            started = time.perf_counter()
+            try:
+                return self.session.request(method, self.base_url + path, **kwargs)
+            finally:
+                record_isapi(self.ipaddress, (time.perf_counter() - started) * 1000)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request("PUT", path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(device) -> DeviceClient:
+    """Device uchun umumiy klientni qaytarish (IP yoki parol o‘zgarsa yangisi yaratiladi)."""
+    signature = (device.ipaddress, device.username, device.password)
+    with _clients_lock:
+        client = _clients.get(device.pk)
+        if client is None or client.signature != signature:
+            if client is not None:
+                client.close()
+            client = DeviceClient(device)
+            _clients[device.pk] = client
+        return client
+
+
+def drop_client(device_pk):
+    with _clients_lock:
+        client = _clients.pop(device_pk, None)
+    if client is not None:
+        client.close()
+
+
+@receiver(post_delete, sender=Device)
+def drop_deleted_device_client(sender, instance, **kwargs):
+    drop_client(instance.pk)
@@ -0,0 +1,145 @@
+import base64
+import json
+from functools import reduce
+from operator import or_
+from django.core.exceptions import ValidationError
+from django.db.models import F, Q
+
+
+CURSOR_SCALARS = (str, int, float, bool, type(None))
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, types=None):
+    """Noto‘g‘ri yoki eskirgan kursor uchun None qaytaradi (birinchi sahifa ko‘rsatiladi).
+
+    Kursor — oddiy qiymatlar ro‘yxati; types berilsa uzunligi va har bir elementi turi ham tekshiriladi.
+    """
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or not all(isinstance(value, CURSOR_SCALARS) for value in values):
+        return None
+    if types is not None:
+        if len(values) != len(types):
+            return None
+        # bool ham int hisoblanadi, kursorda esa bo‘lmaydi
+        if any(isinstance(value, bool) or not isinstance(value, kind) for value, kind in zip(values, types)):
+            return None
+    return values
+
+
+class KeysetPage:
+    """Kursor bo‘yicha olingan bitta sahifa (Page obyektiga o‘xshash, lekin sahifa raqamisiz)."""
+
+    def __init__(self, object_list, fields, has_next, has_previous):
+        self.object_list = object_list
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+        self.next_cursor = encode_cursor(self._values(object_list[-1], fields)) if has_next else None
+        self.previous_cursor = encode_cursor(self._values(object_list[0], fields)) if has_previous else None
+
+    @staticmethod
+    def _values(obj, fields):
+        return [getattr(obj, obj._meta.get_field(name).attname) for name in fields]
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next_page or self.has_previous_page
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def _keyset_filter(queryset, fields, values, forward):
+    """(f1, f2, ...) > (v1, v2, ...) sharti, NULL qiymatlar oxirida turadi deb hisoblanadi."""
+    conditions = []
+    for i, (name, value) in enumerate(zip(fields, values)):
+        field = queryset.model._meta.get_field(name)
+        if forward:
+            if value is None:
+                continue  # NULL dan kattasi yo‘q
+            step = Q(**{f"{name}__gt": value})
+            if field.null:
+                step |= Q(**{f"{name}__isnull": True})
+        else:
+            if value is None:
+                if not field.null:
+                    continue
+                step = Q(**{f"{name}__isnull": False})
+            else:
+                step = Q(**{f"{name}__lt": value})
+
+        for prev_name, prev_value in zip(fields[:i], values[:i]):
+            if prev_value is None:
+                step &= Q(**{f"{prev_name}__isnull": True})
+            else:
+                step &= Q(**{prev_name: prev_value})
+        conditions.append(step)
+
+    if not conditions:
+        return queryset.none()
+    return queryset.filter(reduce(or_, conditions))
+
+
+def _clean_cursor(queryset, fields, values):
+    """Kursor qiymatlarini maydon turlariga o‘tkazish; mos kelmasa None (birinchi sahifa)."""
+    if len(values) != len(fields):
+        return None
+    cleaned = []
+    for name, value in zip(fields, values):
+        if value is None:
+            cleaned.append(None)
+            continue
+        field = queryset.model._meta.get_field(name)
+        if field.is_relation:
+            field = field.target_field
+        try:
+            cleaned.append(field.to_python(value))
+        except ValidationError:
+            return None
+    return cleaned
+
+
+def keyset_paginate(queryset, fields, per_page, after=None, before=None):
+    """OFFSET siz sahifalash: fields tartibida (o‘sish, NULL oxirida) keyingi/oldingi sahifa.
+
+    fields oxirida noyob maydon (odatda id) bo‘lishi kerak. Har bir sahifa bitta
+    so‘rov bilan olinadi va sahifa qanchalik chuqur bo‘lishidan qat'i nazar indeks
+    bo‘yicha o‘qiladi.
+    """
+    after, before = decode_cursor(after), decode_cursor(before)
+    forward = before is None
+    cursor = after if forward else before
+    if cursor is not None:
+        cursor = _clean_cursor(queryset, fields, cursor)
+
+    if forward:
+        ordering = [F(name).asc(nulls_last=True) for name in fields]
+    else:
+        ordering = [F(name).desc(nulls_first=True) for name in fields]
+
+    if cursor is not None:
+        queryset = _keyset_filter(queryset, fields, cursor, forward)
+    rows = list(queryset.order_by(*ordering)[:per_page + 1])
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if forward:
+        return KeysetPage(rows, fields, has_next=has_more, has_previous=cursor is not None and bool(rows))
+    rows.reverse()
+    return KeysetPage(rows, fields, has_next=bool(rows), has_previous=has_more)
@@ -0,0 +1,41 @@
+from accounts.models import CustomUser
+from student.models import Student
+
+
+def _employee_numbers(employee_nos):
+    numbers = set()
+    for employee_no in employee_nos:
+        try:
+            numbers.add(int(employee_no))
+        except (TypeError, ValueError):
+            continue
+    return numbers
+
+
+def resolve_people(employee_nos):
+    """Loglardagi employeeNo lar bo‘yicha talabalar va xodimlarni bir yo‘la yuklash.
+
+    Qurilmada 10000 dan kichik raqam — xodim/direktor (CustomUser), qolgani — talaba.
+    Natija: (talabalar {id: Student}, foydalanuvchilar {id: CustomUser}); yotoqxona, xona,
+    xodim yotoqxonasi va direktor yotoqxonalari ham oldindan olingan.
+    """
+    numbers = _employee_numbers(employee_nos)
+    students = Student.objects.select_related('dormitory', 'room__dormitory').in_bulk(
+        [number for number in numbers if number >= 10000]
+    )
+    users = (
+        CustomUser.objects
+        .select_related('employee__dormitory', 'director')
+        .prefetch_related('director__dormitories')
+        .in_bulk([number for number in numbers if 0 < number < 10000])
+    )
+    return students, users
+
+
+def director_dormitory_names(user):
+    """Direktor yotoqxonalari nomlari (resolve_people dan kelgan foydalanuvchi uchun so‘rovsiz)."""
+    try:
+        director = user.director
+    except CustomUser.director.RelatedObjectDoesNotExist:
+        return ""
+    return ", ".join(dormitory.name for dormitory in director.dormitories.all())
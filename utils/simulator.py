@@ -0,0 +1,427 @@
+import bisect
+import hashlib
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+from collections import Counter, namedtuple
+from datetime import datetime, timedelta
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+from zoneinfo import ZoneInfo
+import requests
+from django.conf import settings
+
+
+# latency/jitter/hang — ms va soniya; *_rate — 0..1 ulush; events_per_minute — har bir qurilma uchun
+SimulatorOptions = namedtuple('SimulatorOptions', [
+    'username', 'password', 'latency', 'jitter', 'error_rate', 'hang_rate', 'hang',
+    'events_per_minute', 'employees', 'webhook', 'batch_records', 'event_filter', 'nonce_ttl', 'max_events',
+], defaults=[
+    'admin', 'admin12345', 50, 20, 0.0, 0.0, 15,
+    0, range(10000, 10100), None, True, True, 300, 100000,
+])
+
+REALM = 'DS-K1T (simulator)'
+FACE_OK, FACE_FAILED = 75, 76
+_DIGEST_FIELD_RE = re.compile(r'(\w+)=(?:"([^"]*)"|([^\s,]*))')
+
+
+def _md5(*parts):
+    return hashlib.md5(":".join(parts).encode()).hexdigest()
+
+
+def _local_now():
+    return datetime.now(ZoneInfo(settings.TIME_ZONE)).replace(microsecond=0)
+
+
+def _parse_time(value):
+    try:
+        moment = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    return moment if moment.tzinfo else moment.replace(tzinfo=ZoneInfo(settings.TIME_ZONE))
+
+
+class SimulatedDevice:
+    """Bitta yuz tanish terminali holati: foydalanuvchilar, yuz suratlari va eventlar jurnali."""
+
+    def __init__(self, address, options):
+        self.address = address
+        self.options = options
+        self.users = {}
+        self.faces = {}
+        # Eventlar vaqt (va seriya raqami) bo‘yicha o‘sish tartibida; qidiruv bisect bilan
+        self.events = []
+        self.moments = []
+        self.serial_no = 0
+        self.nonces = {}
+        self.stats = Counter()
+        self.lock = threading.Lock()
+
+    # ------------------------------------------------------------ digest auth
+
+    def challenge(self, stale=False):
+        nonce = os.urandom(16).hex()
+        with self.lock:
+            now = time.monotonic()
+            self.nonces = {key: issued for key, issued in self.nonces.items()
+                           if now - issued < self.options.nonce_ttl}
+            self.nonces[nonce] = now
+        value = f'Digest realm="{REALM}", qop="auth", nonce="{nonce}", algorithm=MD5'
+        return value + (', stale=TRUE' if stale else '')
+
+    def authorize(self, method, header):
+        """(ruxsat, nonce eskirganmi) — Authorization sarlavhasi RFC 2617 bo‘yicha tekshiriladi."""
+        if not header or not header.startswith('Digest '):
+            return False, False
+        fields = {key: quoted or plain for key, quoted, plain in _DIGEST_FIELD_RE.findall(header[7:])}
+        if fields.get('username') != self.options.username:
+            return False, False
+
+        ha1 = _md5(self.options.username, REALM, self.options.password)
+        ha2 = _md5(method, fields.get('uri', ''))
+        if fields.get('qop'):
+            expected = _md5(ha1, fields.get('nonce', ''), fields.get('nc', ''), fields.get('cnonce', ''),
+                            fields['qop'], ha2)
+        else:
+            expected = _md5(ha1, fields.get('nonce', ''), ha2)
+        if fields.get('response') != expected:
+            return False, False
+
+        issued = self.nonces.get(fields.get('nonce'))
+        if issued is None or time.monotonic() - issued >= self.options.nonce_ttl:
+            return False, True
+        return True, False
+
+    # ------------------------------------------------------------ foydalanuvchilar va yuzlar
+
+    def record_users(self, user_info, upsert):
+        records = user_info if isinstance(user_info, list) else [user_info]
+        with self.lock:
+            if not upsert and any(str(record.get('employeeNo')) in self.users for record in records):
+                return 'employeeNoAlreadyExist'
+            for record in records:
+                self.users[str(record.get('employeeNo'))] = dict(record)
+        return None
+
+    def modify_user(self, user_info):
+        employee_no = str(user_info.get('employeeNo'))
+        with self.lock:
+            if employee_no not in self.users:
+                return 'employeeNoNotExist'
+            self.users[employee_no].update(user_info)
+        return None
+
+    def delete_users(self, employee_nos):
+        with self.lock:
+            for employee_no in employee_nos:
+                self.users.pop(employee_no, None)
+                self.faces.pop(employee_no, None)
+
+    def record_face(self, employee_no, size, upsert):
+        with self.lock:
+            if employee_no not in self.users:
+                return 'employeeNoNotExist'
+            if not upsert and employee_no in self.faces:
+                return 'deviceUserAlreadyExistFace'
+            self.faces[employee_no] = size
+        return None
+
+    # ------------------------------------------------------------ eventlar
+
+    def generate_event(self, moment=None):
+        """Tasodifiy kirish-chiqish eventi: qurilmadagi foydalanuvchi (bo‘lmasa options.employees dan)."""
+        with self.lock:
+            if self.users:
+                employee_no = random.choice(list(self.users))
+                user = self.users[employee_no]
+            else:
+                employee_no, user = str(random.choice(self.options.employees)), {}
+            blocked = user.get('userType') == 'blackList'
+            self.serial_no += 1
+            entry = {
+                'major': 5,
+                'minor': FACE_FAILED if blocked or random.random() < 0.03 else FACE_OK,
+                'time': (moment or _local_now()).isoformat(),
+                'employeeNoString': employee_no,
+                'name': user.get('name', f"User {employee_no}"),
+                'cardReaderNo': 1,
+                'doorNo': 1,
+                'serialNo': self.serial_no,
+                'userType': user.get('userType', 'normal'),
+                'currentVerifyMode': 'face',
+                'mask': 'unknown',
+            }
+            self.events.append(entry)
+            self.moments.append(moment or _parse_time(entry['time']))
+            if len(self.events) > self.options.max_events:
+                excess = len(self.events) - self.options.max_events
+                del self.events[:excess]
+                del self.moments[:excess]
+            self.stats['events'] += 1
+        return entry
+
+    def search_events(self, condition):
+        start, end = _parse_time(condition.get('startTime')), _parse_time(condition.get('endTime'))
+        major, minor = condition.get('major') or 0, condition.get('minor') or 0
+        employee_no = condition.get('employeeNoString')
+        begin_serial = condition.get('beginSerialNo') or 0
+        with self.lock:
+            low = bisect.bisect_left(self.moments, start) if start else 0
+            high = bisect.bisect_right(self.moments, end) if end else len(self.events)
+            if begin_serial and self.events:
+                low = max(low, begin_serial - self.events[0]['serialNo'])
+            matches = [
+                entry for entry in self.events[max(low, 0):high]
+                if (not major or entry['major'] == major)
+                and (not minor or entry['minor'] == minor)
+                and (not employee_no or entry['employeeNoString'] == employee_no)
+            ]
+        if condition.get('timeReverseOrder'):
+            matches.reverse()
+
+        position = condition.get('searchResultPosition') or 0
+        page = matches[position:position + (condition.get('maxResults') or 30)]
+        if not matches:
+            status = 'NO MATCH'
+        else:
+            status = 'MORE' if position + len(page) < len(matches) else 'OK'
+        return {
+            'AcsEvent': {
+                'searchID': condition.get('searchID', ''),
+                'responseStatusStrg': status,
+                'numOfMatches': len(page),
+                'totalMatches': len(matches),
+                'InfoList': page,
+            }
+        }
+
+
+def _multipart_parts(content_type, body):
+    """{qism nomi: (content-type, baytlar)}."""
+    message = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+    parts = {}
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        parts[name] = (part.get_content_type(), part.get_payload(decode=True) or b'')
+    return parts
+
+
+def _status(code, status_string, sub_status=None):
+    return {
+        'statusCode': code,
+        'statusString': status_string,
+        'subStatusCode': sub_status or status_string,
+    }
+
+
+class DeviceHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive: DeviceClient sessiyasi ulanishni qayta ishlatadi
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def device(self):
+        return self.server.device
+
+    def _send(self, status, payload=None, headers=()):
+        body = json.dumps(payload if payload is not None else _status(1, 'OK')).encode()
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # mijoz kutish vaqti tugab uzilgan (hang_rate)
+
+    def _handle(self, method):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        device, options = self.device, self.device.options
+
+        allowed, stale = device.authorize(method, self.headers.get('Authorization'))
+        if not allowed:
+            device.stats['401'] += 1
+            self._send(401, _status(4, 'Unauthorized'), [('WWW-Authenticate', device.challenge(stale))])
+            return
+
+        delay = max(0.0, random.gauss(options.latency, options.jitter)) / 1000
+        if random.random() < options.hang_rate:
+            delay = options.hang
+        time.sleep(delay)
+
+        path = urlsplit(self.path).path
+        device.stats[f"{method} {path}"] += 1
+        if random.random() < options.error_rate:
+            device.stats['errors'] += 1
+            self._send(503, _status(3, 'Device Busy', 'deviceBusy'))
+            return
+
+        route = ROUTES.get((method, path))
+        if route is None:
+            self._send(404, _status(4, 'Invalid Operation', 'notSupport'))
+            return
+        try:
+            status, payload = route(device, self.headers.get('Content-Type', ''), body)
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            status, payload = 400, _status(6, 'Invalid Content', f"badJsonContent: {e}")
+        self._send(status, payload)
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+    def do_GET(self):
+        self._handle('GET')
+
+
+def _error(sub_status):
+    return 400, _status(6, 'Invalid Content', sub_status)
+
+
+def _user_record(device, content_type, body, upsert=False):
+    user_info = json.loads(body)['UserInfo']
+    if isinstance(user_info, list) and not device.options.batch_records:
+        return _error('badJsonContent')
+    error = device.record_users(user_info, upsert)
+    return _error(error) if error else (200, None)
+
+
+def _user_setup(device, content_type, body):
+    return _user_record(device, content_type, body, upsert=True)
+
+
+def _user_modify(device, content_type, body):
+    error = device.modify_user(json.loads(body)['UserInfo'])
+    return _error(error) if error else (200, None)
+
+
+def _user_delete(device, content_type, body):
+    condition = json.loads(body)['UserInfoDelCond']
+    device.delete_users([str(item['employeeNo']) for item in condition.get('EmployeeNoList', [])])
+    return 200, None
+
+
+def _face_record(device, content_type, body, upsert=False):
+    parts = _multipart_parts(content_type, body)
+    record = json.loads(parts['FaceDataRecord'][1])
+    image = parts.get('img', ('', b''))[1]
+    if not image.startswith(b'\xff\xd8'):
+        return _error('faceImageFormatError')
+    error = device.record_face(str(record['FPID']), len(image), upsert)
+    return _error(error) if error else (200, None)
+
+
+def _face_setup(device, content_type, body):
+    return _face_record(device, content_type, body, upsert=True)
+
+
+def _acs_event(device, content_type, body):
+    condition = json.loads(body)['AcsEventCond']
+    if condition.get('employeeNoString') and not device.options.event_filter:
+        return _error('badJsonContent')
+    return 200, device.search_events(condition)
+
+
+ROUTES = {
+    ('POST', '/ISAPI/AccessControl/UserInfo/Record'): _user_record,
+    ('PUT', '/ISAPI/AccessControl/UserInfo/SetUp'): _user_setup,
+    ('PUT', '/ISAPI/AccessControl/UserInfo/Modify'): _user_modify,
+    ('PUT', '/ISAPI/AccessControl/UserInfo/Delete'): _user_delete,
+    ('POST', '/ISAPI/Intelligent/FDLib/FaceDataRecord'): _face_record,
+    ('PUT', '/ISAPI/Intelligent/FDLib/FDSetUp'): _face_setup,
+    ('POST', '/ISAPI/AccessControl/AcsEvent'): _acs_event,
+}
+
+
+class DeviceServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, device):
+        super().__init__(address, DeviceHandler)
+        self.device = device
+
+
+class WebhookPusher:
+    """Eventlarni /stream/ ga haqiqiy qurilma kabi multipart (event_log) ko‘rinishida yuborish."""
+
+    def __init__(self, url):
+        self.url = url
+        self.queue = queue.Queue(maxsize=10000)
+        self.stats = Counter()
+        self.session = requests.Session()
+        threading.Thread(target=self._run, name='simulator-webhook', daemon=True).start()
+
+    def push(self, device, entry):
+        try:
+            self.queue.put_nowait((device, entry))
+        except queue.Full:
+            self.stats['dropped'] += 1
+
+    def _run(self):
+        while True:
+            device, entry = self.queue.get()
+            host, _, port = device.address.partition(':')
+            event = {
+                'ipAddress': device.address,
+                'portNo': int(port or 80),
+                'protocol': 'HTTP',
+                'channelID': 1,
+                'dateTime': entry['time'],
+                'activePostCount': 1,
+                'eventType': 'AccessControllerEvent',
+                'eventState': 'active',
+                'eventDescription': 'Access Controller Event',
+                'AccessControllerEvent': dict(entry, deviceName='Simulator', majorEventType=entry['major'],
+                                              subEventType=entry['minor']),
+            }
+            files = {'event_log': (None, json.dumps(event), 'application/json')}
+            try:
+                response = self.session.post(self.url, files=files, timeout=5)
+                self.stats['sent' if response.status_code == 200 else f"http {response.status_code}"] += 1
+            except requests.RequestException:
+                self.stats['failed'] += 1
+
+
+def _generate_events(device, pusher):
+    """Puasson oqimi: o‘rtacha events_per_minute ta event daqiqasiga."""
+    rate = device.options.events_per_minute / 60
+    while True:
+        time.sleep(random.expovariate(rate))
+        entry = device.generate_event()
+        if pusher:
+            pusher.push(device, entry)
+
+
+def start_devices(host, port, count, options, history=0, history_hours=24):
+    """count ta qurilma (port, port+1, ...) ni fon oqimlarida ishga tushirish.
+
+    history — har bir qurilmada oldindan yaratiladigan o‘tgan eventlar soni (oxirgi history_hours soat).
+    Natija: (qurilmalar ro‘yxati, WebhookPusher yoki None).
+    """
+    pusher = WebhookPusher(options.webhook) if options.webhook else None
+    devices = []
+    for index in range(count):
+        device = SimulatedDevice(f"{host}:{port + index}", options)
+        now = _local_now()
+        for moment in sorted(now - timedelta(seconds=random.uniform(0, history_hours * 3600))
+                             for _ in range(history)):
+            device.generate_event(moment.replace(microsecond=0))
+
+        server = DeviceServer((host, port + index), device)
+        threading.Thread(target=server.serve_forever, name=f"simulator-{port + index}", daemon=True).start()
+        if options.events_per_minute > 0:
+            threading.Thread(target=_generate_events, args=(device, pusher), daemon=True).start()
+        devices.append(device)
+    return devices, pusher
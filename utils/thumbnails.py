@@ -0,0 +1,103 @@
+import hashlib
+import os
+import re
+from glob import glob
+from PIL import Image, ImageOps, UnidentifiedImageError
+from django.conf import settings
+from django.core.cache import cache
+from django.http import FileResponse, Http404
+from django.urls import reverse
+
+
+# nomi -> ((eni, bo‘yi), kvadrat qilib kesish); 2x variant ikki baravar kattaroq
+THUMBNAIL_SIZES = {
+    'avatar': ((120, 120), True),
+    'detail': ((300, 400), False),
+}
+
+THUMBNAIL_NAME_RE = re.compile(r'[0-9a-f]{32}_\d+x\d+\.jpg')
+
+
+def thumbnail_root():
+    return getattr(settings, 'THUMBNAIL_ROOT', os.path.join(settings.BASE_DIR, 'thumbnails'))
+
+
+def content_hash(path):
+    """Fayl mazmuni xeshi; fayl o‘zgarmaguncha (mtime, hajm) keshdan olinadi."""
+    stat = os.stat(path)
+    key = f"thumb_hash:{path}:{stat.st_mtime_ns}:{stat.st_size}"
+    digest = cache.get(key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as source:
+            for chunk in iter(lambda: source.read(64 * 1024), b''):
+                sha.update(chunk)
+        digest = sha.hexdigest()[:32]
+        cache.set(key, digest, None)
+    return digest
+
+
+def _render(path, target, size, crop):
+    with Image.open(path) as original:
+        image = ImageOps.exif_transpose(original).convert('RGB')
+    if crop:
+        image = ImageOps.fit(image, size, Image.LANCZOS)
+    else:
+        image.thumbnail(size, Image.LANCZOS)
+
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    # Boshqa so‘rov yarim yozilgan faylni o‘qimasligi uchun avval vaqtinchalik faylga
+    temp_path = f"{target}.{os.getpid()}.tmp"
+    image.save(temp_path, format='JPEG', quality=85, progressive=True, optimize=True)
+    os.replace(temp_path, target)
+
+
+def thumbnail_name(field_file, size, scale=1):
+    """Kichik nusxa fayl nomi (mazmun xeshi va o‘lcham), kerak bo‘lsa shu yerda yaratiladi."""
+    (width, height), crop = THUMBNAIL_SIZES[size]
+    width, height = width * scale, height * scale
+
+    path = field_file.path
+    name = f"{content_hash(path)}_{width}x{height}.jpg"
+    target = os.path.join(thumbnail_root(), name)
+    if not os.path.exists(target):
+        _render(path, target, (width, height), crop)
+    return name
+
+
+def thumbnail_url(field_file, size, scale=1):
+    """Surat kichik nusxasi URL i; surat bo‘lmasa bo‘sh satr, yaratib bo‘lmasa asl URL."""
+    if not field_file:
+        return ""
+    try:
+        return reverse('thumbnail', args=[thumbnail_name(field_file, size, scale)])
+    except (OSError, UnidentifiedImageError) as e:
+        print(f"[THUMB] {field_file.name}: {e}")
+        return field_file.url
+
+
+def delete_thumbnails(path):
+    """Asl surat o‘chirilishidan oldin chaqiriladi: uning barcha kichik nusxalari o‘chiriladi."""
+    if not path or not os.path.isfile(path):
+        return
+    for thumbnail in glob(os.path.join(thumbnail_root(), f"{content_hash(path)}_*.jpg")):
+        try:
+            os.remove(thumbnail)
+        except FileNotFoundError:
+            pass
+
+
+def serve_thumbnail(request, name):
+    """Kichik nusxa nomi mazmun xeshidan iborat, shuning uchun brauzer uni muddatsiz keshlaydi.
+
+    Suratlar faqat tizimga kirganlarga ko‘rinadi: private — umumiy proxy/CDN saqlamasligi uchun.
+    """
+    if not THUMBNAIL_NAME_RE.fullmatch(name):
+        raise Http404
+    path = os.path.join(thumbnail_root(), name)
+    if not os.path.isfile(path):
+        raise Http404
+
+    response = FileResponse(open(path, 'rb'), content_type='image/jpeg')
+    response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response